@@ -0,0 +1,5 @@
+"""
+Offline component benchmarks for the indexing and retrieval hot paths.
+
+Run with `python -m benchmarks.run --help`.
+"""
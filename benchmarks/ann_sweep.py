@@ -0,0 +1,283 @@
+"""
+Recall versus latency sweep of the HNSW index configuration.
+
+Loads a corpus of embeddings into an in-memory DuckDB database, computes the exact
+top-k neighbours of every query by brute force with numpy, then builds an HNSW index
+for every combination of metric, M and ef_construction and queries it with every
+ef_search. For each setting it reports recall@k, query latency percentiles, index
+build time and index memory.
+
+The corpus is either synthetic (clustered unit vectors), the document_chunks table of
+an existing database, or a float32 .npy file of shape (n, EMBEDDING_DIM).
+
+Usage:
+    python -m benchmarks.ann_sweep --size 100000 --target-recall 0.95
+    python -m benchmarks.ann_sweep --database data/semantic_search.duckdb --metric cosine l2sq
+    python -m benchmarks.ann_sweep --npy embeddings.npy --m 8 16 32 --ef-search 32 64 128
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+# Distance function an HNSW index with the given metric can accelerate
+DISTANCE_FUNCTIONS = {
+    "l2sq": "array_distance",
+    "cosine": "array_cosine_distance",
+    "ip": "array_negative_inner_product",
+}
+
+
+def synthetic_corpus(size, dim=EMBEDDING_DIM, clusters=100, spread=0.35, seed=0):
+    """
+    Clustered unit vectors
+
+    Uniform random vectors have no neighbourhood structure and make every index look bad,
+    text embeddings are clustered by topic.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    assignment = rng.integers(0, clusters, size)
+    vectors = centers[assignment] + spread * rng.standard_normal((size, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def load_database_corpus(path, table="document_chunks"):
+    """Embeddings of an existing database"""
+    with duckdb.connect(path, read_only=True) as conn:
+        rows = conn.execute(f"SELECT embedding FROM {table}").fetchall()
+    return np.array([row[0] for row in rows], dtype=np.float32)
+
+
+def split_queries(corpus, queries, seed=1):
+    """Hold out query vectors from the corpus, slightly perturbed so they are not exact matches"""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(corpus), size=min(queries, len(corpus)), replace=False)
+    noise = 0.05 * rng.standard_normal((len(picked), corpus.shape[1]), dtype=np.float32)
+    query_vectors = corpus[picked] + noise
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return query_vectors.astype(np.float32)
+
+
+def exact_neighbours(corpus, query_vectors, metric, k):
+    """Ids of the exact top-k neighbours of every query"""
+    if metric == "l2sq":
+        # ||q - x||^2 = ||x||^2 - 2 q.x + const
+        scores = -2.0 * query_vectors @ corpus.T + np.sum(corpus * corpus, axis=1)
+    elif metric == "cosine":
+        normalized = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        scores = -(query_vectors @ normalized.T)
+    elif metric == "ip":
+        scores = -(query_vectors @ corpus.T)
+    else:
+        raise ValueError(f"Unknown metric: {metric}")
+
+    top = np.argpartition(scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found, expected):
+    """Mean fraction of the exact neighbours present in the approximate results"""
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+
+def load_corpus(conn, corpus):
+    """
+    Create the vectors table from the corpus
+
+    Binding large lists as query parameters is very slow, the vectors go through
+    a temporary tab-separated file DuckDB reads in parallel instead.
+    """
+    dim = corpus.shape[1]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.tsv")
+        ids = np.arange(len(corpus))[:, None]
+        np.savetxt(
+            path,
+            np.hstack([ids, corpus]),
+            fmt="%d\t[" + ",".join(["%.9g"] * dim) + "]",
+        )
+        conn.execute(
+            f"""
+            CREATE OR REPLACE TABLE vectors AS
+            SELECT id, embedding::FLOAT[{dim}] AS embedding
+            FROM read_csv(?, delim = '\t', header = false, quote = '',
+                          columns = {{'id': 'INTEGER', 'embedding': 'VARCHAR'}})
+            """,
+            (path,),
+        )
+
+
+def index_memory(conn, index_name):
+    """Approximate memory of an HNSW index in bytes, None if the extension doesn't report it"""
+    try:
+        row = conn.execute(
+            "SELECT approx_memory_usage FROM pragma_hnsw_index_info() WHERE index_name = ?",
+            (index_name,),
+        ).fetchone()
+        return int(row[0]) if row else None
+    except duckdb.Error:
+        return None
+
+
+def query_sql(metric, dim, k):
+    return f"""
+    SELECT id FROM vectors
+    ORDER BY {DISTANCE_FUNCTIONS[metric]}(embedding, ?::FLOAT[{dim}])
+    LIMIT {k}
+    """
+
+
+def uses_index(conn, sql, vector):
+    plan = conn.execute("EXPLAIN " + sql, (vector,)).fetchall()
+    return any("HNSW" in str(row[-1]).upper() for row in plan)
+
+
+def sweep(corpus, query_vectors, metrics, ms, ef_constructions, ef_searches, k):
+    """Run every combination, yield one result dictionary per setting"""
+    dim = corpus.shape[1]
+    conn = duckdb.connect(":memory:")
+    conn.execute("INSTALL vss;")
+    conn.execute("LOAD vss;")
+    load_corpus(conn, corpus)
+
+    for metric in metrics:
+        expected = exact_neighbours(corpus, query_vectors, metric, k)
+        sql = query_sql(metric, dim, k)
+
+        for m, ef_construction in itertools.product(ms, ef_constructions):
+            conn.execute("DROP INDEX IF EXISTS sweep_idx")
+            began = time.perf_counter()
+            conn.execute(
+                f"""
+                CREATE INDEX sweep_idx ON vectors USING HNSW (embedding)
+                WITH (metric = '{metric}', m = {m}, ef_construction = {ef_construction})
+                """
+            )
+            build_seconds = time.perf_counter() - began
+            memory = index_memory(conn, "sweep_idx")
+            index_used = uses_index(conn, sql, query_vectors[0].tolist())
+
+            for ef_search in ef_searches:
+                conn.execute(f"SET hnsw_ef_search = {ef_search}")
+                found, samples = [], []
+                for vector in query_vectors:
+                    began = time.perf_counter()
+                    rows = conn.execute(sql, (vector.tolist(),)).fetchall()
+                    samples.append(time.perf_counter() - began)
+                    found.append([row[0] for row in rows])
+
+                p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+                yield {
+                    "metric": metric,
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                    "recall_at_k": recall_at_k(found, expected),
+                    "p50_ms": float(p50),
+                    "p95_ms": float(p95),
+                    "p99_ms": float(p99),
+                    "build_seconds": build_seconds,
+                    "index_memory_bytes": memory,
+                    "index_used": index_used,
+                }
+
+    conn.close()
+
+
+def recommend(results, target_recall):
+    """
+    Cheapest setting that reaches the target recall
+
+    Lowest p95 latency first, smaller index build time and memory break ties.
+    """
+    eligible = [r for r in results if r["index_used"] and r["recall_at_k"] >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda r: (r["p95_ms"], r["build_seconds"], r["index_memory_bytes"] or 0))
+
+
+def format_table(results):
+    header = f"{'metric':<7} {'M':>4} {'ef_c':>5} {'ef_s':>5} {'recall':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'build_s':>8} {'mem_MB':>8}"
+    lines = [header]
+    for r in results:
+        memory = f"{r['index_memory_bytes'] / 2**20:8.1f}" if r["index_memory_bytes"] is not None else f"{'n/a':>8}"
+        lines.append(
+            f"{r['metric']:<7} {r['m']:>4} {r['ef_construction']:>5} {r['ef_search']:>5} "
+            f"{r['recall_at_k']:>7.3f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['p99_ms']:>7.2f} "
+            f"{r['build_seconds']:>8.2f} {memory}"
+            + ("" if r["index_used"] else "  (index not used)")
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--size", type=int, default=100_000, help="Size of the synthetic corpus")
+    source.add_argument("--database", help="Use the embeddings of an existing database")
+    source.add_argument("--npy", help="Use the embeddings of a float32 .npy file")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query (the retriever's limit)")
+    parser.add_argument("--metric", nargs="+", default=["cosine", "l2sq", "ip"], choices=sorted(DISTANCE_FUNCTIONS))
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[64, 100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", help="Write all results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.database:
+        corpus = load_database_corpus(args.database)
+    elif args.npy:
+        corpus = np.load(args.npy).astype(np.float32)
+    else:
+        corpus = synthetic_corpus(args.size)
+    query_vectors = split_queries(corpus, args.queries)
+
+    results = []
+    for result in sweep(corpus, query_vectors, args.metric, args.m, args.ef_construction, args.ef_search, args.k):
+        results.append(result)
+        print(format_table([result]).splitlines()[1], flush=True)
+
+    print()
+    print(format_table(results))
+
+    best = recommend(results, args.target_recall)
+    print()
+    if best is None:
+        print(f"No setting reached recall@{args.k} >= {args.target_recall}")
+    else:
+        print(f"Fastest setting with recall@{args.k} >= {args.target_recall}:")
+        print(f"  VSS_METRIC={best['metric']}")
+        print(f"  VSS_M={best['m']}")
+        print(f"  VSS_EF_CONSTRUCTION={best['ef_construction']}")
+        print(f"  VSS_EF_SEARCH={best['ef_search']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"corpus_size": len(corpus), "queries": len(query_vectors), "k": args.k,
+                 "target_recall": args.target_recall, "recommended": best, "results": results},
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
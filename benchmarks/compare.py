@@ -0,0 +1,76 @@
+"""
+Compare benchmark results against a stored baseline.
+"""
+
+# Metric name suffixes and whether higher values are better
+HIGHER_IS_BETTER = {
+    "_per_sec": True,
+    "_ms": False,
+}
+
+
+def flatten(results, prefix=""):
+    """Flatten nested result dictionaries into {"a.b.c": value} for numeric leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(metric):
+    """Whether higher is better for a metric, or None if it isn't a performance metric"""
+    for suffix, higher_is_better in HIGHER_IS_BETTER.items():
+        if metric.endswith(suffix):
+            return higher_is_better
+    return None
+
+
+def compare(current, baseline, tolerance=0.1):
+    """
+    Compare two result sets
+
+    Args:
+        current: Results of the current run (the "results" section of the JSON output)
+        baseline: Results of the baseline run
+        tolerance: Relative change allowed before a metric is flagged
+
+    Returns:
+        List of dictionaries (metric, baseline, current, change, regression), change being
+        the relative change in the metric's "better" direction (negative is worse)
+    """
+    current = flatten(current)
+    baseline = flatten(baseline)
+
+    report = []
+    for metric in sorted(current.keys() & baseline.keys()):
+        higher_is_better = direction(metric)
+        if higher_is_better is None or baseline[metric] == 0:
+            continue
+        change = (current[metric] - baseline[metric]) / baseline[metric]
+        if not higher_is_better:
+            change = -change
+        report.append(
+            {
+                "metric": metric,
+                "baseline": baseline[metric],
+                "current": current[metric],
+                "change": change,
+                "regression": change < -tolerance,
+            }
+        )
+    return report
+
+
+def format_report(report):
+    lines = []
+    for entry in report:
+        flag = "REGRESSION" if entry["regression"] else "ok"
+        lines.append(
+            f"{entry['metric']:<45} {entry['baseline']:>12.3f} -> {entry['current']:>12.3f} "
+            f"({entry['change']:+.1%}) {flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,233 @@
+"""
+Offline benchmarks for indexing and retrieval.
+
+Measures, over synthetic corpora of configurable sizes:
+    - DocumentIndexer throughput (chunks/sec) with synthetic documents
+    - bulk_insert_chunks throughput (rows/sec)
+    - search_similar_chunks latency percentiles (p50/p95/p99)
+
+Embeddings and NER come from deterministic stubs (benchmarks/stubs.py), so no model
+is downloaded and runs are comparable across machines and commits.
+
+Usage:
+    python -m benchmarks.run --sizes 10000 100000 --output results.json
+    python -m benchmarks.run --sizes 10000 --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks import stubs
+from benchmarks.compare import compare, format_report
+
+# The models are replaced before anything imports the tools
+stubs.install()
+
+from rag_agent.config import DuckDBConfig  # noqa: E402
+from rag_agent.db import init_db  # noqa: E402
+from rag_agent.db.connection import DuckDBConnection  # noqa: E402
+from rag_agent.tools.utils.semantic_search import (  # noqa: E402
+    bulk_insert_chunks,
+    search_similar_chunks,
+)
+
+DEFAULT_SIZES = (10_000, 100_000)
+INSERT_BATCH_SIZE = 1000
+CHUNKS_PER_DOCUMENT = 100
+WORDS = (
+    "the of retrieval vector index query Frodo Gandalf Shire document chunk embedding "
+    "latency throughput table column search model agent summary section"
+).split()
+
+
+def synthetic_text(i, words=40):
+    rng = np.random.default_rng(i)
+    return " ".join(rng.choice(WORDS, size=words))
+
+
+def synthetic_rows(start, count, seed=0):
+    """Rows in the format bulk_insert_chunks expects, with random unit embeddings"""
+    embeddings = stubs.random_unit_vectors(count, seed=seed + start)
+    return [
+        {
+            "doc_name": f"doc-{(start + i) // CHUNKS_PER_DOCUMENT}",
+            "chunk_text": synthetic_text(start + i),
+            "named_entities": {"Frodo": "PER"},
+            "embedding": embedding.tolist(),
+            "chunk_index": (start + i) % CHUNKS_PER_DOCUMENT,
+        }
+        for i, embedding in enumerate(embeddings)
+    ]
+
+
+class SyntheticConverter:
+    """Stands in for the ProfiledConverter, every path converts to a fixed-size document"""
+
+    def __init__(self, chunks_per_document=CHUNKS_PER_DOCUMENT):
+        self.chunks_per_document = chunks_per_document
+
+    def convert(self, source):
+        return SimpleNamespace(document=SimpleNamespace(name=source, chunks=self.chunks_per_document))
+
+
+class SyntheticChunker:
+    """Stands in for docling's HybridChunker"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def chunk(self, dl_doc):
+        for i in range(dl_doc.chunks):
+            yield SimpleNamespace(text=synthetic_text(i), meta=SimpleNamespace(headings=[f"Section {i // 10}"]))
+
+    def contextualize(self, chunk):
+        return f"{chunk.meta.headings[0]}\n{chunk.text}"
+
+
+def open_database(path):
+    """Point the shared connection at a fresh database file"""
+    DuckDBConnection().close()
+    if os.path.exists(path):
+        os.remove(path)
+    DuckDBConfig.DUCKDB_PATH = path
+    init_db()
+
+
+def percentiles(samples):
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def bench_bulk_insert(size):
+    """Insert `size` synthetic rows in batches, return rows/sec"""
+    elapsed = 0.0
+    for start in range(0, size, INSERT_BATCH_SIZE):
+        rows = synthetic_rows(start, min(INSERT_BATCH_SIZE, size - start))
+        began = time.perf_counter()
+        bulk_insert_chunks(rows)
+        elapsed += time.perf_counter() - began
+    return {"rows": size, "seconds": elapsed, "rows_per_sec": size / elapsed}
+
+
+def bench_search(queries, limit, warmup=5):
+    """Latency of search_similar_chunks for random query vectors"""
+    vectors = stubs.random_unit_vectors(queries + warmup, seed=1_000_003)
+    for vector in vectors[:warmup]:
+        search_similar_chunks(vector.tolist(), limit)
+
+    samples = []
+    for vector in vectors[warmup:]:
+        began = time.perf_counter()
+        search_similar_chunks(vector.tolist(), limit)
+        samples.append(time.perf_counter() - began)
+    return {"queries": queries, "limit": limit, **percentiles(samples)}
+
+
+def bench_indexer(documents):
+    """DocumentIndexer throughput with synthetic conversion and chunking"""
+    from rag_agent.tools import indexer as indexer_module
+
+    # Conversion and chunking need docling models, they are not what is measured here
+    indexer_module.ProfiledConverter = SyntheticConverter
+    indexer_module.HybridChunker = SyntheticChunker
+    indexer = indexer_module.DocumentIndexer()
+
+    began = time.perf_counter()
+    for i in range(documents):
+        result = indexer.forward(f"synthetic/indexer-{i}.md")
+        if "successfully" not in result:
+            raise RuntimeError(f"Indexing failed: {result}")
+    elapsed = time.perf_counter() - began
+
+    chunks = documents * CHUNKS_PER_DOCUMENT
+    return {"documents": documents, "chunks": chunks, "seconds": elapsed, "chunks_per_sec": chunks / elapsed}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    import duckdb
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "duckdb": duckdb.__version__,
+        "vss_metric": DuckDBConfig.VSS_METRIC,
+        "vss_m": DuckDBConfig.VSS_M,
+        "vss_ef_construction": DuckDBConfig.VSS_EF_CONSTRUCTION,
+    }
+
+
+def run(sizes, queries, limit, indexer_documents, workdir):
+    results = {}
+    for size in sizes:
+        open_database(os.path.join(workdir, f"bench-{size}.duckdb"))
+        results[f"size_{size}"] = {
+            "bulk_insert": bench_bulk_insert(size),
+            "search": bench_search(queries, limit),
+        }
+
+    if indexer_documents:
+        open_database(os.path.join(workdir, "bench-indexer.duckdb"))
+        results["indexer"] = bench_indexer(indexer_documents)
+
+    DuckDBConnection().close()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Corpus sizes in chunks (e.g. 10000 100000 1000000)")
+    parser.add_argument("--queries", type=int, default=200, help="Search queries per corpus size")
+    parser.add_argument("--limit", type=int, default=5, help="Results per search query")
+    parser.add_argument("--indexer-documents", type=int, default=20,
+                        help=f"Synthetic documents of {CHUNKS_PER_DOCUMENT} chunks to index, 0 to skip")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous JSON output")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown allowed before a metric is flagged as a regression")
+    parser.add_argument("--workdir", help="Directory for the benchmark databases (default: a temporary one)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args.sizes, args.queries, args.limit, args.indexer_documents, args.workdir or tmp)
+
+    output = {"metadata": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    print(json.dumps(output, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report = compare(results, baseline["results"], args.tolerance)
+        print(format_report(report))
+        if any(entry["regression"] for entry in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
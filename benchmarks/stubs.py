@@ -0,0 +1,70 @@
+"""
+Deterministic stand-ins for the embedding and NER models.
+
+They expose the same interfaces as rag_agent.tools.utils.embeddings and
+rag_agent.tools.utils.ner, so benchmarks run offline, without downloading
+models, and measure the code around them rather than model inference.
+"""
+import hashlib
+import re
+import sys
+import types
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+_ENTITY_PATTERN = re.compile(r"\b[A-Z][a-z]+\b")
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+
+
+def random_unit_vectors(count, dim=EMBEDDING_DIM, seed=0):
+    """Normalized float32 vectors, the same for the same seed"""
+    vectors = np.random.default_rng(seed).standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def encode(texts):
+    """Deterministic unit vector per text, same shape and dtype as the real encoder"""
+    return np.stack([random_unit_vectors(1, seed=_seed(text))[0] for text in texts])
+
+
+def encode_chunk(text):
+    """Same interface as the real encode_chunk, chunks are never split"""
+    return [(text, encode([text])[0])]
+
+
+def extract_entities(text):
+    """Capitalized words as entities, same format as the real NER"""
+    return {word: "MISC" for word in _ENTITY_PATTERN.findall(text)}
+
+
+def install():
+    """
+    Register the stubs in place of the model modules
+
+    Must be called before anything imports rag_agent.tools.
+    """
+    from rag_agent.tools.utils.executor import run_cpu_bound
+
+    async def aencode(texts):
+        return await run_cpu_bound(encode, texts)
+
+    async def aextract_entities(text):
+        return await run_cpu_bound(extract_entities, text)
+
+    embeddings = types.ModuleType("rag_agent.tools.utils.embeddings")
+    embeddings.model = "stub"
+    embeddings.CHUNK_MAX_TOKENS = 510
+    embeddings.encode = encode
+    embeddings.aencode = aencode
+    embeddings.encode_chunk = encode_chunk
+    ner = types.ModuleType("rag_agent.tools.utils.ner")
+    ner.extract_entities = extract_entities
+    ner.aextract_entities = aextract_entities
+
+    sys.modules["rag_agent.tools.utils.embeddings"] = embeddings
+    sys.modules["rag_agent.tools.utils.ner"] = ner
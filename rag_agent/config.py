@@ -11,6 +11,158 @@ class DuckDBConfig:
     # Database configuration
     DUCKDB_PATH: str = os.getenv("DB_DATA_PATH", "data/semantic_search.duckdb")
     EMBEDDING_DIM: int = 384
-    VSS_METRIC: str = "cosine"  # Options: l2sq (default), cosine, dot, etc.
-    VSS_M:int = 16  # HNSW M parameter (number of connections per layer)
-    VSS_EF_CONSTRUCTION: int = 100  # Controls index build quality/time tradeoff
\ No newline at end of file
+    # HNSW settings, `python -m benchmarks.ann_sweep` measures the tradeoffs on a corpus
+    VSS_METRIC: str = os.getenv("VSS_METRIC", "cosine")  # Options: l2sq (default), cosine, dot, etc.
+    VSS_M:int = int(os.getenv("VSS_M", "16"))  # HNSW M parameter (number of connections per layer)
+    VSS_EF_CONSTRUCTION: int = int(os.getenv("VSS_EF_CONSTRUCTION", "100"))  # Controls index build quality/time tradeoff
+    VSS_EF_SEARCH: int = int(os.getenv("VSS_EF_SEARCH", "0")) or None  # Search breadth, None for the extension default (64)
+
+class DeploymentConfig:
+    # Process role: "standalone" (default) owns the database file and serves searches,
+    # "writer" owns the database file and publishes read-only snapshots,
+    # "reader" searches the latest snapshot and forwards indexing to the writer
+    ROLE: str = os.getenv("RAG_ROLE", "standalone")
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+    SNAPSHOT_KEEP: int = 3  # Generations kept on disk so readers can finish in-flight queries
+    SNAPSHOT_REFRESH_INTERVAL: float = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "5"))  # Seconds
+    # Seconds between publishes after indexing, the writes of an interval go into one snapshot
+    SNAPSHOT_PUBLISH_INTERVAL: float = float(os.getenv("SNAPSHOT_PUBLISH_INTERVAL", "10"))
+    WRITER_HOST: str = os.getenv("WRITER_HOST", "127.0.0.1")
+    WRITER_PORT: int = int(os.getenv("WRITER_PORT", "7861"))
+    WRITER_URL: str = os.getenv("WRITER_URL", f"http://{WRITER_HOST}:{WRITER_PORT}")
+    WRITER_TIMEOUT: float = 600  # Seconds to wait for a forwarded indexing request
+
+
+class AsyncConfig:
+    # Bounded executors used by the async API
+    CPU_WORKERS: int = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 4)))  # Model inference and DuckDB queries
+    IO_WORKERS: int = int(os.getenv("IO_WORKERS", "32"))  # Blocking network calls (LLM requests, agent runs)
+
+
+class ToolCacheConfig:
+    # Per-conversation memoization of tool results
+    ENABLED: bool = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+    MAX_ENTRIES: int = 128  # Cached tool results per conversation
+    MAX_CONVERSATIONS: int = 256  # Conversations kept in memory, least recently used are dropped
+
+
+class AnswerCacheConfig:
+    # Semantic cache of final answers, checked before running the agent
+    ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    SIMILARITY_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Cosine similarity
+    TTL_SECONDS: int = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+    MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))  # Least recently hit are evicted
+
+
+class SummarizerConfig:
+    # Map-reduce summarization of long inputs
+    SEGMENT_TOKENS: int = int(os.getenv("SUMMARIZER_SEGMENT_TOKENS", "3000"))  # Token budget of one LLM call
+    MAX_CONCURRENCY: int = int(os.getenv("SUMMARIZER_MAX_CONCURRENCY", "4"))  # In-flight LLM requests per call
+
+
+class SummaryCacheConfig:
+    # Content-addressed cache of summarizer outputs, stored in DuckDB
+    ENABLED: bool = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+    MAX_ENTRIES: int = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))  # Least recently used are evicted
+    REUSE_SUBSETS: bool = os.getenv("SUMMARY_CACHE_REUSE_SUBSETS", "false").lower() == "true"
+    MIN_REUSE_CHARS: int = 1000  # Shorter cached texts are not worth substituting by their summary
+
+
+class SummaryTreeConfig:
+    # Hierarchical document summaries built in the background at index time
+    ENABLED: bool = os.getenv("SUMMARY_TREE_ENABLED", "false").lower() == "true"
+    MAX_RESULTS: int = 2  # Summary rows the retriever may return ahead of raw chunks
+
+
+class RetrieverConfig:
+    # Packing of retrieved chunks into the agent's context
+    TOKEN_BUDGET: int = int(os.getenv("RETRIEVER_TOKEN_BUDGET", "2000"))  # Estimated LLM tokens
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8  # Jaccard similarity of word shingles
+    MIN_TRIMMED_TOKENS: int = 50  # Below this, the lowest-ranked chunk is dropped rather than trimmed
+
+
+class MetricsConfig:
+    # Per-stage timing and throughput metrics in Prometheus text format
+    ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    PORT: int = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics on this port, 0 to disable
+    HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")  # 0.0.0.0 for scrapes from other hosts
+    FILE: str = os.getenv("METRICS_FILE", "")  # Periodically write the metrics to this file, empty to disable
+    FILE_INTERVAL: float = float(os.getenv("METRICS_FILE_INTERVAL", "15"))  # Seconds
+    BUCKETS: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # Seconds
+
+
+class QueryLogConfig:
+    # Searches slower than the threshold are recorded in the query_log table
+    ENABLED: bool = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+    THRESHOLD_MS: float = float(os.getenv("QUERY_LOG_THRESHOLD_MS", "500"))
+    EXPLAIN: bool = os.getenv("QUERY_LOG_EXPLAIN", "true").lower() == "true"  # Check the plan for index usage
+    MAX_ENTRIES: int = int(os.getenv("QUERY_LOG_MAX_ENTRIES", "10000"))  # Oldest entries are deleted
+
+
+class SearchTunerConfig:
+    # Automatic tuning of ef_search and the retriever over-fetch factor
+    ENABLED: bool = os.getenv("SEARCH_TUNER_ENABLED", "false").lower() == "true"
+    TARGET_P95_MS: float = float(os.getenv("SEARCH_TARGET_P95_MS", "50"))  # Similarity query latency target
+    MIN_EF_SEARCH: int = 16
+    MAX_EF_SEARCH: int = 512
+    MIN_OVERFETCH: float = 1.5  # Candidates fetched per result returned
+    MAX_OVERFETCH: float = 4.0
+    WINDOW: int = 200  # Recent searches the decisions are based on
+    ADJUST_EVERY: int = 20  # Searches between adjustments
+
+
+class ShardConfig:
+    # Document chunks are split over tables routed by document, each with its own HNSW index
+    NUM_SHARDS: int = int(os.getenv("VECTOR_SHARDS", "1"))
+    SEARCH_WORKERS: int = int(os.getenv("SHARD_SEARCH_WORKERS", str(os.cpu_count() or 4)))  # Capped at NUM_SHARDS
+
+
+class CollectionConfig:
+    # Collection a chat session uses when none is given, unset for the default tables
+    DEFAULT: str = os.getenv("DEFAULT_COLLECTION") or None
+
+
+class ExactSearchConfig:
+    # Brute-force search over memory-mapped embeddings, exact and faster than HNSW on small tables
+    ENGINE: str = os.getenv("SEARCH_ENGINE", "auto")  # "auto", "exact" or "hnsw"
+    MAX_ROWS: int = int(os.getenv("EXACT_SEARCH_MAX_ROWS", "50000"))  # Largest table "auto" searches exactly
+    DIR: str = os.getenv("EXACT_SEARCH_DIR", "data/exact")  # Shared by every process on the host
+    BLOCK_ROWS: int = 65536  # Rows scored at a time, bounds the temporary distance arrays
+
+
+class StartupConfig:
+    # The UI and health endpoints start first, the database, indexes and models load in the background
+    HEALTH_PORT: int = int(os.getenv("HEALTH_PORT", "0"))  # Serve /healthz and /readyz on this port, 0 disables them
+    HEALTH_HOST: str = os.getenv("HEALTH_HOST", "127.0.0.1")  # 0.0.0.0 for probes from other hosts
+    WARM_INDEXES: bool = os.getenv("WARM_INDEXES", "true").lower() == "true"  # Load the HNSW indexes at startup
+    READY_TIMEOUT: float = float(os.getenv("READY_TIMEOUT", "120"))  # Seconds a chat waits for startup
+
+
+class FetchConfig:
+    # Downloads of URL documents, cached locally and revalidated with conditional requests
+    ENABLED: bool = os.getenv("URL_FETCH_ENABLED", "true").lower() == "true"
+    CACHE_DIR: str = os.getenv("URL_CACHE_DIR", "data/downloads")
+    MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("FETCH_MAX_CONNECTIONS_PER_HOST", "4"))
+    WORKERS: int = int(os.getenv("FETCH_WORKERS", "8"))  # Concurrent downloads over all hosts
+    TIMEOUT: float = float(os.getenv("FETCH_TIMEOUT", "30"))  # Seconds per socket operation
+    MAX_REDIRECTS: int = 5
+    USER_AGENT: str = "rag-agent/0.1"
+
+
+class IndexerConfig:
+    # Chunks are written in batches as they are embedded, with a checkpoint per document
+    BATCH_SIZE: int = int(os.getenv("INDEX_BATCH_SIZE", "64"))  # Rows held in memory before they are written
+    CHECKPOINTS: bool = os.getenv("INDEX_CHECKPOINTS", "true").lower() == "true"  # Resume interrupted documents
+
+
+class ConversionConfig:
+    # Each document is converted with the cheapest docling pipeline that handles its format
+    FAST_PATHS: bool = os.getenv("CONVERSION_FAST_PATHS", "true").lower() == "true"  # False: full pipeline for all
+    SCANNED_SAMPLE_PAGES: int = 3  # First pages whose text layer decides whether a PDF is scanned
+    SCANNED_MIN_CHARS: int = 32  # Fewer text characters per sampled page than this means scanned
+    # Warm worker processes converting documents, docling holds the GIL for much of a PDF
+    WORKERS: int = int(os.getenv("CONVERSION_WORKERS", "0"))  # 0 converts in the indexer's process
+    TASK_TIMEOUT: float = float(os.getenv("CONVERSION_TIMEOUT", "600"))  # Seconds per document, then the worker is killed
+    MAX_TASKS_PER_WORKER: int = int(os.getenv("CONVERSION_MAX_TASKS_PER_WORKER", "50"))  # Then restarted, 0 never
+    WARM_PROFILES: list = os.getenv("CONVERSION_WARM_PROFILES", "light,digital").split(",")  # Loaded at worker start
+    WORKER_START_TIMEOUT: float = 300  # Seconds a worker may take to load its models
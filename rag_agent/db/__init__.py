@@ -1,5 +1,16 @@
+from rag_agent.config import DeploymentConfig
 from rag_agent.db.connection import DuckDBConnection
-from rag_agent.db.models import DocumentModel
+from rag_agent.db.snapshots import PublishScheduler
+from rag_agent.db.shards import shard_models
+from rag_agent.db.models import (
+    DocumentModel,
+    CorpusStateModel,
+    IndexCheckpointModel,
+    AnswerCacheModel,
+    SummaryCacheModel,
+    DocumentSummaryModel,
+    QueryLogModel,
+)
 
 
 def get_connection():
@@ -8,14 +19,51 @@ def get_connection():
     return conn
 
 
+def get_cursor():
+    """Get a cursor bound to the calling thread, safe to use concurrently"""
+    db = DuckDBConnection()
+    return db.cursor()
+
+
+def get_write_lock():
+    """Lock that serializes write transactions across threads"""
+    return DuckDBConnection().write_lock
+
+
 def create_schema(conn):
     """Initialize database schema for vector search"""
-    DocumentModel.create_table_if_not_exists(conn)
+    for model in shard_models(DocumentModel):
+        model.create_table_if_not_exists(conn)
+    CorpusStateModel.create_table_if_not_exists(conn)
+    IndexCheckpointModel.create_table_if_not_exists(conn)
+    AnswerCacheModel.create_table_if_not_exists(conn)
+    SummaryCacheModel.create_table_if_not_exists(conn)
+    DocumentSummaryModel.create_table_if_not_exists(conn)
+    QueryLogModel.create_table_if_not_exists(conn)
     return True
 
 
+def publish_snapshot():
+    """Publish a new read-only snapshot generation for reader processes"""
+    return DuckDBConnection().publish()
+
+
+_publish_scheduler = PublishScheduler(publish_snapshot)
+
+
+def request_publish():
+    """Publish a snapshot with the writes committed so far, coalesced with other requests"""
+    _publish_scheduler.request()
+
+
 def init_db():
+    if DeploymentConfig.ROLE == "reader":
+        # Snapshots are read-only, the writer owns the schema
+        return get_connection()
+
     conn = get_connection()
     conn.execute("SET hnsw_enable_experimental_persistence = true")
     create_schema(conn)
+    if DeploymentConfig.ROLE == "writer":
+        publish_snapshot()
     return conn
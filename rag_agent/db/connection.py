@@ -1,41 +1,153 @@
 import duckdb
 import os
-from rag_agent.config import DuckDBConfig
+import threading
+import time
+import weakref
+from rag_agent.config import DuckDBConfig, DeploymentConfig
+from rag_agent.db.snapshots import current_snapshot, publish_snapshot
 
 class DuckDBConnection:
     _instance = None
-    
+    _instance_lock = threading.Lock()
+
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(DuckDBConnection, cls).__new__(cls)
-            cls._instance.conn = None
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(DuckDBConnection, cls).__new__(cls)
+                cls._instance.conn = None
+                cls._instance._lock = threading.RLock()
+                cls._instance.write_lock = threading.RLock()
+                cls._instance._local = threading.local()
+                cls._instance._cursors = []
+                cls._instance.generation = None
+                cls._instance._checked_at = 0.0
+                cls._instance._retired = []
         return cls._instance
-    
+
     def connect(self):
         """Create a connection to DuckDB database with vector search extension"""
-        if self.conn is None:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(DuckDBConfig.DUCKDB_PATH), exist_ok=True)
-            
-            # Connect to database
-            self.conn = duckdb.connect(DuckDBConfig.DUCKDB_PATH)
-            
-            # Install and load VSS extension
-            self.conn.execute("INSTALL vss;")
-            self.conn.execute("LOAD vss;")
-            
-            # Register array type for embeddings
-            embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
-            try:
-                self.conn.execute(f"CREATE TYPE embedding AS {embedding_type}")
-            except Exception as e:
-                if "already exists" not in str(e).lower():
-                    raise e
-        
+        with self._lock:
+            if DeploymentConfig.ROLE == "reader":
+                self._refresh_snapshot()
+            elif self.conn is None:
+                # Ensure directory exists
+                os.makedirs(os.path.dirname(DuckDBConfig.DUCKDB_PATH), exist_ok=True)
+
+                # Connect to database
+                self.conn = duckdb.connect(DuckDBConfig.DUCKDB_PATH)
+
+                # Install and load VSS extension
+                self.conn.execute("INSTALL vss;")
+                self.conn.execute("LOAD vss;")
+
+                # Register array type for embeddings
+                embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+                try:
+                    self.conn.execute(f"CREATE TYPE embedding AS {embedding_type}")
+                except Exception as e:
+                    if "already exists" not in str(e).lower():
+                        raise e
+
         return self.conn
-    
+
+    def _refresh_snapshot(self):
+        """Open the latest published snapshot read-only, if it changed since the last check"""
+        now = time.monotonic()
+        if self.conn is not None and now - self._checked_at < DeploymentConfig.SNAPSHOT_REFRESH_INTERVAL:
+            return
+        self._checked_at = now
+
+        generation, path = current_snapshot()
+        if generation is None:
+            if self.conn is not None:
+                return
+            raise RuntimeError(
+                f"No snapshot published in {DeploymentConfig.SNAPSHOT_DIR}. Start the writer process first."
+            )
+        if generation == self.generation:
+            return
+
+        conn = duckdb.connect(path, read_only=True)
+        conn.execute("INSTALL vss;")
+        conn.execute("LOAD vss;")
+
+        # Keep the previous generation open so in-flight queries on it can finish,
+        # and release anything older
+        if self.conn is not None:
+            self._retired.append(self.conn)
+        while len(self._retired) > 1:
+            self._close_connection(self._retired.pop(0))
+
+        self.conn = conn
+        self.generation = generation
+
+    def _close_connection(self, conn):
+        """Close a connection together with the cursors created from it"""
+        remaining = []
+        for parent, cursor in self._cursors:
+            if parent is conn:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            else:
+                remaining.append((parent, cursor))
+        self._cursors = remaining
+        conn.close()
+
+    def publish(self):
+        """Publish the current database state as a new snapshot generation (writer role)"""
+        conn = self.connect()
+        return publish_snapshot(conn, DuckDBConfig.DUCKDB_PATH, self.write_lock)
+
+    def cursor(self):
+        """
+        Get the cursor bound to the calling thread.
+
+        Every thread gets its own DuckDB cursor on the shared database instance,
+        so queries from different threads run in parallel and transactions opened
+        by one thread are never interleaved with statements from another.
+        Writers should additionally hold `write_lock` to avoid write-write conflicts.
+        The cursor is closed once its thread is gone.
+        """
+        conn = self.connect()
+        local = self._local
+        if getattr(local, "conn", None) is not conn:
+            # First use in this thread, or the connection was reopened
+            with self._lock:
+                cursor = conn.cursor()
+                self._cursors.append((conn, cursor))
+            weakref.finalize(threading.current_thread(), self._release_cursor, cursor)
+            local.conn = conn
+            local.cursor = cursor
+        return local.cursor
+
+    def _release_cursor(self, cursor):
+        """Close the cursor of a thread that ended, unless it was already closed with its connection"""
+        with self._lock:
+            remaining = [(parent, other) for parent, other in self._cursors if other is not cursor]
+            if len(remaining) == len(self._cursors):
+                return
+            self._cursors = remaining
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
\ No newline at end of file
+        """Close the database connection and every cursor handed out"""
+        with self._lock:
+            for _, cursor in self._cursors:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self._cursors = []
+            self._local = threading.local()
+            for conn in self._retired:
+                conn.close()
+            self._retired = []
+            self.generation = None
+            if self.conn:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,215 @@
+"""
+Parquet snapshots of the indexed corpus.
+
+Rebuilding a search node from the source documents means converting, tagging and
+embedding the whole corpus again. Instead, the chunk and summary tables (of every
+collection and shard) are exported to Parquet and bulk-loaded on the new node:
+
+    python -m rag_agent.db.export export backups/2026-10-19 --database data/snapshots/gen-00000042.duckdb
+    python -m rag_agent.db.export import backups/2026-10-19
+
+A snapshot holds one directory per table, partitioned by a hash of the document name
+into Parquet files DuckDB writes in parallel, and a manifest.json with the row counts
+and the embedding settings. Embeddings are stored as fixed-size FLOAT lists.
+
+Import loads every table before building its HNSW index, once, which is much faster
+than maintaining the index row by row. Exporting from a published snapshot file
+avoids stopping the writer, which holds the lock on the live database.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb
+
+from rag_agent.config import DeploymentConfig, DuckDBConfig
+from rag_agent.db.models import (
+    CorpusStateModel, DocumentModel, DocumentSummaryModel, IndexCheckpointModel, model_variant
+)
+from rag_agent.tools.utils.exact_search import remove_exact_files
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+PARTITIONS = 16  # Files per table, DuckDB writes and reads them in parallel
+
+# Base model of the tables exported, every collection and shard table derives its name from it
+EXPORTED_MODELS = (DocumentModel, DocumentSummaryModel)
+
+
+def _quote(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+def table_model(table_name):
+    """Model of an exported table, None if it isn't part of the corpus"""
+    for model in EXPORTED_MODELS:
+        if table_name == model.table_name:
+            return model
+        if table_name.startswith(model.table_name + "_"):
+            return model_variant(model, table_name, f"{table_name}_embedding_idx")
+    return None
+
+
+def corpus_tables(conn):
+    """Chunk and summary tables of every collection and shard in the database"""
+    rows = conn.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_type = 'BASE TABLE' ORDER BY table_name"
+    ).fetchall()
+    return [table_name for (table_name,) in rows if table_model(table_name) is not None]
+
+
+def export_snapshot(conn, path, partitions=PARTITIONS):
+    """
+    Export the corpus to partitioned Parquet files
+
+    Args:
+        conn: DuckDB connection, may be read-only
+        path: Directory to create; it must not already contain a snapshot
+        partitions: Number of hash partitions per table
+
+    Returns:
+        The manifest written to the snapshot
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        raise FileExistsError(f"{path} already contains a snapshot")
+    os.makedirs(path, exist_ok=True)
+
+    tables = {}
+    for table_name in corpus_tables(conn):
+        model = table_model(table_name)
+        columns = ", ".join(model.columns)
+        conn.execute(f"""
+        COPY (
+            SELECT {columns}, hash(doc_name) % {int(partitions)} AS part
+            FROM {table_name}
+        ) TO {_quote(os.path.join(path, table_name))}
+        (FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (part))
+        """)
+        rows = conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+        tables[table_name] = {"rows": rows}
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_dim": DuckDBConfig.EMBEDDING_DIM,
+        "generation": CorpusStateModel.get_generation(conn),
+        "tables": tables,
+    }
+    # Written last, a directory without a manifest is an incomplete export
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    if manifest["embedding_dim"] != DuckDBConfig.EMBEDDING_DIM:
+        raise ValueError(
+            f"Snapshot embeddings have {manifest['embedding_dim']} dimensions, "
+            f"the configured model has {DuckDBConfig.EMBEDDING_DIM}"
+        )
+    return manifest
+
+
+def import_snapshot(conn, path):
+    """
+    Replace the corpus tables with the content of a Parquet snapshot
+
+    The tables of the snapshot are dropped and bulk-loaded in a single transaction,
+    then their HNSW indexes are built. Tables absent from the snapshot are left alone.
+    The exact search files of the tables loaded are deleted, their rowids restarted.
+
+    Args:
+        conn: Read-write DuckDB connection
+        path: Snapshot directory written by export_snapshot
+
+    Returns:
+        Dictionary of table name to rows loaded
+    """
+    manifest = read_manifest(path)
+    embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+
+    loaded = {}
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        for table_name, table in manifest["tables"].items():
+            model = table_model(table_name)
+            if model is None:
+                raise ValueError(f"Unexpected table in snapshot: {table_name}")
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            model.create_table_if_not_exists(conn, with_index=False)
+            if table["rows"]:
+                columns = ", ".join(model.columns)
+                selected = ", ".join(
+                    f"embedding::{embedding_type}" if column == "embedding" else column
+                    for column in model.columns
+                )
+                files = os.path.join(path, table_name, "*", "*.parquet")
+                conn.execute(f"""
+                INSERT INTO {table_name} ({columns})
+                SELECT {selected} FROM read_parquet({_quote(files)}, hive_partitioning = true)
+                """)
+            loaded[table_name] = conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+            if loaded[table_name] != table["rows"]:
+                raise RuntimeError(
+                    f"Snapshot table {table_name} has {loaded[table_name]} rows, expected {table['rows']}"
+                )
+
+        # Anything cached against the previous corpus is now stale, and so is the
+        # progress of documents whose indexing was interrupted
+        CorpusStateModel.create_table_if_not_exists(conn)
+        CorpusStateModel.bump_generation(conn)
+        IndexCheckpointModel.create_table_if_not_exists(conn)
+        conn.execute(f"DELETE FROM {IndexCheckpointModel.table_name}")
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        raise e
+
+    for table_name in manifest["tables"]:
+        remove_exact_files(table_name)
+        table_model(table_name).create_index(conn)
+    return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import the corpus as Parquet")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--database", help="Export from this database or snapshot file, read-only")
+    args = parser.parse_args(argv)
+
+    if args.command == "import" and DeploymentConfig.ROLE == "reader":
+        parser.error("readers search published snapshots, import on the writer")
+
+    if args.command == "export" and args.database:
+        with duckdb.connect(args.database, read_only=True) as conn:
+            conn.execute("INSTALL vss;")
+            conn.execute("LOAD vss;")
+            manifest = export_snapshot(conn, args.path)
+        counts = {table_name: table["rows"] for table_name, table in manifest["tables"].items()}
+    else:
+        from rag_agent.db import get_write_lock, init_db, publish_snapshot
+
+        conn = init_db()
+        if args.command == "export":
+            manifest = export_snapshot(conn, args.path)
+            counts = {table_name: table["rows"] for table_name, table in manifest["tables"].items()}
+        else:
+            with get_write_lock():
+                counts = import_snapshot(conn, args.path)
+            if DeploymentConfig.ROLE == "writer":
+                publish_snapshot()
+
+    for table_name, rows in counts.items():
+        print(f"{table_name}: {rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
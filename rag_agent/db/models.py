@@ -1,13 +1,99 @@
+import re
+import weakref
+import numpy as np
 from rag_agent.config import DuckDBConfig
 
+# A name can't end like a shard table ("_shard1"), or a collection and a shard of another would share a table
+COLLECTION_NAME_PATTERN = re.compile(r"^(?!.*_shard\d+$)[a-z0-9_]{1,48}$")
+
+# Distance function an HNSW index built with each metric can accelerate
+DISTANCE_FUNCTIONS = {
+    "l2sq": "array_distance",
+    "cosine": "array_cosine_distance",
+    "ip": "array_negative_inner_product",
+}
+
+
+def distance_function():
+    """Distance function matching the configured index metric, so searches use the index"""
+    return DISTANCE_FUNCTIONS.get(DuckDBConfig.VSS_METRIC, "array_distance")
+
+
+_model_variants = {}
+
+
+def model_variant(model, table_name, index_name=None):
+    """Subclass of a model class stored in another table, created once per table"""
+    variant = _model_variants.get(table_name)
+    if variant is None:
+        attributes = {"table_name": table_name}
+        if index_name is not None:
+            attributes["index_name"] = index_name
+        variant = type(model.__name__, (model,), attributes)
+        _model_variants[table_name] = variant
+    return variant
+
+
+def collection_table(table_name, collection):
+    """Table name of a collection. The default collection (None) is the table itself"""
+    if collection is None:
+        return table_name
+    if not COLLECTION_NAME_PATTERN.match(collection):
+        raise ValueError(
+            f"Invalid collection name {collection!r}: use 1 to 48 lowercase letters, digits or underscores, "
+            "not ending in _shard<number>"
+        )
+    return f"{table_name}__{collection}"
+
+
+# Connections whose session has a per-query search breadth, to reset for the next default search
+_tuned_connections = weakref.WeakSet()
+
+
+def set_ef_search(conn, ef_search):
+    """Set the HNSW search breadth for the following searches on this connection, None for the default"""
+    if ef_search is not None:
+        conn.execute(f"SET SESSION hnsw_ef_search = {int(ef_search)}")
+        _tuned_connections.add(conn)
+    elif conn in _tuned_connections:
+        conn.execute("RESET SESSION hnsw_ef_search")
+        _tuned_connections.discard(conn)
+
+
 class DocumentModel:
     """Model for document chunks with vector embeddings"""
     table_name = "document_chunks"
     index_name = "document_chunks_embedding_idx"
+    columns = ("doc_name", "chunk_text", "named_entities", "embedding", "chunk_index")
+
+    @classmethod
+    def collection(cls, name):
+        """
+        Model of a named collection, with its own table and HNSW index
+
+        None is the default collection, stored in the original table.
+        """
+        table_name = collection_table(DocumentModel.table_name, name)
+        if table_name == cls.table_name:
+            return cls
+        return model_variant(DocumentModel, table_name, f"{table_name}_embedding_idx")
+
+    @classmethod
+    def shard(cls, number):
+        """Model of one shard table. Shard 0 is the table itself, so unsharded databases stay valid"""
+        if number == 0:
+            return cls
+        table_name = f"{cls.table_name}_shard{number}"
+        return model_variant(cls, table_name, f"{table_name}_embedding_idx")
     
     @classmethod
-    def create_table_if_not_exists(cls, conn):
-        """Create the document chunks table if it doesn't exist"""
+    def create_table_if_not_exists(cls, conn, with_index=True):
+        """
+        Create the document chunks table if it doesn't exist
+
+        Bulk loads pass with_index=False and call create_index afterwards, building the
+        HNSW index once is much faster than maintaining it row by row.
+        """
         embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
         
         conn.execute(f"""
@@ -15,11 +101,20 @@ class DocumentModel:
             doc_name TEXT NOT NULL,
             chunk_text TEXT NOT NULL,
             named_entities JSON,
-            embedding {embedding_type} NOT NULL
+            embedding {embedding_type} NOT NULL,
+            chunk_index INTEGER
         )
         """)
-        
-        # Create HNSW index if it doesn't exist
+
+        # Databases created before chunk positions were stored
+        conn.execute(f"ALTER TABLE {cls.table_name} ADD COLUMN IF NOT EXISTS chunk_index INTEGER")
+
+        if with_index:
+            cls.create_index(conn)
+
+    @classmethod
+    def create_index(cls, conn):
+        """Create the HNSW index if it doesn't exist"""
         try:
             conn.execute(f"""
             CREATE INDEX IF NOT EXISTS {cls.index_name} 
@@ -43,27 +138,36 @@ class DocumentModel:
         """, (doc_name, chunk_text, named_entities, embedding))
 
     @classmethod
-    def insert_document_chunks_batch(cls, conn, chunks):
+    def insert_document_chunks_batch(cls, conn, chunks, transaction=True):
         """
         Insert multiple document chunks in a single batch operation
         
         Args:
             conn: DuckDB connection
-            chunks: List of tuples (doc_name, chunk_text, named_entities, embedding)
+            chunks: List of tuples (doc_name, chunk_text, named_entities, embedding[, chunk_index])
+            transaction: Run in a transaction of its own. False if the caller has one open
         
         Returns:
             Number of chunks inserted
         """
+        if not chunks:
+            return 0
+
+        # Prepare a parameterized query
+        columns = cls.columns[: len(chunks[0])]
+        query = f"""
+        INSERT INTO {cls.table_name} ({", ".join(columns)})
+        VALUES ({", ".join("?" for _ in columns)})
+        """
+        if not transaction:
+            for chunk in chunks:
+                conn.execute(query, chunk)
+            return len(chunks)
+
         # Start a transaction for better performance
         conn.execute("BEGIN TRANSACTION")
         
         try:
-            # Prepare a parameterized query
-            query = f"""
-            INSERT INTO {cls.table_name} (doc_name, chunk_text, named_entities, embedding)
-            VALUES (?, ?, ?, ?)
-            """
-            
             # Execute in batch
             count = 0
             for chunk in chunks:
@@ -78,22 +182,561 @@ class DocumentModel:
             # Rollback on error
             conn.execute("ROLLBACK")
             raise e
+
+    @classmethod
+    def delete_document_chunks(cls, conn, doc_name):
+        """Delete every chunk of a document, return the number deleted"""
+        return conn.execute(f"DELETE FROM {cls.table_name} WHERE doc_name = ?", (doc_name,)).fetchone()[0]
     
     @classmethod
-    def search_similar(cls, conn, query_embedding, limit=5, doc_scope=None):
-        """Search for similar document chunks using vector similarity"""
+    def _search_query(cls, doc_scope=None, with_position=False):
         embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
-        
-        result = conn.execute(f"""
+        distance = distance_function()
+
+        return f"""
         SELECT 
             doc_name,
             chunk_text,
             named_entities,
-            array_distance(embedding, ?::{embedding_type}) as distance
+            {distance}(embedding, ?::{embedding_type}) as distance
+            {", chunk_index" if with_position else ""}
         FROM {cls.table_name}
-        {"WHERE doc_name = '"+doc_scope+"'" if doc_scope is not None else ''}
-        ORDER BY array_distance(embedding, ?::{embedding_type})
+        {"WHERE doc_name = ?" if doc_scope is not None else ''}
+        ORDER BY {distance}(embedding, ?::{embedding_type})
         LIMIT ?
-        """, (query_embedding, query_embedding, limit)).fetchall()
+        """
+
+    @staticmethod
+    def _search_params(query_embedding, limit, doc_scope=None):
+        """Parameters of _search_query, in the order of its placeholders"""
+        if doc_scope is None:
+            return (query_embedding, query_embedding, limit)
+        return (query_embedding, doc_scope, query_embedding, limit)
+
+    @classmethod
+    def search_similar(cls, conn, query_embedding, limit=5, doc_scope=None, with_position=False, ef_search=None):
+        """
+        Search for similar document chunks using vector similarity
+
+        Rows are (doc_name, chunk_text, named_entities, distance), followed by
+        chunk_index if with_position is set. ef_search sets the HNSW search breadth
+        (candidates explored per query), higher is slower and more accurate.
+        """
+        set_ef_search(conn, ef_search)
+        result = conn.execute(
+            cls._search_query(doc_scope, with_position),
+            cls._search_params(query_embedding, limit, doc_scope),
+        ).fetchall()
         
-        return result
\ No newline at end of file
+        return result
+
+    @classmethod
+    def count_rows(cls, conn, max_rowid=None):
+        """Number of chunks, only counting rowids up to max_rowid if provided"""
+        return conn.execute(
+            f"SELECT count(*) FROM {cls.table_name} WHERE ?::BIGINT IS NULL OR rowid <= ?",
+            (max_rowid, max_rowid),
+        ).fetchone()[0]
+
+    @classmethod
+    def table_state(cls, conn):
+        """Number of chunks and largest rowid (-1 when empty), which change with every insert or delete"""
+        rows, last_rowid = conn.execute(
+            f"SELECT count(*), coalesce(max(rowid), -1) FROM {cls.table_name}"
+        ).fetchone()
+        return rows, last_rowid
+
+    @classmethod
+    def iter_embeddings(cls, conn, after_rowid=-1, batch_size=10000):
+        """
+        Embeddings in rowid order, in batches
+
+        Yields:
+            Tuples (rowids, embeddings) of numpy arrays, int64 and float32 of shape (n, EMBEDDING_DIM)
+        """
+        while True:
+            batch = conn.execute(f"""
+            SELECT rowid, embedding FROM {cls.table_name}
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+            """, (after_rowid, batch_size)).fetchnumpy()
+            if not len(batch["rowid"]):
+                return
+            rowids = batch["rowid"].astype(np.int64)
+            yield rowids, np.stack(batch["embedding"]).astype(np.float32)
+            after_rowid = int(rowids[-1])
+
+    @classmethod
+    def document_rowids(cls, conn, doc_name):
+        """Rowids of the chunks of a document"""
+        rows = conn.execute(
+            f"SELECT rowid FROM {cls.table_name} WHERE doc_name = ? ORDER BY rowid", (doc_name,)
+        ).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    @classmethod
+    def fetch_rows(cls, conn, rowids, with_position=False):
+        """
+        Chunks by rowid, as (rowid, doc_name, chunk_text, named_entities[, chunk_index]) tuples
+
+        Rows are returned in no particular order.
+        """
+        return conn.execute(f"""
+        SELECT rowid, doc_name, chunk_text, named_entities{", chunk_index" if with_position else ""}
+        FROM {cls.table_name}
+        WHERE rowid IN (SELECT unnest(?::BIGINT[]))
+        """, ([int(rowid) for rowid in rowids],)).fetchall()
+
+    @classmethod
+    def explain_search(cls, conn, query_embedding, limit=5, doc_scope=None):
+        """Physical plan of the similarity search, as text"""
+        rows = conn.execute(
+            "EXPLAIN " + cls._search_query(doc_scope),
+            cls._search_params(query_embedding, limit, doc_scope),
+        ).fetchall()
+        return "\n".join(str(row[-1]) for row in rows)
+
+
+class CorpusStateModel:
+    """Single-row table tracking the corpus generation, bumped whenever the corpus changes"""
+    table_name = "corpus_state"
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn):
+        """Create the corpus state table with generation 0 if it doesn't exist"""
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            generation BIGINT NOT NULL
+        )
+        """)
+        if conn.execute(f"SELECT count(*) FROM {cls.table_name}").fetchone()[0] == 0:
+            conn.execute(f"INSERT INTO {cls.table_name} VALUES (0)")
+
+    @classmethod
+    def get_generation(cls, conn):
+        """Get the current corpus generation"""
+        return conn.execute(f"SELECT generation FROM {cls.table_name}").fetchone()[0]
+
+    @classmethod
+    def bump_generation(cls, conn):
+        """Increment the corpus generation and return the new value"""
+        return conn.execute(
+            f"UPDATE {cls.table_name} SET generation = generation + 1 RETURNING generation"
+        ).fetchone()[0]
+
+
+class IndexCheckpointModel:
+    """Indexing progress of every document, so an interrupted run resumes where it stopped"""
+    table_name = "index_checkpoints"
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn):
+        """Create the checkpoint table if it doesn't exist"""
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            collection TEXT NOT NULL,  -- '' for the default collection
+            doc_name TEXT NOT NULL,
+            version TEXT,
+            chunks_done INTEGER NOT NULL,
+            last_chunk_index INTEGER NOT NULL,
+            completed BOOLEAN NOT NULL,
+            updated_at TIMESTAMP DEFAULT current_timestamp,
+            PRIMARY KEY (collection, doc_name)
+        )
+        """)
+
+    @classmethod
+    def get(cls, conn, doc_name, collection=None):
+        """
+        Checkpoint of a document
+
+        Returns:
+            Dictionary with version, chunks_done, last_chunk_index and completed, None if
+            the document was never indexed into the collection
+        """
+        row = conn.execute(f"""
+        SELECT version, chunks_done, last_chunk_index, completed
+        FROM {cls.table_name}
+        WHERE collection = ? AND doc_name = ?
+        """, (collection or "", doc_name)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("version", "chunks_done", "last_chunk_index", "completed"), row))
+
+    @classmethod
+    def save(cls, conn, doc_name, version, chunks_done, last_chunk_index, completed, collection=None):
+        """
+        Record the progress of a document
+
+        Args:
+            conn: DuckDB connection
+            doc_name: Document being indexed
+            version: Version of the source file the progress applies to
+            chunks_done: Number of chunker chunks whose rows are committed
+            last_chunk_index: chunk_index of the last row committed, -1 if none
+            completed: Whether the whole document is committed
+            collection: Collection of the document, None for the default collection
+        """
+        conn.execute(f"""
+        INSERT OR REPLACE INTO {cls.table_name}
+            (collection, doc_name, version, chunks_done, last_chunk_index, completed, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, current_timestamp)
+        """, (collection or "", doc_name, version, chunks_done, last_chunk_index, completed))
+
+    @classmethod
+    def delete(cls, conn, doc_name, collection=None):
+        conn.execute(
+            f"DELETE FROM {cls.table_name} WHERE collection = ? AND doc_name = ?", (collection or "", doc_name)
+        )
+
+
+class AnswerCacheModel:
+    """Model for cached final answers, looked up by question embedding"""
+    table_name = "answer_cache"
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn):
+        """Create the answer cache table if it doesn't exist"""
+        embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+
+        # Small table, scanned exactly: no HNSW index needed
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            embedding {embedding_type} NOT NULL,
+            corpus_generation BIGINT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT current_timestamp,
+            last_hit_at TIMESTAMP NOT NULL DEFAULT current_timestamp,
+            hits INTEGER NOT NULL DEFAULT 0,
+            collection TEXT
+        )
+        """)
+
+        # Databases created before collections existed
+        conn.execute(f"ALTER TABLE {cls.table_name} ADD COLUMN IF NOT EXISTS collection TEXT")
+
+    @classmethod
+    def find_similar(cls, conn, query_embedding, corpus_generation, min_similarity, ttl_seconds, collection=None):
+        """
+        Find the most similar cached answer that is still valid, answered from the same collection
+
+        Returns:
+            Tuple (rowid, question, answer, similarity), or None
+        """
+        embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+
+        return conn.execute(f"""
+        SELECT rowid, question, answer, similarity
+        FROM (
+            SELECT
+                rowid,
+                question,
+                answer,
+                array_cosine_similarity(embedding, ?::{embedding_type}) AS similarity
+            FROM {cls.table_name}
+            WHERE corpus_generation = ?
+            AND created_at >= current_timestamp::TIMESTAMP - to_seconds(?)
+            AND collection IS NOT DISTINCT FROM ?
+        )
+        WHERE similarity >= ?
+        ORDER BY similarity DESC
+        LIMIT 1
+        """, (query_embedding, corpus_generation, ttl_seconds, collection, min_similarity)).fetchone()
+
+    @classmethod
+    def record_hit(cls, conn, rowid):
+        """Update the hit statistics of a cached answer"""
+        conn.execute(f"""
+        UPDATE {cls.table_name}
+        SET hits = hits + 1, last_hit_at = current_timestamp
+        WHERE rowid = ?
+        """, (rowid,))
+
+    @classmethod
+    def insert_answer(cls, conn, question, answer, embedding, corpus_generation, collection=None):
+        """Insert a final answer"""
+        conn.execute(f"""
+        INSERT INTO {cls.table_name} (question, answer, embedding, corpus_generation, collection)
+        VALUES (?, ?, ?, ?, ?)
+        """, (question, answer, embedding, corpus_generation, collection))
+
+    @classmethod
+    def evict(cls, conn, max_entries, ttl_seconds, corpus_generation):
+        """Delete expired and stale answers, then the least recently hit beyond max_entries"""
+        conn.execute(f"""
+        DELETE FROM {cls.table_name}
+        WHERE corpus_generation <> ?
+        OR created_at < current_timestamp::TIMESTAMP - to_seconds(?)
+        """, (corpus_generation, ttl_seconds))
+        conn.execute(f"""
+        DELETE FROM {cls.table_name}
+        WHERE rowid IN (
+            SELECT rowid FROM {cls.table_name}
+            ORDER BY last_hit_at DESC
+            OFFSET ?
+        )
+        """, (max_entries,))
+
+
+class SummaryCacheModel:
+    """Model for cached summaries, addressed by a hash of everything that determines them"""
+    table_name = "summary_cache"
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn):
+        """Create the summary cache table if it doesn't exist"""
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            key TEXT PRIMARY KEY,
+            model_id TEXT NOT NULL,
+            query TEXT,
+            text TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            last_used_at TIMESTAMP NOT NULL DEFAULT current_timestamp
+        )
+        """)
+
+    @classmethod
+    def get_summary(cls, conn, key):
+        """Get a cached summary, or None"""
+        row = conn.execute(
+            f"SELECT summary FROM {cls.table_name} WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def touch(cls, conn, key):
+        """Mark a cached summary as recently used"""
+        conn.execute(
+            f"UPDATE {cls.table_name} SET last_used_at = current_timestamp WHERE key = ?", (key,)
+        )
+
+    @classmethod
+    def find_contained(cls, conn, text, model_id, query, min_chars):
+        """
+        Find the longest cached text contained in the given text, for the same model and query
+
+        Returns:
+            Tuple (text, summary), or None
+        """
+        return conn.execute(f"""
+        SELECT text, summary
+        FROM {cls.table_name}
+        WHERE model_id = ?
+        AND query IS NOT DISTINCT FROM ?
+        AND length(text) >= ?
+        AND length(text) < length(?)
+        AND contains(?, text)
+        ORDER BY length(text) DESC
+        LIMIT 1
+        """, (model_id, query, min_chars, text, text)).fetchone()
+
+    @classmethod
+    def insert_summary(cls, conn, key, model_id, query, text, summary):
+        """Insert or replace a summary"""
+        conn.execute(f"""
+        INSERT OR REPLACE INTO {cls.table_name} (key, model_id, query, text, summary)
+        VALUES (?, ?, ?, ?, ?)
+        """, (key, model_id, query, text, summary))
+
+    @classmethod
+    def evict(cls, conn, max_entries):
+        """Delete the least recently used summaries beyond max_entries"""
+        conn.execute(f"""
+        DELETE FROM {cls.table_name}
+        WHERE key IN (
+            SELECT key FROM {cls.table_name}
+            ORDER BY last_used_at DESC
+            OFFSET ?
+        )
+        """, (max_entries,))
+
+
+class DocumentSummaryModel:
+    """Model for section and document summaries with vector embeddings"""
+    table_name = "document_summaries"
+    index_name = "document_summaries_embedding_idx"
+    columns = ("doc_name", "level", "section", "summary_text", "embedding")
+
+    @classmethod
+    def collection(cls, name):
+        """Model of the summaries of a named collection, None for the default collection"""
+        table_name = collection_table(DocumentSummaryModel.table_name, name)
+        if table_name == cls.table_name:
+            return cls
+        return model_variant(DocumentSummaryModel, table_name, f"{table_name}_embedding_idx")
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn, with_index=True):
+        """Create the document summaries table if it doesn't exist"""
+        embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            doc_name TEXT NOT NULL,
+            level TEXT NOT NULL,
+            section TEXT,
+            summary_text TEXT NOT NULL,
+            embedding {embedding_type} NOT NULL
+        )
+        """)
+
+        if with_index:
+            cls.create_index(conn)
+
+    @classmethod
+    def create_index(cls, conn):
+        """Create the HNSW index if it doesn't exist"""
+        try:
+            conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS {cls.index_name}
+            ON {cls.table_name}
+            USING HNSW (embedding)
+            WITH (
+                metric = '{DuckDBConfig.VSS_METRIC}',
+                m = {DuckDBConfig.VSS_M},
+                ef_construction = {DuckDBConfig.VSS_EF_CONSTRUCTION}
+            )
+            """)
+        except Exception as e:
+            print(f"Warning: Could not create HNSW index: {e}")
+
+    @classmethod
+    def replace_document_summaries(cls, conn, doc_name, summaries):
+        """
+        Replace all summaries of a document in a single transaction
+
+        Args:
+            conn: DuckDB connection
+            doc_name: Document the summaries belong to
+            summaries: List of tuples (level, section, summary_text, embedding)
+
+        Returns:
+            Number of summaries inserted
+        """
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(f"DELETE FROM {cls.table_name} WHERE doc_name = ?", (doc_name,))
+            conn.executemany(f"""
+            INSERT INTO {cls.table_name} (doc_name, level, section, summary_text, embedding)
+            VALUES (?, ?, ?, ?, ?)
+            """, [(doc_name, *summary) for summary in summaries])
+            conn.execute("COMMIT")
+            return len(summaries)
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            raise e
+
+    @classmethod
+    def search_similar(cls, conn, query_embedding, limit=2, doc_scope=None):
+        """Search for similar summaries using vector similarity, with the default HNSW search breadth"""
+        embedding_type = f"FLOAT[{DuckDBConfig.EMBEDDING_DIM}]"
+        distance = distance_function()
+        set_ef_search(conn, None)
+
+        return conn.execute(f"""
+        SELECT
+            doc_name,
+            level,
+            section,
+            summary_text,
+            {distance}(embedding, ?::{embedding_type}) as distance
+        FROM {cls.table_name}
+        {"WHERE doc_name = ?" if doc_scope is not None else ""}
+        ORDER BY {distance}(embedding, ?::{embedding_type})
+        LIMIT ?
+        """, (
+            (query_embedding, doc_scope, query_embedding, limit)
+            if doc_scope is not None
+            else (query_embedding, query_embedding, limit)
+        )).fetchall()
+
+
+class QueryLogModel:
+    """Model for slow searches, with per-phase timings and candidate diagnostics"""
+    table_name = "query_log"
+
+    @classmethod
+    def create_table_if_not_exists(cls, conn):
+        """Create the query log table if it doesn't exist"""
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cls.table_name} (
+            logged_at TIMESTAMP NOT NULL DEFAULT current_timestamp,
+            query_text TEXT NOT NULL,
+            doc_scope TEXT,
+            total_ms DOUBLE NOT NULL,
+            ner_ms DOUBLE,
+            embed_ms DOUBLE,
+            sql_ms DOUBLE,
+            rerank_ms DOUBLE,
+            candidates INTEGER,
+            returned INTEGER,
+            distances DOUBLE[],
+            index_used BOOLEAN,
+            query_plan TEXT
+        )
+        """)
+
+    @classmethod
+    def insert_entry(cls, conn, entry):
+        """
+        Insert a log entry
+
+        Args:
+            conn: DuckDB connection
+            entry: Dictionary with the column values, missing columns are NULL
+        """
+        columns = [column for column in entry if column != "logged_at"]
+        conn.execute(f"""
+        INSERT INTO {cls.table_name} ({", ".join(columns)})
+        VALUES ({", ".join("?" for _ in columns)})
+        """, [entry[column] for column in columns])
+
+    @classmethod
+    def worst(cls, conn, limit=10, since_hours=None):
+        """Slowest logged searches, most recent first among equal latencies"""
+        return conn.execute(f"""
+        SELECT logged_at, query_text, doc_scope, total_ms, ner_ms, embed_ms, sql_ms, rerank_ms,
+               candidates, returned, distances, index_used
+        FROM {cls.table_name}
+        WHERE ?::DOUBLE IS NULL OR logged_at >= current_timestamp::TIMESTAMP - to_seconds(?::DOUBLE * 3600)
+        ORDER BY total_ms DESC, logged_at DESC
+        LIMIT ?
+        """, (since_hours, since_hours, limit)).fetchall()
+
+    @classmethod
+    def summary(cls, conn, since_hours=None):
+        """
+        Aggregates over the logged searches
+
+        Returns:
+            Tuple (count, p50_ms, p95_ms, max_ms, avg ner/embed/sql/rerank ms, searches without index)
+        """
+        return conn.execute(f"""
+        SELECT
+            count(*),
+            quantile_cont(total_ms, 0.5),
+            quantile_cont(total_ms, 0.95),
+            max(total_ms),
+            avg(ner_ms),
+            avg(embed_ms),
+            avg(sql_ms),
+            avg(rerank_ms),
+            count(*) FILTER (WHERE NOT index_used)
+        FROM {cls.table_name}
+        WHERE ?::DOUBLE IS NULL OR logged_at >= current_timestamp::TIMESTAMP - to_seconds(?::DOUBLE * 3600)
+        """, (since_hours, since_hours)).fetchone()
+
+    @classmethod
+    def evict(cls, conn, max_entries):
+        """Delete the oldest entries beyond max_entries"""
+        conn.execute(f"""
+        DELETE FROM {cls.table_name}
+        WHERE rowid IN (
+            SELECT rowid FROM {cls.table_name}
+            ORDER BY logged_at DESC
+            OFFSET ?
+        )
+        """, (max_entries,))
@@ -0,0 +1,139 @@
+"""
+Sharding of document chunks.
+
+With VECTOR_SHARDS > 1, chunks are stored in several tables of the same database
+(document_chunks, document_chunks_shard1, ...), each with its own HNSW index. A
+document always lives in a single shard, chosen by a hash of its name, so a
+doc-scoped search only touches one index and unscoped searches fan out over smaller
+ones in parallel.
+
+Changing the number of shards changes the routing of existing documents; move them
+with `python -m rag_agent.db.shards rebalance`, which rebalances the default
+collection and every named one.
+"""
+import argparse
+import hashlib
+import re
+import sys
+
+from rag_agent.config import ShardConfig
+from rag_agent.db.models import CorpusStateModel, DocumentModel
+
+
+def shard_for(doc_name, num_shards=None):
+    """Shard a document is routed to. Stable across processes, unlike hash()"""
+    num_shards = num_shards or ShardConfig.NUM_SHARDS
+    digest = hashlib.sha1(doc_name.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_models(model=DocumentModel, num_shards=None):
+    """Models of every shard, in shard order"""
+    return [model.shard(number) for number in range(num_shards or ShardConfig.NUM_SHARDS)]
+
+
+def model_for(doc_name, model=DocumentModel, num_shards=None):
+    """Model of the shard a document is routed to"""
+    return model.shard(shard_for(doc_name, num_shards))
+
+
+def existing_shards(conn, model=DocumentModel):
+    """Numbers of the shard tables present in the database"""
+    pattern = re.compile(rf"^{re.escape(model.table_name)}(?:_shard(\d+))?$")
+    rows = conn.execute("SELECT table_name FROM information_schema.tables").fetchall()
+    numbers = []
+    for (table_name,) in rows:
+        match = pattern.match(table_name)
+        if match:
+            numbers.append(int(match.group(1) or 0))
+    return sorted(numbers)
+
+
+def existing_collections(conn, model=DocumentModel):
+    """Names of the collections with tables in the database, sorted"""
+    pattern = re.compile(rf"^{re.escape(model.table_name)}__([a-z0-9_]+?)(?:_shard\d+)?$")
+    rows = conn.execute("SELECT table_name FROM information_schema.tables").fetchall()
+    return sorted({match.group(1) for (table_name,) in rows if (match := pattern.match(table_name))})
+
+
+def collection_models(conn, model=DocumentModel):
+    """Model of the default collection, followed by the models of the named collections"""
+    return [model] + [model.collection(name) for name in existing_collections(conn, model)]
+
+
+def rebalance(conn, model=DocumentModel, num_shards=None):
+    """
+    Move documents to the shard they are routed to, after the number of shards changed
+
+    Shards beyond the configured number are emptied and dropped. Each document is moved
+    in its own transaction, so the rebalance can be interrupted and run again.
+
+    Returns:
+        Dictionary of document name to (source shard, target shard) for every moved document
+    """
+    num_shards = num_shards or ShardConfig.NUM_SHARDS
+    for target in shard_models(model, num_shards):
+        target.create_table_if_not_exists(conn)
+
+    moved = {}
+    for number in existing_shards(conn, model):
+        source = model.shard(number)
+        doc_names = [
+            row[0]
+            for row in conn.execute(f"SELECT DISTINCT doc_name FROM {source.table_name}").fetchall()
+        ]
+        for doc_name in doc_names:
+            target_number = shard_for(doc_name, num_shards)
+            if target_number == number:
+                continue
+            target = model.shard(target_number)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                conn.execute(f"""
+                INSERT INTO {target.table_name} ({", ".join(model.columns)})
+                SELECT {", ".join(model.columns)} FROM {source.table_name} WHERE doc_name = ?
+                """, (doc_name,))
+                conn.execute(f"DELETE FROM {source.table_name} WHERE doc_name = ?", (doc_name,))
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                raise e
+            moved[doc_name] = (number, target_number)
+
+        if number >= num_shards:
+            conn.execute(f"DROP TABLE {source.table_name}")
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage document chunk shards")
+    parser.add_argument("command", choices=["rebalance", "status"])
+    parser.add_argument("--shards", type=int, help="Number of shards (default: VECTOR_SHARDS)")
+    args = parser.parse_args(argv)
+
+    from rag_agent.db import get_write_lock, init_db
+
+    conn = init_db()
+    num_shards = args.shards or ShardConfig.NUM_SHARDS
+    models = collection_models(conn)
+    if args.command == "rebalance":
+        with get_write_lock():
+            moved = {model.table_name: rebalance(conn, model, num_shards) for model in models}
+            if any(moved.values()):
+                # Searchers derive state from the chunk tables (answer cache, exact search files)
+                CorpusStateModel.bump_generation(conn)
+        print(f"Moved {sum(len(documents) for documents in moved.values())} documents")
+        for table_name, documents in moved.items():
+            for doc_name, (source, target) in sorted(documents.items()):
+                print(f"  {table_name} {doc_name}: shard {source} -> {target}")
+
+    for model in models:
+        for number in existing_shards(conn, model):
+            table_name = model.shard(number).table_name
+            count = conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+            print(f"Shard {number} ({table_name}): {count} chunks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from rag_agent.config import DeploymentConfig
+from rag_agent.metrics import span
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+# Serializes publishes of this process, from choosing the generation to the pointer swap
+_publish_lock = threading.Lock()
+
+
+def snapshot_path(generation):
+    """Path of the snapshot file for a given generation"""
+    return os.path.join(DeploymentConfig.SNAPSHOT_DIR, f"gen-{generation:08d}.duckdb")
+
+
+def current_snapshot():
+    """
+    Read the latest published snapshot
+
+    Returns:
+        Tuple (generation, path), or (None, None) if nothing was published yet
+    """
+    try:
+        with open(os.path.join(DeploymentConfig.SNAPSHOT_DIR, CURRENT_FILE)) as f:
+            generation = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None, None
+    return generation, snapshot_path(generation)
+
+
+def publish_snapshot(conn, db_path, write_lock):
+    """
+    Publish a consistent copy of the database for read-only searchers
+
+    The write lock is only held for a checkpoint, so no transaction is half-written
+    into the database file. Until the copy is done automatic checkpoints are suspended:
+    commits meanwhile only append to the WAL (or write blocks the checkpointed state
+    doesn't use), and the file copied is the checkpointed state. The CURRENT pointer is
+    swapped atomically, readers therefore always see either the previous or the new
+    generation. Concurrent publishes of this process run one after the other.
+
+    Args:
+        conn: Read-write DuckDB connection owning db_path
+        db_path: Path of the database file
+        write_lock: Lock serializing writers
+
+    Returns:
+        The new generation number
+    """
+    with _publish_lock:
+        os.makedirs(DeploymentConfig.SNAPSHOT_DIR, exist_ok=True)
+        generation, _ = current_snapshot()
+        generation = 0 if generation is None else generation + 1
+        target = snapshot_path(generation)
+
+        with write_lock:
+            conn.execute("CHECKPOINT")
+            threshold = conn.execute("SELECT current_setting('checkpoint_threshold')").fetchone()[0]
+            conn.execute("SET checkpoint_threshold = '1000TB'")
+        try:
+            shutil.copyfile(db_path, target + ".tmp")
+        finally:
+            conn.execute(f"SET checkpoint_threshold = '{threshold}'")
+        os.replace(target + ".tmp", target)
+
+        pointer = os.path.join(DeploymentConfig.SNAPSHOT_DIR, CURRENT_FILE)
+        with open(pointer + ".tmp", "w") as f:
+            f.write(str(generation))
+        os.replace(pointer + ".tmp", pointer)
+
+        # Drop old generations. Readers still holding one open keep reading it,
+        # since the file is only unlinked.
+        for old in range(generation - DeploymentConfig.SNAPSHOT_KEEP, -1, -1):
+            path = snapshot_path(old)
+            if not os.path.exists(path):
+                break
+            os.remove(path)
+
+    return generation
+
+
+class PublishScheduler:
+    """
+    Coalesces publish requests: at most one publish per interval, in a background thread
+
+    A request made while a publish is pending is covered by it. Otherwise the publish
+    runs right away, or once the interval since the previous one has passed.
+    """
+
+    def __init__(self, publish, interval=None):
+        self._publish = publish
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_started = float("-inf")
+
+    @property
+    def interval(self):
+        return DeploymentConfig.SNAPSHOT_PUBLISH_INTERVAL if self._interval is None else self._interval
+
+    def request(self):
+        """Publish the writes committed so far, soon"""
+        with self._lock:
+            if self._timer is not None:
+                return
+            delay = max(0.0, self._last_started + self.interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            # Requests from now on need another publish, this one may miss their writes
+            self._timer = None
+            self._last_started = time.monotonic()
+        try:
+            with span("snapshot", "publish"):
+                self._publish()
+        except Exception as e:
+            logger.warning(f"Failed to publish snapshot: {e}")
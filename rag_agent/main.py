@@ -6,26 +6,110 @@ from rag_agent.tools.summarizer import SummarizerTool
 from smolagents import HfApiModel, CodeAgent #, MLXModel
 
 from rag_agent.db import init_db
+from rag_agent.db.models import COLLECTION_NAME_PATTERN
+from rag_agent.config import (
+    DeploymentConfig,
+    ToolCacheConfig,
+    AnswerCacheConfig,
+    SummaryCacheConfig,
+    SummaryTreeConfig,
+    SearchTunerConfig,
+    CollectionConfig,
+    StartupConfig,
+    ConversionConfig,
+)
+from rag_agent.writer import start_writer_server
+from rag_agent.tools.utils.executor import run_blocking_io
+from rag_agent.streaming import stream_agent_events
+from rag_agent.tools.utils.answer_cache import SemanticAnswerCache
+from rag_agent.tools.utils.tool_cache import ConversationCaches, memoize_tool
+from rag_agent.tools.utils.summary_cache import SummaryCache
+from rag_agent.tools.utils.search_tuner import SearchTuner
+from rag_agent.metrics import span, start_exporters
+from rag_agent.startup import startup, start_health_server, warm_indexes
+from rag_agent.tools.utils.embeddings import load_model
+from rag_agent.tools.utils.ner import load_pipeline
+from rag_agent.tools.utils.conversion_pool import get_conversion_pool
 
 inference_endpoint = os.getenv("INFERENCE_ENDPOINT", "Qwen/Qwen2.5-72B-Instruct")
 
-init_db() 
+conversation_caches = ConversationCaches()
+answer_cache = SemanticAnswerCache()
+summary_cache = SummaryCache() if SummaryCacheConfig.ENABLED else None
+search_tuner = SearchTuner() if SearchTunerConfig.ENABLED else None
+
+
+def build_indexer(model, collection=None):
+    summarizer = (
+        SummarizerTool(model=model, cache=summary_cache) if SummaryTreeConfig.ENABLED else None
+    )
+    return DocumentIndexer(summarizer=summarizer, collection=collection)
+
+
+def start_writer():
+    start_writer_server(build_indexer(HfApiModel(model_id=inference_endpoint)))
+
+
+def startup_phases():
+    """Chains of startup phases: the database and its indexes, and each model"""
+    database_phases = [("database", init_db)]
+    if StartupConfig.WARM_INDEXES:
+        database_phases.append(("indexes", warm_indexes))
+    if DeploymentConfig.ROLE == "writer":
+        database_phases.append(("writer_server", start_writer))
+    model_phases = [[("embedding_model", load_model)], [("ner_model", load_pipeline)]]
+    if ConversionConfig.WORKERS and DeploymentConfig.ROLE != "reader":
+        model_phases.append([("conversion_workers", get_conversion_pool().start)])
+    return [database_phases, *model_phases]
+
+
+def chat(message, history, collection=None, request: gr.Request = None):
+    if not startup.wait(StartupConfig.READY_TIMEOUT):
+        yield [{"role": "assistant", "content": "The assistant is still starting up, please try again shortly."}]
+        return
 
-def chat(message, history):
-    indexing_tool = DocumentIndexer()
-    search_tool = TextRetriever()
+    # Documents are indexed into and searched in the session's collection
+    collection = (collection or "").strip() or CollectionConfig.DEFAULT
+    if collection is not None and not COLLECTION_NAME_PATTERN.match(collection):
+        yield [{"role": "assistant", "content": f"Invalid collection name {collection!r}."}]
+        return
+
+    # Only standalone questions are cached: follow-ups depend on the conversation,
+    # and attached files still need to be indexed
+    cacheable = AnswerCacheConfig.ENABLED and not history and not message["files"]
+    question_embedding = generation = None
+    if cacheable:
+        answer, question_embedding, generation = answer_cache.lookup(message["text"], collection)
+        if answer is not None:
+            yield [{"role": "assistant", "content": answer}]
+            return
 
     # model = MLXModel(model_id="mlx-community/Meta-Llama-3.1-8B-Instruct-bf16")
     # model = MLXModel(model_id="mlx-community/Qwen2.5-Coder-7B-Instruct-bf16")
     model = HfApiModel(model_id=inference_endpoint)
 
-    summarizer_tool = SummarizerTool(model=model)
+    indexing_tool = build_indexer(model, collection)
+    search_tool = TextRetriever(
+        summary_results=SummaryTreeConfig.MAX_RESULTS if SummaryTreeConfig.ENABLED else 0,
+        tuner=search_tuner,
+        collection=collection,
+    )
+
+    summarizer_tool = SummarizerTool(model=model, cache=summary_cache)
+
+    if ToolCacheConfig.ENABLED and request is not None:
+        # Tool results are reused across steps and turns of the same conversation
+        cache = conversation_caches.get(request.session_hash)
+        memoize_tool(search_tool, cache, depends_on_corpus=True)
+        memoize_tool(summarizer_tool, cache)
+        memoize_tool(indexing_tool, cache, cache_if=lambda result: "successfully" in result)
     
     agent = CodeAgent(
         tools=[search_tool, indexing_tool, summarizer_tool],
         model=model,
         max_steps=4,
         verbosity_level=2,
+        stream_outputs=True,
     )
 
     agent.prompt_templates["system_prompt"] = (
@@ -35,30 +119,71 @@ def chat(message, history):
         + "Somtimes you can answer directly without using any tool. "
     )
 
-    response = agent.run(
-        task=message["text"],
-        additional_args=(
-            {
-                "input_document_paths": (
-                    message["files"] if message["files"] else ["No documents provided"]
-                ),
-                "conversation_history": history if history else [],
-            }
+    messages = []
+    with span("agent", "run") as stage:
+        for messages in stream_agent_events(
+            agent,
+            task=message["text"],
+            additional_args=(
+                {
+                    "input_document_paths": (
+                        message["files"] if message["files"] else ["No documents provided"]
+                    ),
+                    "conversation_history": history if history else [],
+                }
+            ),
+        ):
+            yield messages
+        stage.add_items(1)
+
+    # The final answer is the last message, the only one without metadata
+    if cacheable and messages and "metadata" not in messages[-1]:
+        answer_cache.store(message["text"], messages[-1]["content"], question_embedding, collection, generation)
+
+
+async def achat(message, history, collection=None, request: gr.Request = None):
+    # The agent loop is synchronous and mostly waits on the inference endpoint.
+    # Advancing it on the bounded I/O executor keeps the event loop free, so many
+    # conversations are served concurrently without one thread per request.
+    events = chat(message, history, collection, request)
+    while True:
+        messages = await run_blocking_io(next, events, None)
+        if messages is None:
+            break
+        yield messages
+
+
+def build_demo():
+    return gr.ChatInterface(
+        fn=achat,
+        type="messages",
+        multimodal=True,
+        textbox=gr.MultimodalTextbox(
+            file_count="multiple",
+            file_types=["text", ".pdf", ".docx", ".md"],
+            sources=["upload", "microphone"],
         ),
+        additional_inputs=[
+            gr.Textbox(
+                label="Collection",
+                value=CollectionConfig.DEFAULT or "",
+                placeholder="Default collection",
+                info="Lowercase letters, digits and underscores",
+            ),
+        ],
+        concurrency_limit=None,  # Bounded by the executors instead
     )
 
-    return response
 
+def main():
+    start_exporters()
+    if StartupConfig.HEALTH_PORT:
+        start_health_server()
+    # The UI starts right away, the database, indexes and models load in the background
+    startup.run(*startup_phases())
+    build_demo().launch()
 
-demo = gr.ChatInterface(
-    fn=chat,
-    type="messages",
-    multimodal=True,
-    textbox=gr.MultimodalTextbox(
-        file_count="multiple",
-        file_types=["text", ".pdf", ".docx", ".md"],
-        sources=["upload", "microphone"],
-    ),
-)
 
-demo.launch()
+# Conversion workers are spawned and import this module as __mp_main__, which must not start the app
+if __name__ == "__main__":
+    main()
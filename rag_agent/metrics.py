@@ -0,0 +1,289 @@
+"""
+Per-stage timing and throughput metrics.
+
+Stages of the indexer, retriever, summarizer and agent run are wrapped in spans:
+
+    with span("retriever", "embed"):
+        embedding = encode([query])
+
+Spans feed a latency histogram per (component, stage), counters track processed
+items and cache lookups. Everything is exposed in Prometheus text format, on
+METRICS_PORT and/or written to METRICS_FILE.
+
+With METRICS_ENABLED unset, span() returns a shared no-op object and the counter
+helpers return immediately, so instrumentation costs a function call per stage.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag_agent.config import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogram with cumulative buckets and labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, description, label_names=(), buckets=None):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets or MetricsConfig.BUCKETS))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (not cumulative), the last one is +Inf, then sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, *labels):
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                label_text = _format_labels(self.label_names, labels, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.register(
+    Histogram("rag_stage_duration_seconds", "Time spent in a pipeline stage", ("component", "stage"))
+)
+stage_errors = registry.register(
+    Counter("rag_stage_errors_total", "Pipeline stages that raised an exception", ("component", "stage"))
+)
+items_processed = registry.register(
+    Counter("rag_items_processed_total", "Items processed by a pipeline stage", ("component", "stage"))
+)
+cache_requests = registry.register(
+    Counter("rag_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+)
+
+
+class _Span:
+    __slots__ = ("component", "stage", "timings", "_started")
+
+    def __init__(self, component, stage, timings=None):
+        self.component = component
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        if self.timings is not None:
+            self.timings[self.stage] = self.timings.get(self.stage, 0.0) + elapsed
+        if MetricsConfig.ENABLED:
+            stage_seconds.observe(elapsed, self.component, self.stage)
+            if exc_type is not None:
+                stage_errors.inc(self.component, self.stage)
+        return False
+
+    def add_items(self, count):
+        """Count items processed in this stage"""
+        if MetricsConfig.ENABLED:
+            items_processed.inc(self.component, self.stage, value=count)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add_items(self, count):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(component, stage, timings=None):
+    """
+    Time a pipeline stage
+
+    Args:
+        component: Instrumented component, e.g. "indexer" or "retriever"
+        stage: Stage within the component, e.g. "embed" or "search"
+        timings: Optional dictionary the stage duration in seconds is added to, under the
+            stage name. The stage is timed for it even if metrics are disabled
+
+    Returns:
+        Context manager. Its add_items(count) method counts processed items for the stage
+    """
+    if timings is None and not MetricsConfig.ENABLED:
+        return _NULL_SPAN
+    return _Span(component, stage, timings)
+
+
+def observe(component, stage, seconds):
+    """Record the duration of a stage timed elsewhere"""
+    if MetricsConfig.ENABLED:
+        stage_seconds.observe(seconds, component, stage)
+
+
+def count_items(component, stage, count):
+    """Count items processed by a stage outside of a span"""
+    if MetricsConfig.ENABLED:
+        items_processed.inc(component, stage, value=count)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup"""
+    if MetricsConfig.ENABLED:
+        cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+def write_metrics_file(path=None):
+    """Write the metrics atomically to a file, e.g. for the node exporter textfile collector"""
+    path = path or MetricsConfig.FILE
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_metrics_server(host=None, port=None):
+    """
+    Serve /metrics on a background thread
+
+    Returns:
+        The running ThreadingHTTPServer
+    """
+    host = MetricsConfig.HOST if host is None else host
+    port = MetricsConfig.PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_metrics_file_writer(path=None, interval=None):
+    """Write the metrics file every `interval` seconds on a background thread"""
+    path = path or MetricsConfig.FILE
+    interval = MetricsConfig.FILE_INTERVAL if interval is None else interval
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                write_metrics_file(path)
+            except OSError as e:
+                logger.warning(f"Failed to write metrics file: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+    return stop
+
+
+def start_exporters():
+    """Start the configured exporters, if metrics are enabled"""
+    if not MetricsConfig.ENABLED:
+        return
+    if MetricsConfig.PORT:
+        start_metrics_server()
+    if MetricsConfig.FILE:
+        start_metrics_file_writer()
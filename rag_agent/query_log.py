@@ -0,0 +1,153 @@
+"""
+Slow-query log.
+
+Searches slower than QUERY_LOG_THRESHOLD_MS are recorded in the query_log table with
+their per-phase timings, candidate counts, distances and whether the HNSW index was
+used according to EXPLAIN. The report command summarizes the worst offenders:
+
+    python -m rag_agent.query_log --limit 20 --since-hours 24
+
+DuckDB allows a single process per database file, so point --database at a
+published snapshot (or stop the app) to read the log of a running deployment.
+"""
+import argparse
+import logging
+import sys
+
+import duckdb
+
+from rag_agent.config import DeploymentConfig, DuckDBConfig, QueryLogConfig
+from rag_agent.db.models import QueryLogModel
+from rag_agent.tools.utils.executor import io_executor
+from rag_agent.tools.utils.semantic_search import explain_search, log_query
+
+logger = logging.getLogger(__name__)
+
+# Retriever stages stored in each column
+PHASES = {
+    "ner_ms": ("ner",),
+    "embed_ms": ("embed",),
+    "sql_ms": ("search", "search_summaries"),
+    "rerank_ms": ("rerank",),
+}
+
+
+def plan_uses_index(plan):
+    """Whether a physical plan scans an HNSW index"""
+    return "HNSW_INDEX_SCAN" in plan.upper()
+
+
+class SlowQueryLog:
+    """Records searches slower than a threshold in the query_log table"""
+
+    def __init__(self, threshold_ms=None, explain=None, max_entries=None):
+        self.threshold_ms = QueryLogConfig.THRESHOLD_MS if threshold_ms is None else threshold_ms
+        self.explain = QueryLogConfig.EXPLAIN if explain is None else explain
+        self.max_entries = QueryLogConfig.MAX_ENTRIES if max_entries is None else max_entries
+
+    def record(self, query, doc_scope, timings, total_seconds, candidates, returned, distances,
+               query_embedding=None, limit=None, collection=None):
+        """
+        Record a search if it was slow
+
+        The entry is written on the I/O executor, so the search result isn't delayed further.
+
+        Args:
+            query: Query text
+            doc_scope: Document the search was limited to, or None
+            timings: Dictionary of retriever stage to seconds
+            total_seconds: Latency of the whole search
+            candidates: Rows returned by the similarity query
+            returned: Results left after filtering, reranking and packing
+            distances: Distances of the candidates
+            query_embedding: Query embedding, needed to EXPLAIN the similarity query
+            limit: Limit of the similarity query
+            collection: Collection searched, None for the default collection
+
+        Returns:
+            Future of the write, or None if the search wasn't logged
+        """
+        total_ms = total_seconds * 1000
+        if not QueryLogConfig.ENABLED or total_ms < self.threshold_ms:
+            return None
+        if DeploymentConfig.ROLE == "reader":
+            # Snapshots are read-only
+            return None
+
+        entry = {
+            "query_text": query,
+            "doc_scope": doc_scope,
+            "total_ms": total_ms,
+            **{
+                column: sum(timings[stage] for stage in stages if stage in timings) * 1000
+                if any(stage in timings for stage in stages)
+                else None
+                for column, stages in PHASES.items()
+            },
+            "candidates": candidates,
+            "returned": returned,
+            "distances": [float(distance) for distance in distances],
+        }
+        return io_executor.submit(self._write, entry, query_embedding, limit, collection)
+
+    def _write(self, entry, query_embedding, limit, collection=None):
+        try:
+            if self.explain and query_embedding is not None:
+                plan = explain_search(query_embedding, limit, entry["doc_scope"], collection)
+                entry["query_plan"] = plan
+                entry["index_used"] = plan_uses_index(plan)
+            log_query(entry, self.max_entries)
+        except Exception as e:
+            logger.warning(f"Failed to log slow query: {e}")
+
+
+def _format_ms(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def format_report(summary, worst):
+    """Human readable report of the log aggregates and the slowest searches"""
+    count, p50, p95, max_ms, ner, embed, sql, rerank, without_index = summary
+    if not count:
+        return "No slow queries logged."
+
+    lines = [
+        f"{count} slow searches: p50 {_format_ms(p50)} ms, p95 {_format_ms(p95)} ms, max {_format_ms(max_ms)} ms",
+        f"Average phase times: NER {_format_ms(ner)} ms, embed {_format_ms(embed)} ms, "
+        f"SQL {_format_ms(sql)} ms, rerank {_format_ms(rerank)} ms",
+        f"Searches that did not use the HNSW index: {without_index}",
+        "",
+        "Worst offenders:",
+    ]
+    for (logged_at, query, doc_scope, total_ms, ner_ms, embed_ms, sql_ms, rerank_ms,
+         candidates, returned, distances, index_used) in worst:
+        best = f"{min(distances):.3f}" if distances else "-"
+        index = {True: "yes", False: "NO", None: "?"}[index_used]
+        lines.append(
+            f"  {total_ms:8.1f} ms  {logged_at:%Y-%m-%d %H:%M:%S}  {query!r}"
+            + (f" in {doc_scope}" if doc_scope else "")
+        )
+        lines.append(
+            f"             ner {_format_ms(ner_ms)} / embed {_format_ms(embed_ms)} / "
+            f"sql {_format_ms(sql_ms)} / rerank {_format_ms(rerank_ms)} ms, "
+            f"{candidates} candidates -> {returned} returned, best distance {best}, index used: {index}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the slowest logged searches")
+    parser.add_argument("--database", default=DuckDBConfig.DUCKDB_PATH, help="Database or snapshot file")
+    parser.add_argument("--limit", type=int, default=10, help="Number of searches to list")
+    parser.add_argument("--since-hours", type=float, help="Only consider searches logged in this window")
+    args = parser.parse_args(argv)
+
+    with duckdb.connect(args.database, read_only=True) as conn:
+        summary = QueryLogModel.summary(conn, args.since_hours)
+        worst = QueryLogModel.worst(conn, args.limit, args.since_hours)
+    print(format_report(summary, worst))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
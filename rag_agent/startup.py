@@ -0,0 +1,184 @@
+"""
+Phased startup.
+
+The UI and the health endpoints come up first. Opening the database, loading the
+persisted HNSW indexes, loading the embedding and NER models and warming the
+conversion workers (if any) then run in background threads, and the first query
+doesn't pay for any of them:
+
+    GET /healthz    200 as soon as the process serves requests
+    GET /readyz     200 once every phase completed, 503 before or if a phase failed
+
+Both return the state and duration of every phase as JSON. They are served on
+HEALTH_HOST:HEALTH_PORT, only when HEALTH_PORT is set, and on localhost unless
+HEALTH_HOST says otherwise. Phase durations are also recorded as the "startup"
+component of the stage metrics.
+"""
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag_agent.config import DuckDBConfig, StartupConfig
+from rag_agent.metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """Runs startup phases in the background and tracks their progress"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._failed = False
+
+    def run(self, *chains):
+        """
+        Run the phases in background threads
+
+        Args:
+            chains: Lists of (name, function) tuples. The phases of a chain run in order,
+                chains run concurrently. A failed phase skips the rest of its chain
+
+        Returns:
+            The threads running the chains
+        """
+        with self._lock:
+            for chain in chains:
+                for name, _ in chain:
+                    self.phases[name] = {"state": "pending", "seconds": None, "error": None}
+
+        threads = [
+            threading.Thread(target=self._run_chain, args=(chain,), name=f"startup-{i}", daemon=True)
+            for i, chain in enumerate(chains)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def finish():
+            for thread in threads:
+                thread.join()
+            if not self._failed:
+                self._ready.set()
+            self._done.set()
+            logger.info(self.summary())
+
+        threading.Thread(target=finish, name="startup", daemon=True).start()
+        return threads
+
+    def _run_chain(self, chain):
+        for name, function in chain:
+            if self._failed:
+                self._set(name, state="skipped")
+                continue
+            self._set(name, state="running")
+            began = time.perf_counter()
+            try:
+                function()
+            except Exception as e:
+                logger.exception(f"Startup phase {name} failed")
+                self._failed = True
+                self._set(name, state="failed", seconds=time.perf_counter() - began, error=str(e))
+                continue
+            seconds = time.perf_counter() - began
+            self._set(name, state="done", seconds=seconds)
+            observe("startup", name, seconds)
+
+    def _set(self, name, **values):
+        with self._lock:
+            self.phases[name].update(values)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until startup finished, return whether it succeeded"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self):
+        """Readiness and the state and duration of every phase"""
+        with self._lock:
+            phases = {name: dict(phase) for name, phase in self.phases.items()}
+        return {
+            "ready": self.ready,
+            "failed": self._failed,
+            "uptime_seconds": time.monotonic() - self.started_at,
+            "phases": phases,
+        }
+
+    def summary(self):
+        status = self.status()
+        timings = ", ".join(
+            f"{name} {phase['seconds']:.2f}s" if phase["seconds"] is not None else f"{name} {phase['state']}"
+            for name, phase in status["phases"].items()
+        )
+        outcome = "ready" if status["ready"] else "failed" if status["failed"] else "in progress"
+        return f"Startup {outcome} after {status['uptime_seconds']:.2f}s: {timings}"
+
+
+startup = Startup()
+
+
+class _HealthRequestHandler(BaseHTTPRequestHandler):
+    startup = startup
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            code = 200
+        elif path == "/readyz":
+            code = 200 if self.startup.ready else 503
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(self.startup.status()).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_health_server(startup_state=None, host=None, port=None):
+    """
+    Serve /healthz and /readyz on a background thread
+
+    Returns:
+        The running ThreadingHTTPServer
+    """
+    handler = type(
+        "HealthRequestHandler", (_HealthRequestHandler,), {"startup": startup_state or startup}
+    )
+    host = StartupConfig.HEALTH_HOST if host is None else host
+    port = StartupConfig.HEALTH_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def warm_indexes():
+    """
+    Load the persisted HNSW indexes (and exact search files) of the default collection
+
+    DuckDB deserializes a persisted index on first use, a search per table moves that
+    cost from the first query to startup. Writers first bring the exact search files
+    up to date, searches don't.
+    """
+    from rag_agent.tools.utils.semantic_search import (
+        search_similar_chunks, search_similar_summaries, sync_exact_indexes
+    )
+
+    sync_exact_indexes()
+    probe = [1.0] + [0.0] * (DuckDBConfig.EMBEDDING_DIM - 1)
+    search_similar_chunks(probe, limit=1)
+    search_similar_summaries(probe, limit=1)
@@ -0,0 +1,118 @@
+import copy
+import re
+import time
+from smolagents.memory import ActionStep, FinalAnswerStep, PlanningStep
+from smolagents.models import ChatMessageStreamDelta
+from rag_agent.metrics import observe
+
+DOCUMENT_ORIGIN_PATTERN = re.compile(r"Document of Origin: (.+)")
+
+
+def stream_agent_events(agent, task, additional_args=None):
+    """
+    Run the agent and yield the assistant messages produced so far after every event
+
+    Messages use the Gradio "messages" format. Tool invocations, retrieved documents and
+    the partial model output are collapsible messages (they have a metadata title),
+    the final answer is a plain assistant message.
+
+    Args:
+        agent: smolagents agent. Token deltas are only streamed if it has stream_outputs enabled
+        task: Task for the agent
+        additional_args: Additional arguments passed to the agent run
+
+    Yields:
+        List of message dictionaries
+    """
+    tool_names = [name for name in agent.tools if name != "final_answer"]
+    messages = []
+    partial = None
+    # The model generates from the start of a step until its last token delta,
+    # the rest of the step is spent running tools
+    step_started = time.perf_counter()
+    last_delta = None
+
+    for event in agent.run(task, stream=True, additional_args=additional_args):
+        if isinstance(event, ChatMessageStreamDelta):
+            last_delta = time.perf_counter()
+            if not event.content:
+                continue
+            if partial is None:
+                partial = {
+                    "role": "assistant",
+                    "content": "",
+                    "metadata": {"title": "💭 Thinking", "status": "pending"},
+                }
+                messages.append(partial)
+            partial["content"] += event.content
+        elif isinstance(event, ActionStep):
+            if partial is not None:
+                partial["metadata"]["status"] = "done"
+                partial = None
+            if last_delta is not None:
+                observe("agent", "llm", last_delta - step_started)
+            if event.duration is not None:
+                observe("agent", "step", event.duration)
+            step_started = time.perf_counter()
+            last_delta = None
+            messages.extend(step_messages(event, tool_names))
+        elif isinstance(event, PlanningStep):
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": event.plan,
+                    "metadata": {"title": "🗺️ Plan", "status": "done"},
+                }
+            )
+            if last_delta is not None:
+                observe("agent", "planning", last_delta - step_started)
+            step_started = time.perf_counter()
+            last_delta = None
+        elif isinstance(event, FinalAnswerStep):
+            messages.append({"role": "assistant", "content": str(event.final_answer)})
+        else:
+            continue
+
+        # Gradio diffs consecutive values, so never hand out the list we keep mutating
+        yield copy.deepcopy(messages)
+
+
+def step_messages(step, tool_names):
+    """Build the messages describing one agent step: tool calls, retrieved documents and errors"""
+    messages = []
+    step_title = f"Step {step.step_number}" if step.step_number is not None else "Step"
+
+    if step.tool_calls:
+        code = step.tool_calls[0].arguments
+        code = code if isinstance(code, str) else str(code)
+        used_tools = [name for name in tool_names if f"{name}(" in code]
+        title = f"🛠️ {step_title}: {', '.join(used_tools)}" if used_tools else f"🛠️ {step_title}"
+        messages.append(
+            {
+                "role": "assistant",
+                "content": f"```python\n{code.strip()}\n```",
+                "metadata": {"title": title, "status": "done"},
+            }
+        )
+
+    if step.observations:
+        documents = list(dict.fromkeys(DOCUMENT_ORIGIN_PATTERN.findall(step.observations)))
+        if documents:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": "\n".join(f"- {document.strip()}" for document in documents),
+                    "metadata": {"title": "📚 Retrieved documents", "status": "done"},
+                }
+            )
+
+    if step.error is not None:
+        messages.append(
+            {
+                "role": "assistant",
+                "content": str(step.error),
+                "metadata": {"title": "💥 Error", "status": "done"},
+            }
+        )
+
+    return messages
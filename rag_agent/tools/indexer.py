@@ -1,15 +1,35 @@
 from smolagents import Tool
-from docling.document_converter import DocumentConverter
 from docling.chunking import HybridChunker
-from rag_agent.tools.utils.embeddings import encode
+from rag_agent.tools.utils.embeddings import CHUNK_MAX_TOKENS, encode, encode_chunk
+from rag_agent.tools.utils.embeddings import model as embedding_model
 from rag_agent.tools.utils.ner import extract_entities
-from rag_agent.tools.utils.semantic_search import bulk_insert_chunks
+from rag_agent.tools.utils.semantic_search import (
+    bulk_insert_chunks, discard_document_chunks, get_index_checkpoint, replace_document_summaries
+)
+from rag_agent.config import ConversionConfig, DeploymentConfig, FetchConfig, IndexerConfig
+from rag_agent.db import request_publish
+from rag_agent.writer import forward_index_request
+from rag_agent.tools.utils.executor import run_cpu_bound, io_executor
+from rag_agent.tools.utils.conversion import ProfiledConverter
+from rag_agent.tools.utils.conversion_pool import get_conversion_pool
+from rag_agent.tools.utils.fetcher import FetchResult, get_fetcher, is_url
+from rag_agent.metrics import span
 
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 
+def _document_version(source):
+    """Size and modification time of a local file, None for a URL converted directly"""
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
 class DocumentIndexer(Tool):
     name = "document_indexer"
     description = (
@@ -27,53 +47,274 @@ class DocumentIndexer(Tool):
     }
     output_type = "string"
 
-    def __init__(self, **kwargs):
+    def __init__(self, summarizer=None, collection=None, fetcher=None, **kwargs):
+        """
+        Args:
+            summarizer: Optional SummarizerTool. If provided, a tree of section and document
+                summaries is built in the background for every indexed document
+            collection: Collection documents are indexed into, None for the default collection
+            fetcher: DocumentFetcher downloading URL documents. Defaults to the shared one
+        """
         super().__init__(**kwargs)
-        self.converter = DocumentConverter()
-        self.chunker = HybridChunker()
+        self.summarizer = summarizer
+        self.collection = collection
+        # Summary trees still being built, each removed once done
+        self.pending_summaries = set()
+        if DeploymentConfig.ROLE == "reader":
+            # Readers never convert documents themselves
+            self.converter = None
+            self.chunker = None
+            self.fetcher = None
+        else:
+            # Light, digital PDF and scanned PDF documents each get the pipeline they need,
+            # converted in warm worker processes if there are any
+            self.converter = get_conversion_pool() if ConversionConfig.WORKERS else ProfiledConverter()
+            # Chunks are measured with the embedding model's tokenizer, so they fit its window
+            self.chunker = HybridChunker(tokenizer=embedding_model, max_tokens=CHUNK_MAX_TOKENS)
+            self.fetcher = fetcher or get_fetcher()
 
     def forward(self, document_path: str) -> None:
+        return self.index_document(document_path, self.collection)
+
+    def index_documents(self, document_paths, collection=None):
+        """
+        Index several documents into a collection, downloading the URLs among them concurrently
+
+        Returns:
+            List of the result strings of index_document
+        """
+        fetched = {}
+        if DeploymentConfig.ROLE != "reader" and FetchConfig.ENABLED:
+            urls = [document_path for document_path in document_paths if is_url(document_path)]
+            if urls:
+                with span("indexer", "fetch") as stage:
+                    fetched = self.fetcher.fetch_many(urls)
+                    stage.add_items(len(urls))
+        return [
+            self.index_document(document_path, collection, fetched.get(document_path))
+            for document_path in document_paths
+        ]
+
+    def index_document(self, document_path, collection=None, fetched=None):
+        """
+        Index a document into a collection
 
+        URLs are downloaded through the fetcher first. If the server reports the document
+        unchanged since it was last indexed into the collection, nothing is converted.
+
+        Chunks are written in batches, each with a checkpoint of the document. If a previous
+        run over the same file was interrupted, the chunks it committed are skipped.
+
+        Args:
+            document_path: Local file path or URL of the document
+            collection: Collection to index into, None for the default collection
+            fetched: FetchResult (or the exception raised) of a URL already fetched
+
+        Returns:
+            A string informing whether the indexing process succeeded
+        """
         doc_name = document_path.split("/")[-1]
         response_text = f"Processing {doc_name}...\n"
 
+        if DeploymentConfig.ROLE == "reader":
+            # Only the writer process can modify the database
+            try:
+                return forward_index_request(document_path, collection)
+            except Exception as e:
+                logger.warning(f"Failed to forward indexing request: {e}")
+                return response_text + "Failed to reach the indexing service."
+
+        source = document_path
+        if FetchConfig.ENABLED and is_url(document_path):
+            try:
+                if fetched is None:
+                    with span("indexer", "fetch"):
+                        fetched = self.fetcher.fetch(document_path)
+                if isinstance(fetched, Exception):
+                    raise fetched
+            except Exception as e:
+                logger.warning(f"Failed to download document: {e}")
+                return response_text + "Failed to download document."
+            if not fetched.changed and collection in fetched.indexed_collections:
+                return response_text + "Document unchanged since it was last indexed successfully."
+            source = fetched.path
+
+        version = _document_version(source)
+        try:
+            checkpoint = get_index_checkpoint(doc_name, collection) if IndexerConfig.CHECKPOINTS else None
+            resume = (
+                checkpoint is not None
+                and not checkpoint["completed"]
+                and version is not None
+                and checkpoint["version"] == version
+            )
+            if resume:
+                logger.info(f"Resuming {doc_name} after chunk {checkpoint['last_chunk_index']}")
+            elif checkpoint is not None and not checkpoint["completed"]:
+                # Left by an interrupted run over another version of the document
+                discard_document_chunks(doc_name, collection)
+        except Exception as e:
+            logger.warning(f"Failed to read indexing checkpoint: {e}")
+            return response_text + "Failed to index document."
+
         try:
-            doc = self.converter.convert(document_path).document
+            with span("indexer", "convert"):
+                doc = self.converter.convert(source).document
         except Exception as e:
             logger.warning(f"Failed to convert document: {e}")
             return response_text + "Failed to convert document"
 
+        # Rows are written every BATCH_SIZE rows, with a checkpoint of the chunks they
+        # complete, so memory doesn't grow with the document and a failed run resumes
+        progress = {
+            "doc_name": doc_name,
+            "version": version,
+            "chunks_done": checkpoint["chunks_done"] if resume else 0,
+            "last_chunk_index": checkpoint["last_chunk_index"] if resume else -1,
+        }
+        skipped_chunks = progress["chunks_done"]
+        rows = []
+        sections = {}
+        completed = False
         try:
             chunk_iter = self.chunker.chunk(dl_doc=doc)
 
-            rows = []
-            for chunk in chunk_iter:
+            for position, chunk in enumerate(chunk_iter):
                 # Using only text for now. More features would depend on the nature of the document
-                enriched_text = self.chunker.contextualize(chunk=chunk)
-                entities = extract_entities(enriched_text)
-                embedding = encode([enriched_text])
-
-                row = {
-                    "doc_name": doc_name,
-                    "chunk_text": enriched_text,
-                    "named_entities": entities,
-                    "embedding": embedding[0].tolist(),
-                }
-                rows.append(row)
+                with span("indexer", "chunk") as stage:
+                    enriched_text = self.chunker.contextualize(chunk=chunk)
+                    stage.add_items(1)
+
+                if self.summarizer is not None:
+                    headings = getattr(chunk.meta, "headings", None)
+                    section = headings[0] if headings else doc_name
+                    sections.setdefault(section, []).append(enriched_text)
+
+                if position < skipped_chunks:
+                    # Committed by an earlier run
+                    continue
+
+                with span("indexer", "embed"):
+                    # Tokenized once, the token ids go to the model as they are. A chunk
+                    # that doesn't fit the model's window comes back split, not truncated
+                    pieces = encode_chunk(enriched_text)
+
+                chunk_rows = []
+                for offset, (text, embedding) in enumerate(pieces, start=1):
+                    with span("indexer", "ner"):
+                        entities = extract_entities(text)
+                    chunk_rows.append({
+                        "doc_name": doc_name,
+                        "chunk_text": text,
+                        "named_entities": entities,
+                        "embedding": embedding.tolist(),
+                        "chunk_index": progress["last_chunk_index"] + offset,
+                    })
+                # The pieces of a chunk are written together, once all of them succeeded
+                rows.extend(chunk_rows)
+                progress["last_chunk_index"] += len(chunk_rows)
+                progress["chunks_done"] = position + 1
+
+                if len(rows) >= IndexerConfig.BATCH_SIZE:
+                    try:
+                        self._write_batch(rows, collection, progress, completed=False)
+                    except Exception as e:
+                        logger.warning(f"Failed to index document: {e}")
+                        return response_text + "Failed to index document."
+                    rows = []
+            completed = True
         except Exception as e:
             logger.warning(f"Failed to process chuncks: {e}")
             response_text += "Failed to process chuncks. Will try to index the rest of the document.\n"
 
         try:
-            bulk_insert_chunks(rows)
+            self._write_batch(rows, collection, progress, completed)
         except Exception as e:
             logger.warning(f"Failed to index document: {e}")
             return response_text + "Failed to index document."
 
+        if isinstance(fetched, FetchResult) and completed:
+            self.fetcher.mark_indexed(document_path, collection)
+
+        if DeploymentConfig.ROLE == "writer":
+            request_publish()
+
+        if self.summarizer is not None and sections:
+            # LLM calls take much longer than indexing, don't make the agent wait for them
+            future = io_executor.submit(self.build_summary_tree, doc_name, sections, collection)
+            self.pending_summaries.add(future)
+            future.add_done_callback(self.pending_summaries.discard)
+
         return response_text + "Document indexed successfully."
 
+    def _write_batch(self, rows, collection, progress, completed):
+        """Insert a batch of rows, with the checkpoint of the document if checkpoints are enabled"""
+        with span("indexer", "insert") as stage:
+            checkpoint = {**progress, "completed": completed} if IndexerConfig.CHECKPOINTS else None
+            if rows or checkpoint is not None:
+                bulk_insert_chunks(rows, collection=collection, checkpoint=checkpoint)
+            stage.add_items(len(rows))
+
+    def build_summary_tree(self, doc_name, sections, collection=None):
+        """
+        Summarize every section of a document, then the document from its section summaries
+
+        Args:
+            doc_name: Name of the indexed document
+            sections: Dictionary of section title to the texts of its chunks
+            collection: Collection of the document, None for the default collection
+
+        Returns:
+            Number of summaries stored
+        """
+        try:
+            section_summaries = [
+                (section, self.summarizer.forward("\n\n".join(texts)))
+                for section, texts in sections.items()
+            ]
+            if len(section_summaries) == 1:
+                document_summary = section_summaries[0][1]
+            else:
+                document_summary = self.summarizer.forward(
+                    "\n\n".join(f"{section}\n{summary}" for section, summary in section_summaries)
+                )
+
+            texts = [summary for _, summary in section_summaries] + [document_summary]
+            embeddings = encode(texts)
+            summaries = [
+                {
+                    "level": "section",
+                    "section": section,
+                    "summary_text": summary,
+                    "embedding": embedding.tolist(),
+                }
+                for (section, summary), embedding in zip(section_summaries, embeddings)
+            ]
+            summaries.append(
+                {
+                    "level": "document",
+                    "section": None,
+                    "summary_text": document_summary,
+                    "embedding": embeddings[-1].tolist(),
+                }
+            )
+            count = replace_document_summaries(doc_name, summaries, collection=collection)
+
+            if DeploymentConfig.ROLE == "writer":
+                request_publish()
+            return count
+        except Exception as e:
+            logger.warning(f"Failed to build summaries for {doc_name}: {e}")
+            return 0
+
+    async def aforward(self, document_path: str) -> str:
+        """Async variant of forward. The whole document is processed on the bounded CPU executor."""
+        return await run_cpu_bound(self.forward, document_path)
+
 
 if __name__ == "__main__":
+    import sys
+
     indexer = DocumentIndexer()
-    result = indexer.forward("../../README.md")
-    print(result)
+    for result in indexer.index_documents(sys.argv[1:] or ["../../README.md"]):
+        print(result)
@@ -1,8 +1,21 @@
+import asyncio
+import time
 from typing import Optional
 from smolagents import Tool
-from rag_agent.tools.utils.embeddings import encode
-from rag_agent.tools.utils.ner import extract_entities
-from rag_agent.tools.utils.semantic_search import search_similar_chunks
+from rag_agent.tools.utils.embeddings import encode, aencode
+from rag_agent.tools.utils.ner import extract_entities, aextract_entities
+from rag_agent.tools.utils.semantic_search import (
+    search_similar_chunks,
+    asearch_similar_chunks,
+    search_similar_summaries,
+)
+from rag_agent.tools.utils.executor import run_cpu_bound
+from rag_agent.tools.utils.packing import pack_results
+from rag_agent.tools.utils.tokens import estimate_tokens
+from rag_agent.config import RetrieverConfig
+from rag_agent.metrics import span
+from rag_agent.query_log import SlowQueryLog
+from rag_agent.tools.utils.search_tuner import SearchTuner
 
 
 class TextRetriever(Tool):
@@ -36,23 +49,127 @@ class TextRetriever(Tool):
     }
     output_type = "string"
 
-    def __init__(self, max_results: int = 5, **kwargs):
+    def __init__(
+        self,
+        max_results: int = 5,
+        summary_results: int = 0,
+        token_budget: Optional[int] = None,
+        query_log: Optional[SlowQueryLog] = None,
+        tuner: Optional[SearchTuner] = None,
+        collection: Optional[str] = None,
+        **kwargs,
+    ):
+        """
+        Args:
+            max_results: Maximum number of results returned
+            summary_results: Maximum number of precomputed section or document summaries
+                that can replace raw chunks when they match the query better
+            token_budget: Maximum estimated LLM tokens of the retrieved texts
+            query_log: Log of slow searches. Defaults to one with the configured threshold
+            tuner: Optional SearchTuner choosing ef_search and the number of candidates fetched.
+                Without it, twice max_results candidates are fetched with the configured ef_search
+            collection: Collection searched, None for the default collection
+        """
         super().__init__(**kwargs)
         self.max_results = max_results
+        self.summary_results = summary_results
+        self.token_budget = token_budget or RetrieverConfig.TOKEN_BUDGET
+        self.query_log = query_log or SlowQueryLog()
+        self.tuner = tuner
+        self.collection = collection
 
     def forward(self, query: str, doc_name: Optional[str] = None) -> str:
         if not isinstance(query, str):
             raise TypeError("Your search query must be a string")
 
-        query_entities = extract_entities(query)
-        query_embedding = encode([query])[0].tolist()
+        started = time.perf_counter()
+        timings = {}
+        with span("retriever", "ner", timings):
+            query_entities = extract_entities(query)
+        with span("retriever", "embed", timings):
+            query_embedding = encode([query])[0].tolist()
 
-        # Get twice as many results as needed to allow for filtering and reranking
+        # Get more results than needed to allow for filtering and reranking
         # based on named entities
-        results = search_similar_chunks(
-            query_embedding, limit=2 * self.max_results, doc_scope=doc_name
+        limit, ef_search = self.__search_settings()
+        with span("retriever", "search", timings) as stage:
+            results = search_similar_chunks(
+                query_embedding, limit=limit, doc_scope=doc_name, ef_search=ef_search,
+                collection=self.collection,
+            )
+            stage.add_items(len(results))
+        summaries = []
+        if self.summary_results:
+            with span("retriever", "search_summaries", timings):
+                summaries = search_similar_summaries(
+                    query_embedding, limit=self.summary_results, doc_scope=doc_name,
+                    collection=self.collection,
+                )
+
+        diagnostics = {}
+        with span("retriever", "rerank", timings):
+            output = self.__format_results(results, query_entities, doc_name, summaries, diagnostics)
+
+        self.__observe(query, doc_name, timings, started, results, diagnostics, query_embedding, limit)
+        return output
+
+    async def aforward(self, query: str, doc_name: Optional[str] = None) -> str:
+        """Async variant of forward. NER and embedding of the query run concurrently."""
+        if not isinstance(query, str):
+            raise TypeError("Your search query must be a string")
+
+        started = time.perf_counter()
+        timings = {}
+
+        async def timed(stage, awaitable):
+            with span("retriever", stage, timings):
+                return await awaitable
+
+        query_entities, query_embeddings = await asyncio.gather(
+            timed("ner", aextract_entities(query)), timed("embed", aencode([query]))
         )
+        query_embedding = query_embeddings[0].tolist()
+
+        limit, ef_search = self.__search_settings()
+        with span("retriever", "search", timings) as stage:
+            results = await asearch_similar_chunks(
+                query_embedding, limit=limit, doc_scope=doc_name, ef_search=ef_search,
+                collection=self.collection,
+            )
+            stage.add_items(len(results))
+        summaries = []
+        if self.summary_results:
+            with span("retriever", "search_summaries", timings):
+                summaries = await run_cpu_bound(
+                    search_similar_summaries, query_embedding, self.summary_results, doc_name,
+                    self.collection,
+                )
 
+        diagnostics = {}
+        with span("retriever", "rerank", timings):
+            output = self.__format_results(results, query_entities, doc_name, summaries, diagnostics)
+
+        self.__observe(query, doc_name, timings, started, results, diagnostics, query_embedding, limit)
+        return output
+
+    def __search_settings(self):
+        if self.tuner is None:
+            return 2 * self.max_results, None
+        return self.tuner.settings(self.max_results)
+
+    def __observe(self, query, doc_name, timings, started, results, diagnostics, query_embedding, limit):
+        if self.tuner is not None:
+            self.tuner.observe(
+                timings["search"], limit, len(results), diagnostics["distinct"], self.max_results
+            )
+        self.query_log.record(
+            query, doc_name, timings, time.perf_counter() - started,
+            candidates=len(results), returned=diagnostics["returned"],
+            distances=[result["distance"] for result in results],
+            query_embedding=query_embedding, limit=limit, collection=self.collection,
+        )
+
+    def __format_results(self, results, query_entities, doc_name, summaries=(), diagnostics=None):
         if doc_name is not None:
             # Filter results by document name
             results = self.__filter_by_doc_name(results, doc_name)
@@ -60,15 +177,40 @@ class TextRetriever(Tool):
         # Try to rerank and filter results by named entities
         results = self.__rerank_by_named_entities(results, query_entities)
 
-        # only use the top N results
-        results = results[: self.max_results]
+        # Summaries closer to the query than every chunk answer broad questions
+        # with a single row, they take the place of the raw chunks
+        best_distance = min((result["distance"] for result in results), default=float("inf"))
+        summaries = [summary for summary in summaries if summary["distance"] < best_distance]
+
+        # Deduplicate, merge and trim the top N results into the token budget
+        summary_tokens = sum(estimate_tokens(summary["summary_text"]) for summary in summaries)
+        results, saved_tokens = pack_results(
+            results,
+            token_budget=max(self.token_budget - summary_tokens, 0),
+            max_results=self.max_results - len(summaries),
+            diagnostics=diagnostics,
+        )
+        if diagnostics is not None:
+            diagnostics["returned"] = len(results) + len(summaries)
         return "\nRetrieved texts:\n" + "".join(
             [
+                f"\n\n<document_summary> \nDocument of Origin: {summary["doc_name"]}\n"
+                + (f"Section: {summary["section"]}\n" if summary["section"] else "")
+                + "=====\n"
+                + summary["summary_text"]
+                + "\n</document_summary>"
+                for summary in summaries
+            ]
+            + [
                 f"\n\n<document_chunk> \nDocument of Origin: {result["doc_name"]}\n=====\n"
                 + result["chunk_text"]
                 + "\n</document_chunk>"
                 for result in results
             ]
+        ) + (
+            f"\n\n(Duplicate and overlapping text removed, saving about {saved_tokens} tokens)"
+            if saved_tokens
+            else ""
         )
 
     def __filter_by_doc_name(self, results, doc_scope):
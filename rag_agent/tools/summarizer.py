@@ -1,5 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from smolagents import Tool, Model
+from rag_agent.config import SummarizerConfig
+from rag_agent.tools.utils.executor import run_blocking_io
+from rag_agent.tools.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+from rag_agent.metrics import span, record_cache
+
+SUMMARIZE_INSTRUCTION = "Summarize the following text:"
+SEGMENT_INSTRUCTION = "Summarize the following part of a longer text:"
+COMBINE_INSTRUCTION = "Combine the following partial summaries of a longer text into a single summary:"
+
+# Bump whenever the prompts change, so that cached summaries are not reused
+PROMPT_TEMPLATE_VERSION = 1
+
+
+def split_into_segments(text: str, max_tokens: int) -> list[str]:
+    """
+    Split a text into segments within a token budget
+
+    Paragraph boundaries are preferred, then line and word boundaries. A single word
+    longer than the budget is split at the character budget.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+
+    for separator in ("\n\n", "\n", " "):
+        pieces = text.split(separator)
+        if len(pieces) > 1:
+            break
+    else:
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+
+    segments = []
+    current = ""
+    for piece in pieces:
+        if len(piece) > max_chars:
+            # Too long on its own, split it on a finer boundary
+            if current:
+                segments.append(current)
+                current = ""
+            segments.extend(split_into_segments(piece, max_tokens))
+        elif current and len(current) + len(separator) + len(piece) > max_chars:
+            segments.append(current)
+            current = piece
+        else:
+            current = current + separator + piece if current else piece
+    if current:
+        segments.append(current)
+    return segments
 
 
 class SummarizerTool(Tool):
@@ -25,9 +74,20 @@ class SummarizerTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, model: Model, **kwargs):
+    def __init__(
+        self,
+        model: Model,
+        segment_tokens: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        cache=None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         self.model = model
+        self.cache = cache
+        self.model_id = getattr(model, "model_id", None) or type(model).__name__
+        self.segment_tokens = segment_tokens or SummarizerConfig.SEGMENT_TOKENS
+        self.max_concurrency = max_concurrency or SummarizerConfig.MAX_CONCURRENCY
 
     def forward(self, text: str, query: Optional[str] = None) -> str:
         if not isinstance(text, str):
@@ -35,7 +95,58 @@ class SummarizerTool(Tool):
         if not isinstance(query, (str, type(None))):
             raise TypeError("The query must be a string or None")
 
-        prompt = f"Summarize the following text:\n\n{text}\n"
+        with span("summarizer", "forward"):
+            if self.cache is None:
+                return self._summarize_text(text, query)
+            return self._summarize_cached(text, query)
+
+    def _summarize_cached(self, text: str, query: Optional[str]) -> str:
+        key = self.cache.make_key(self.model_id, PROMPT_TEMPLATE_VERSION, SUMMARIZE_INSTRUCTION, text, query)
+        summary = self.cache.get(key)
+        record_cache("summary", summary is not None)
+        if summary is None:
+            reduced_text = self.cache.substitute_summarized(text, self.model_id, query)
+            summary = self._summarize_text(reduced_text, query)
+            # Cached under the original text, so a later superset of it can reuse the summary
+            self.cache.put(key, self.model_id, query, text, summary)
+        return summary
+
+    def _summarize_text(self, text: str, query: Optional[str]) -> str:
+        if estimate_tokens(text) <= self.segment_tokens:
+            # Cached as a whole by _summarize_cached, only segments are cached here
+            return self._call_model(SUMMARIZE_INSTRUCTION, text, query)
+
+        # Map-reduce: summarize segments concurrently, then summarize the partial
+        # summaries until they fit in a single call. Wall-clock time grows with the
+        # depth of the reduction tree, not with the length of the input.
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while estimate_tokens(text) > self.segment_tokens:
+                segments = split_into_segments(text, self.segment_tokens)
+                summaries = executor.map(
+                    lambda segment: self._summarize(SEGMENT_INSTRUCTION, segment, query),
+                    segments,
+                )
+                reduced = "\n\n".join(summaries)
+                if len(reduced) >= len(text):
+                    # The summaries don't get any shorter, stop reducing
+                    break
+                text = reduced
+
+        return self._summarize(COMBINE_INSTRUCTION, text, query)
+
+    def _summarize(self, instruction: str, text: str, query: Optional[str]) -> str:
+        if self.cache is not None:
+            key = self.cache.make_key(self.model_id, PROMPT_TEMPLATE_VERSION, instruction, text, query)
+            summary = self.cache.get(key)
+            record_cache("summary", summary is not None)
+            if summary is None:
+                summary = self._call_model(instruction, text, query)
+                self.cache.put(key, self.model_id, query, text, summary)
+            return summary
+        return self._call_model(instruction, text, query)
+
+    def _call_model(self, instruction: str, text: str, query: Optional[str]) -> str:
+        prompt = f"{instruction}\n\n{text}\n"
         if query:
             prompt += f"\n\nPlease focus on the following question: {query}\n"
 
@@ -48,6 +159,11 @@ class SummarizerTool(Tool):
             },
         ]
 
-        response = self.model(messages=message).content
+        with span("summarizer", "llm") as stage:
+            response = self.model(messages=message).content
+            stage.add_items(1)
         return response.strip()
 
+    async def aforward(self, text: str, query: Optional[str] = None) -> str:
+        """Async variant of forward. The LLM request runs on the bounded I/O executor."""
+        return await run_blocking_io(self.forward, text, query)
@@ -0,0 +1,94 @@
+import logging
+import threading
+from rag_agent.config import AnswerCacheConfig, DeploymentConfig
+from rag_agent.db import get_cursor, get_write_lock
+from rag_agent.db.models import AnswerCacheModel
+from rag_agent.tools.utils.embeddings import encode
+from rag_agent.tools.utils.semantic_search import corpus_generation
+from rag_agent.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final agent answers, matched by question embedding similarity
+
+    An answer is only reused while the corpus generation it was produced against
+    is still current, and until it expires.
+    """
+
+    def __init__(self, threshold=None, ttl_seconds=None, max_entries=None):
+        self.threshold = AnswerCacheConfig.SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.ttl_seconds = AnswerCacheConfig.TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = AnswerCacheConfig.MAX_ENTRIES if max_entries is None else max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, question, collection=None):
+        """
+        Look up a cached answer for a question
+
+        Only answers given in the same collection match.
+
+        Returns:
+            Tuple (answer, embedding, generation). The answer is None on a miss. The
+            question embedding and the corpus generation looked up can be passed to
+            store, the generation being the one the answer is then produced against
+        """
+        embedding = encode([question])[0].tolist()
+        conn = get_cursor()
+        generation = corpus_generation()
+        match = AnswerCacheModel.find_similar(
+            conn, embedding, generation, self.threshold, self.ttl_seconds, collection
+        )
+
+        record_cache("answer", match is not None)
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                return None, embedding, generation
+            self.hits += 1
+
+        rowid, cached_question, answer, similarity = match
+        logger.info(f"Answer cache hit ({similarity:.3f}): {cached_question!r}")
+        if DeploymentConfig.ROLE != "reader":
+            with get_write_lock():
+                AnswerCacheModel.record_hit(conn, rowid)
+        return answer, embedding, generation
+
+    def store(self, question, answer, embedding=None, collection=None, generation=None):
+        """
+        Store the final answer to a question asked in a collection
+
+        Args:
+            generation: Corpus generation the answer was produced against, as returned by
+                lookup. The answer isn't stored if documents were indexed since then
+        """
+        if DeploymentConfig.ROLE == "reader":
+            # Snapshots are read-only
+            return
+        if embedding is None:
+            embedding = encode([question])[0].tolist()
+
+        conn = get_cursor()
+        with get_write_lock():
+            current = corpus_generation()
+            if generation is None:
+                generation = current
+            elif generation != current:
+                logger.info(f"Not caching an answer produced against corpus generation {generation}")
+                return
+            AnswerCacheModel.insert_answer(conn, question, answer, embedding, generation, collection)
+            AnswerCacheModel.evict(conn, self.max_entries, self.ttl_seconds, generation)
+
+    def stats(self):
+        """Hit and miss counters since startup"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,159 @@
+"""
+Format-aware document conversion.
+
+docling's default DocumentConverter runs every PDF through its layout, OCR and table
+structure models, and loads them even for a Markdown file. Each document is instead
+converted with the cheapest profile that handles its format:
+
+    light      .md, .txt, .html        docling's declarative backends, no models
+    digital    PDFs with a text layer  layout model only, text from the PDF, no OCR or tables
+    scanned    PDFs without one        the full pipeline, with OCR and table structure
+    default    anything else           docling's default converter
+
+Whether a PDF is scanned is decided up front from the text layer of its first pages,
+which pypdfium2 reads in milliseconds. The duration of every conversion is recorded
+as the stage of its profile in the "conversion" component of the metrics.
+"""
+import io
+import logging
+import os
+import threading
+import time
+
+import pypdfium2 as pdfium
+from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+from docling.datamodel.base_models import DocumentStream, InputFormat
+from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.utils.locks import pypdfium2_lock
+
+from rag_agent.config import ConversionConfig
+from rag_agent.metrics import span
+
+logger = logging.getLogger(__name__)
+
+PROFILES = ("light", "digital", "scanned", "default")
+LIGHT_EXTENSIONS = {".md", ".markdown", ".txt", ".html", ".htm", ".xhtml"}
+# Format whose pipeline a profile's converter loads when warmed
+WARM_FORMATS = {
+    "light": InputFormat.MD,
+    "digital": InputFormat.PDF,
+    "scanned": InputFormat.PDF,
+    "default": InputFormat.PDF,
+}
+# Plain text is valid Markdown, docling has no backend of its own for it
+MARKDOWN_ALIASES = {".txt"}
+
+
+def is_scanned_pdf(path, sample_pages=None, min_chars=None):
+    """
+    Whether a PDF is (mostly) images of pages, judging from the text layer of its first pages
+
+    A PDF that can't be read is considered scanned, so it gets the full pipeline.
+    pdfium isn't thread-safe: it is only called holding the lock docling's own
+    pypdfium2 backend takes, since other documents may be converting meanwhile.
+    """
+    sample_pages = sample_pages or ConversionConfig.SCANNED_SAMPLE_PAGES
+    min_chars = ConversionConfig.SCANNED_MIN_CHARS if min_chars is None else min_chars
+    with pypdfium2_lock:
+        try:
+            pdf = pdfium.PdfDocument(path)
+        except Exception as e:
+            logger.warning(f"Failed to read the text layer of {path}: {e}")
+            return True
+        try:
+            pages = min(len(pdf), sample_pages)
+            chars = 0
+            for index in range(pages):
+                page = pdf[index]
+                text_page = page.get_textpage()
+                chars += len(text_page.get_text_range().strip())
+                text_page.close()
+                page.close()
+        finally:
+            pdf.close()
+    return pages > 0 and chars < min_chars * pages
+
+
+def conversion_profile(path):
+    """Conversion profile of a local document"""
+    if not ConversionConfig.FAST_PATHS:
+        return "default"
+    extension = os.path.splitext(path)[1].lower()
+    if extension in LIGHT_EXTENSIONS:
+        return "light"
+    if extension == ".pdf" and os.path.exists(path):
+        return "scanned" if is_scanned_pdf(path) else "digital"
+    return "default"
+
+
+def resolve_profile(source):
+    """Conversion profile of a document, URLs (converted directly when fetching is disabled) aren't inspected"""
+    return "default" if source.startswith(("https://", "http://")) else conversion_profile(source)
+
+
+def _pdf_converter(pipeline_options, backend=None):
+    # docling's own PDF parser unless another backend is given
+    kwargs = {"backend": backend} if backend is not None else {}
+    option = PdfFormatOption(pipeline_options=pipeline_options, **kwargs)
+    return DocumentConverter(allowed_formats=[InputFormat.PDF], format_options={InputFormat.PDF: option})
+
+
+def build_converter(profile):
+    """DocumentConverter configured for a profile"""
+    if profile == "light":
+        return DocumentConverter(allowed_formats=[InputFormat.MD, InputFormat.HTML])
+    if profile == "digital":
+        # pypdfium2 reads the text layer faster than docling's own parser
+        return _pdf_converter(PdfPipelineOptions(do_ocr=False, do_table_structure=False), PyPdfiumDocumentBackend)
+    if profile == "scanned":
+        return _pdf_converter(PdfPipelineOptions(do_ocr=True, do_table_structure=True))
+    return DocumentConverter()
+
+
+class ProfiledConverter:
+    """Converts documents with the converter of their profile, each created on first use"""
+
+    def __init__(self):
+        self._converters = {}
+        self._lock = threading.Lock()
+
+    def converter(self, profile):
+        converter = self._converters.get(profile)
+        if converter is None:
+            with self._lock:
+                converter = self._converters.get(profile)
+                if converter is None:
+                    converter = self._converters[profile] = build_converter(profile)
+        return converter
+
+    def warm(self, profiles):
+        """Load the models of the profiles' pipelines now rather than on their first document"""
+        for profile in profiles:
+            self.converter(profile).initialize_pipeline(WARM_FORMATS[profile])
+
+    def convert(self, source, profile=None):
+        """
+        Convert a document
+
+        Args:
+            source: Local path or URL of the document
+            profile: Conversion profile, detected from the document if None
+
+        Returns:
+            docling ConversionResult
+        """
+        profile = profile or resolve_profile(source)
+
+        converter = self.converter(profile)
+        began = time.perf_counter()
+        with span("conversion", profile) as stage:
+            if profile == "light" and os.path.splitext(source)[1].lower() in MARKDOWN_ALIASES:
+                with open(source, "rb") as f:
+                    name = os.path.splitext(os.path.basename(source))[0] + ".md"
+                    result = converter.convert(DocumentStream(name=name, stream=io.BytesIO(f.read())))
+            else:
+                result = converter.convert(source)
+            stage.add_items(1)
+        logger.info(f"Converted {source} with the {profile} profile in {time.perf_counter() - began:.3f}s")
+        return result
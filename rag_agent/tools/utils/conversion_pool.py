@@ -0,0 +1,248 @@
+"""
+Warm process pool for document conversion.
+
+docling's PDF pipeline holds the GIL for much of its work, so threads convert one PDF
+at a time per process. With CONVERSION_WORKERS set, documents are converted in worker
+processes instead. Each loads its ProfiledConverter (and the models of
+CONVERSION_WARM_PROFILES) once and keeps it for the documents that follow.
+
+Paths go to a worker over a pipe and the document comes back serialized with
+DoclingDocument.export_to_dict. A worker that exceeds the task timeout is killed, and
+every worker is replaced after MAX_TASKS_PER_WORKER documents, which bounds the memory
+docling accumulates. Replacements start right away so they are warm by the next task.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from docling_core.types.doc import DoclingDocument
+
+from rag_agent.config import ConversionConfig
+from rag_agent.metrics import count_items, observe
+from rag_agent.tools.utils.conversion import ProfiledConverter, resolve_profile
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    """A document could not be converted by a worker"""
+
+
+class ConversionTimeout(ConversionError):
+    """A worker took longer than the task timeout, it was killed"""
+
+
+@dataclass
+class PooledConversion:
+    """Document converted by a worker, in place of docling's ConversionResult"""
+    document: DoclingDocument
+    profile: str
+    seconds: float
+
+
+def _worker_main(conn, converter_factory, warm_profiles):
+    """Loop of a worker process: convert the paths received until told to stop"""
+    converter = converter_factory()
+    try:
+        converter.warm(warm_profiles)
+    except Exception as e:
+        logger.warning(f"Failed to warm conversion worker: {e}")
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        source, profile = task
+        try:
+            profile = profile or resolve_profile(source)
+            began = time.perf_counter()
+            document = converter.convert(source, profile).document
+            conn.send(("done", document.export_to_dict(), profile, time.perf_counter() - began))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, converter_factory, warm_profiles):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, converter_factory, warm_profiles),
+            name="rag-agent-convert",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.tasks = 0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def wait_ready(self, timeout):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise ConversionTimeout(f"Conversion worker not ready after {timeout}s")
+        try:
+            message = self.conn.recv()
+        except (EOFError, OSError):
+            raise ConversionError(f"Conversion worker {self.pid} exited while starting")
+        if message[0] != "ready":
+            raise ConversionError(f"Unexpected message from conversion worker: {message[0]}")
+        self.ready = True
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ConversionPool:
+    """Worker processes that each keep a warm ProfiledConverter"""
+
+    def __init__(self, workers=None, task_timeout=None, max_tasks_per_worker=None, warm_profiles=None,
+                 converter_factory=ProfiledConverter):
+        """
+        Args:
+            workers: Number of worker processes, defaults to ConversionConfig.WORKERS
+            task_timeout: Seconds a document may take before its worker is killed
+            max_tasks_per_worker: Documents after which a worker is replaced, 0 never
+            warm_profiles: Profiles whose models a worker loads when it starts
+            converter_factory: Picklable callable creating the converter of a worker
+        """
+        self.workers = workers or ConversionConfig.WORKERS
+        self.task_timeout = task_timeout or ConversionConfig.TASK_TIMEOUT
+        self.max_tasks_per_worker = (
+            ConversionConfig.MAX_TASKS_PER_WORKER if max_tasks_per_worker is None else max_tasks_per_worker
+        )
+        self.warm_profiles = ConversionConfig.WARM_PROFILES if warm_profiles is None else warm_profiles
+        self.converter_factory = converter_factory
+        # Processes are spawned, forking a process that loaded torch isn't safe
+        self._context = multiprocessing.get_context("spawn")
+        # Idle workers; None stands for a slot whose worker starts on first use
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(None)
+        self._closed = False
+
+    def _spawn(self):
+        return _Worker(self._context, self.converter_factory, self.warm_profiles)
+
+    def start(self, timeout=None):
+        """Start every worker and wait until they are warm"""
+        timeout = timeout or ConversionConfig.WORKER_START_TIMEOUT
+        workers = [self._idle.get() for _ in range(self.workers)]
+        try:
+            workers = [worker or self._spawn() for worker in workers]
+            for worker in workers:
+                worker.wait_ready(timeout)
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def convert(self, source, profile=None):
+        """
+        Convert a document in a worker, waiting for a free one
+
+        Args:
+            source: Local path or URL of the document
+            profile: Conversion profile, detected by the worker if None
+
+        Returns:
+            PooledConversion with the DoclingDocument
+
+        Raises:
+            ConversionTimeout: The conversion exceeded the task timeout
+            ConversionError: The conversion failed or the worker died
+        """
+        if self._closed:
+            raise ConversionError("Conversion pool is closed")
+        worker = self._idle.get()
+        replacement = worker
+        try:
+            if worker is None or not worker.process.is_alive():
+                worker = replacement = self._spawn()
+            try:
+                worker.wait_ready(ConversionConfig.WORKER_START_TIMEOUT)
+            except ConversionError:
+                worker.kill()
+                replacement = None
+                raise
+
+            worker.conn.send((source, profile))
+            if not worker.conn.poll(self.task_timeout):
+                worker.kill()
+                replacement = self._spawn()
+                raise ConversionTimeout(f"Converting {source} took longer than {self.task_timeout}s")
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.kill()
+                replacement = self._spawn()
+                raise ConversionError(f"Conversion worker died converting {source}")
+
+            worker.tasks += 1
+            if self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+                logger.info(f"Replacing conversion worker {worker.pid} after {worker.tasks} documents")
+                worker.stop()
+                replacement = self._spawn()
+        except ConversionError:
+            raise
+        except Exception as e:
+            # The worker is in an unknown state, start over with a new one on next use
+            if worker is not None:
+                worker.kill()
+            replacement = None
+            raise ConversionError(f"Failed to convert {source}: {e}") from e
+        finally:
+            self._idle.put(replacement)
+
+        if message[0] == "error":
+            raise ConversionError(message[1])
+        _, document, profile, seconds = message
+        observe("conversion", profile, seconds)
+        count_items("conversion", profile, 1)
+        return PooledConversion(DoclingDocument.model_validate(document), profile, seconds)
+
+    def close(self):
+        """Stop the idle workers, conversions still running finish first"""
+        self._closed = True
+        for _ in range(self.workers):
+            worker = self._idle.get()
+            if worker is not None:
+                worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_conversion_pool():
+    """Conversion pool shared by the process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConversionPool()
+    return _pool
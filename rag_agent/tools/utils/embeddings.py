@@ -1,14 +1,89 @@
+import threading
+import torch
 from sentence_transformers import SentenceTransformer
 from numpy import ndarray
 import rag_agent.config as config
+from rag_agent.tools.utils.executor import run_cpu_bound
 
 
 model = "BAAI/bge-small-en-v1.5"
 
-emb_model = SentenceTransformer(model, device=config.device)
+# Window of the model, of which [CLS] and [SEP] take two tokens. HybridChunker
+# sizes chunks with the same tokenizer and budget, so they fit without truncation
+MAX_SEQ_LENGTH = 512
+CHUNK_MAX_TOKENS = MAX_SEQ_LENGTH - 2
+
+# Loaded on first use, or in the background during startup
+emb_model = None
+_load_lock = threading.Lock()
+
+def load_model() -> SentenceTransformer:
+    """Load the embedding model, once"""
+    global emb_model
+    with _load_lock:
+        if emb_model is None:
+            emb_model = SentenceTransformer(model, device=config.device)
+    return emb_model
 
 def encode(texts: list[str]) -> list[ndarray]:
-    return emb_model.encode(texts, truncate=True)
+    model = emb_model if emb_model is not None else load_model()
+    return model.encode(texts, truncate=True)
+
+async def aencode(texts: list[str]) -> list[ndarray]:
+    return await run_cpu_bound(encode, texts)
+
+def encode_token_ids(token_ids: list[list[int]]) -> ndarray:
+    """
+    Embed texts already tokenized with the model's tokenizer, without special tokens
+
+    Raises:
+        ValueError: A sequence doesn't fit the model's window and would be truncated
+    """
+    model = emb_model if emb_model is not None else load_model()
+    tokenizer = model.tokenizer
+    input_ids = [tokenizer.build_inputs_with_special_tokens(list(ids)) for ids in token_ids]
+    longest = max((len(ids) for ids in input_ids), default=0)
+    if longest > model.max_seq_length:
+        raise ValueError(f"Sequence of {longest} tokens exceeds the model window of {model.max_seq_length}")
+
+    features = tokenizer.pad({"input_ids": input_ids}, padding=True, return_tensors="pt")
+    features = {name: tensor.to(model.device) for name, tensor in features.items()}
+    with torch.inference_mode():
+        embeddings = model.forward(features)["sentence_embedding"]
+    return embeddings.float().cpu().numpy()
+
+def token_windows(text: str, token_ids: list[int], offsets: list[tuple[int, int]], max_tokens: int = CHUNK_MAX_TOKENS):
+    """
+    Split a tokenized text into pieces of at most max_tokens tokens, at token boundaries
+
+    Returns:
+        List of (text, token_ids) tuples, the text itself if it fits
+    """
+    if len(token_ids) <= max_tokens:
+        return [(text, list(token_ids))]
+    pieces = []
+    for start in range(0, len(token_ids), max_tokens):
+        stop = min(start + max_tokens, len(token_ids))
+        char_start = offsets[start][0] if start else 0
+        char_stop = offsets[stop][0] if stop < len(token_ids) else len(text)
+        pieces.append((text[char_start:char_stop], list(token_ids[start:stop])))
+    return pieces
+
+def encode_chunk(text: str) -> list[tuple[str, ndarray]]:
+    """
+    Embed a document chunk, tokenizing it only once
+
+    A chunk longer than the model's window is split into pieces that fit, each embedded
+    separately, instead of being truncated.
+
+    Returns:
+        List of (text, embedding) tuples, a single one unless the chunk was split
+    """
+    model = emb_model if emb_model is not None else load_model()
+    encoding = model.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    pieces = token_windows(text, encoding["input_ids"], encoding["offset_mapping"])
+    embeddings = encode_token_ids([token_ids for _, token_ids in pieces])
+    return [(piece, embedding) for (piece, _), embedding in zip(pieces, embeddings)]
 
 if __name__ == "__main__":
     text = (
@@ -18,5 +93,5 @@ if __name__ == "__main__":
     )
 
     print(text)
-    result = emb_model.encode([text])
+    result = load_model().encode([text])
     print(type(result[0]), len(result[0]))
\ No newline at end of file
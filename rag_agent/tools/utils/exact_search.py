@@ -0,0 +1,313 @@
+"""
+Exact (brute-force) similarity search over memory-mapped embeddings.
+
+On small tables, and for doc-scoped queries, a matrix product over contiguous float32
+embeddings is faster than traversing the HNSW graph, and its recall is perfect.
+
+Every chunk table gets its own files in EXACT_SEARCH_DIR:
+
+    <table>-<build>.f32      embeddings, row-major float32 (unit length for the cosine metric)
+    <table>-<build>.rowid    DuckDB rowid of each embedding row, int64, ascending
+    <table>.json             current build, row count and last rowid of the table it matches
+
+The files are memory-mapped read-only, so every process searching a table shares
+its pages through the OS page cache. New chunks are appended in place, then the JSON
+file is replaced atomically, and readers never map rows past the count it records.
+When chunks were deleted the files are rebuilt under a new build number and the old
+ones unlinked. Mappings that are already open keep working on the old files.
+
+The files are versioned by the state of their table (row count and last rowid), not by
+the corpus generation: publishing summaries bumps the generation without touching the
+chunks, and must not send readers back to the HNSW index. A table that was dropped
+and recreated restarts its rowids, so a writer also compares the embeddings of the
+first and last mapped rows with the table before trusting the files.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from rag_agent.config import DuckDBConfig, ExactSearchConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ExactIndex:
+    """Memory-mapped embeddings of one chunk table, kept in sync with it by rowid"""
+
+    def __init__(self, model, directory=None, metric=None, dim=None):
+        self.model = model
+        self._directory = directory
+        self.metric = metric or DuckDBConfig.VSS_METRIC
+        self.dim = dim or DuckDBConfig.EMBEDDING_DIM
+        self._meta_version = None
+        # (meta, embeddings, rowids), replaced as a whole so that searches never mix two builds
+        self._mapped = self._unmapped()
+        self._lock = threading.Lock()
+
+    def _unmapped(self):
+        return None, np.empty((0, self.dim), np.float32), np.empty(0, np.int64)
+
+    @property
+    def meta(self):
+        return self._mapped[0]
+
+    @property
+    def directory(self):
+        return self._directory or ExactSearchConfig.DIR
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, f"{self.model.table_name}.json")
+
+    def _paths(self, build):
+        base = os.path.join(self.directory, f"{self.model.table_name}-{build}")
+        return base + ".f32", base + ".rowid"
+
+    @property
+    def rows(self):
+        meta = self.meta
+        return meta["rows"] if meta else 0
+
+    def load(self):
+        """
+        Map the current files, if they changed since the last call
+
+        Returns:
+            The metadata of the mapped files, None if there are none for this table
+        """
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            self._mapped = self._unmapped()
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._meta_version:
+            return self.meta
+
+        with self._lock:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta["metric"] != self.metric or meta["dim"] != self.dim:
+                # Built for another configuration, only usable once rebuilt
+                self._mapped = self._unmapped()
+                return None
+            embeddings_path, rowids_path = self._paths(meta["build"])
+            if meta["rows"]:
+                self._mapped = (
+                    meta,
+                    np.memmap(embeddings_path, np.float32, "r", shape=(meta["rows"], self.dim)),
+                    np.memmap(rowids_path, np.int64, "r", shape=(meta["rows"],)),
+                )
+            else:
+                self._mapped = (meta, *self._unmapped()[1:])
+            self._meta_version = version
+        return meta
+
+    def matches(self, state):
+        """Whether the mapped files hold the table in the given (rows, last_rowid) state"""
+        meta = self.meta
+        return meta is not None and (meta["rows"], meta["last_rowid"]) == tuple(state)
+
+    def sync(self, conn):
+        """
+        Bring the files up to date with the table
+
+        Rows added since the last sync are appended; if rows were deleted (fewer rows
+        left up to the last synced rowid) the files are rebuilt. Writers call this
+        while holding the write lock.
+
+        Args:
+            conn: Read-write DuckDB connection
+        """
+        meta = self.load()
+        if meta is not None and not self._same_rows(conn):
+            logger.info(f"Exact search files of {self.model.table_name} belong to a recreated table")
+            meta = None
+        elif self.matches(self.model.table_state(conn)):
+            return meta
+
+        if meta is not None and self.model.count_rows(conn, meta["last_rowid"]) == meta["rows"]:
+            meta = self._append(conn, meta)
+        else:
+            meta = self._rebuild(conn, self._last_build() + 1)
+        self.load()
+        return meta
+
+    def _same_rows(self, conn):
+        """Whether the first and last mapped rows still hold the same embeddings in the table"""
+        meta, embeddings, all_rowids = self._mapped
+        if not meta["rows"]:
+            return True
+        positions = [0, meta["rows"] - 1]
+        rowids = [int(all_rowids[position]) for position in positions]
+        found = dict(conn.execute(
+            f"SELECT rowid, embedding FROM {self.model.table_name} WHERE rowid IN (?, ?)", rowids
+        ).fetchall())
+        if any(rowid not in found for rowid in rowids):
+            return False
+        expected = self._prepare(np.array([found[rowid] for rowid in rowids], dtype=np.float32))
+        return np.allclose(expected, embeddings[positions], rtol=1e-5, atol=1e-6)
+
+    def _last_build(self):
+        """Build number of the files on disk, also for another configuration, -1 if there are none"""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)["build"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return -1
+
+    def _prepare(self, embeddings):
+        if self.metric == "cosine":
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _append(self, conn, meta):
+        embeddings_path, rowids_path = self._paths(meta["build"])
+        rows, last_rowid = meta["rows"], meta["last_rowid"]
+        with open(embeddings_path, "ab") as embeddings_file, open(rowids_path, "ab") as rowids_file:
+            # Drop anything past the recorded rows, left over by an interrupted append
+            embeddings_file.truncate(rows * self.dim * 4)
+            rowids_file.truncate(rows * 8)
+            for rowids, embeddings in self.model.iter_embeddings(conn, last_rowid):
+                embeddings_file.write(self._prepare(embeddings).tobytes())
+                rowids_file.write(rowids.tobytes())
+                rows += len(rowids)
+                last_rowid = int(rowids[-1])
+        return self._write_meta(meta["build"], rows, last_rowid)
+
+    def _rebuild(self, conn, build):
+        os.makedirs(self.directory, exist_ok=True)
+        embeddings_path, rowids_path = self._paths(build)
+        rows, last_rowid = 0, -1
+        with open(embeddings_path, "wb") as embeddings_file, open(rowids_path, "wb") as rowids_file:
+            for rowids, embeddings in self.model.iter_embeddings(conn):
+                embeddings_file.write(self._prepare(embeddings).tobytes())
+                rowids_file.write(rowids.tobytes())
+                rows += len(rowids)
+                last_rowid = int(rowids[-1])
+        meta = self._write_meta(build, rows, last_rowid)
+
+        # Processes that mapped the previous build keep reading it until they reload
+        for path in self._paths(build - 1):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        logger.info(f"Rebuilt exact search files of {self.model.table_name}: {rows} rows")
+        return meta
+
+    def _write_meta(self, build, rows, last_rowid):
+        meta = {
+            "build": build,
+            "rows": rows,
+            "last_rowid": last_rowid,
+            "metric": self.metric,
+            "dim": self.dim,
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        return meta
+
+    def _distances(self, embeddings, query):
+        """Distances matching the DuckDB distance function of the metric"""
+        scores = embeddings @ query
+        if self.metric == "cosine":
+            return 1.0 - scores
+        if self.metric == "ip":
+            return -scores
+        squared = np.einsum("ij,ij->i", embeddings, embeddings) - 2.0 * scores + query @ query
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def search(self, query_embedding, limit, rowids=None, block_rows=None):
+        """
+        Exact top-k by brute force
+
+        Args:
+            query_embedding: Query vector
+            limit: Number of results
+            rowids: If provided, only these rows are searched (e.g. the chunks of one document)
+            block_rows: Rows scored at a time, defaults to ExactSearchConfig.BLOCK_ROWS
+
+        Returns:
+            Tuple (rowids, distances) of numpy arrays, sorted by increasing distance
+        """
+        block_rows = block_rows or ExactSearchConfig.BLOCK_ROWS
+        # Read once: a concurrent load() may map another build meanwhile
+        _, embeddings, all_rowids = self._mapped
+        query = self._prepare(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+
+        if rowids is not None:
+            # Rowids are ascending, so rows are located by binary search
+            rowids = np.asarray(rowids, dtype=np.int64)
+            positions = np.searchsorted(all_rowids, rowids)
+            present = positions < len(all_rowids)
+            present[present] = all_rowids[positions[present]] == rowids[present]
+            positions = positions[present]
+        else:
+            positions = None
+
+        count = len(all_rowids) if positions is None else len(positions)
+        candidates, candidate_distances = [], []
+        for start in range(0, count, block_rows):
+            stop = min(start + block_rows, count)
+            block = embeddings[start:stop] if positions is None else embeddings[positions[start:stop]]
+            distances = self._distances(block, query)
+            if len(distances) > limit:
+                top = np.argpartition(distances, limit - 1)[:limit]
+            else:
+                top = np.arange(len(distances))
+            candidates.append(top + start)
+            candidate_distances.append(distances[top])
+
+        if not candidates:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        candidates = np.concatenate(candidates)
+        candidate_distances = np.concatenate(candidate_distances)
+        order = np.argsort(candidate_distances, kind="stable")[:limit]
+        found = candidates[order]
+        if positions is not None:
+            found = positions[found]
+        return np.asarray(all_rowids[found]), candidate_distances[order]
+
+
+def remove_exact_files(table_name, directory=None):
+    """Delete the exact search files of a table, e.g. after it was dropped and recreated"""
+    directory = directory or ExactSearchConfig.DIR
+    paths = [os.path.join(directory, f"{table_name}.json")]
+    for extension in ("f32", "rowid"):
+        paths += glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(table_name)}-*.{extension}"))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def exact_index(model):
+    """ExactIndex of a model's table, one per table and process"""
+    index = _indexes.get(model.table_name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(model.table_name, ExactIndex(model))
+    return index
+
+
+def use_exact(rows, engine=None, max_rows=None):
+    """Whether a table of `rows` chunks is searched exactly rather than with the HNSW index"""
+    engine = engine or ExactSearchConfig.ENGINE
+    if engine == "exact":
+        return True
+    if engine == "hnsw":
+        return False
+    return rows <= (ExactSearchConfig.MAX_ROWS if max_rows is None else max_rows)
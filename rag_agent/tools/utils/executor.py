@@ -0,0 +1,40 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from rag_agent.config import AsyncConfig, FetchConfig, ShardConfig
+
+# Model inference and DuckDB release the GIL for most of their work, so a thread
+# pool sized to the cores is enough to keep them busy without oversubscribing
+cpu_executor = ThreadPoolExecutor(
+    max_workers=AsyncConfig.CPU_WORKERS, thread_name_prefix="rag-agent-cpu"
+)
+
+# Blocking network calls mostly wait, they get their own pool so that they
+# never starve CPU-bound work
+io_executor = ThreadPoolExecutor(
+    max_workers=AsyncConfig.IO_WORKERS, thread_name_prefix="rag-agent-io"
+)
+
+# Fan-out of searches over shards. Separate from the CPU pool, whose workers
+# run searches themselves and would otherwise wait on each other
+shard_executor = ThreadPoolExecutor(
+    max_workers=max(1, min(ShardConfig.SEARCH_WORKERS, ShardConfig.NUM_SHARDS)),
+    thread_name_prefix="rag-agent-shard",
+)
+
+# Downloads of URL documents. Per-host limits are enforced by the connection pools
+fetch_executor = ThreadPoolExecutor(
+    max_workers=FetchConfig.WORKERS, thread_name_prefix="rag-agent-fetch"
+)
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """Run a CPU-bound function on the bounded CPU executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_blocking_io(func, *args, **kwargs):
+    """Run a blocking I/O function on the bounded I/O executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
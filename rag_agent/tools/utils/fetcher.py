@@ -0,0 +1,291 @@
+"""
+Fetching of URL documents.
+
+URLs are downloaded into a local cache before conversion instead of being handed to
+docling, which downloads the whole file again on every call. The cache keeps the
+ETag and Last-Modified headers of each download, so later fetches are conditional
+requests and an unchanged document costs a 304 response and no conversion.
+
+Connections are kept alive in a pool per host, which also caps the concurrent
+requests to a host. fetch_many downloads several URLs in parallel on the fetch
+executor.
+"""
+import hashlib
+import http.client
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urljoin, urlsplit
+
+from rag_agent.config import FetchConfig
+from rag_agent.tools.utils.executor import fetch_executor
+
+logger = logging.getLogger(__name__)
+
+# Extensions docling recognizes, for URLs whose path has none
+CONTENT_TYPE_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "text/html": ".html",
+    "text/markdown": ".md",
+    "text/plain": ".txt",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": ".pptx",
+}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# Errors of a kept-alive connection the server closed in the meantime
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class FetchError(Exception):
+    """A URL could not be downloaded"""
+
+
+def is_url(document_path):
+    return document_path.startswith(("https://", "http://"))
+
+
+class ConnectionPool:
+    """Kept-alive connections to one host, at most `max_connections` used at a time"""
+
+    def __init__(self, scheme, host, port=None, max_connections=None, timeout=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = FetchConfig.TIMEOUT if timeout is None else timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections or FetchConfig.MAX_CONNECTIONS_PER_HOST)
+
+    def _new_connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection, waiting for a free slot
+
+        The connection goes back to the pool if the block completes; it is closed if it
+        raises or the block sets `reusable` to False on it.
+        """
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            if connection is None:
+                connection = self._new_connection()
+            connection.reused = reused
+            connection.reusable = True
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            if connection.reusable:
+                with self._lock:
+                    self._idle.append(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        with self._lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle = []
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a fetch"""
+    url: str
+    path: str  # Local copy of the document
+    changed: bool  # False if the server answered 304 Not Modified
+    status: int
+    indexed_collections: list = field(default_factory=list)  # Collections the cached version was indexed into
+
+
+class DocumentFetcher:
+    """Downloads URL documents into a local cache with conditional requests"""
+
+    def __init__(self, cache_dir=None, max_connections_per_host=None, timeout=None):
+        self.cache_dir = cache_dir or FetchConfig.CACHE_DIR
+        self.max_connections_per_host = max_connections_per_host or FetchConfig.MAX_CONNECTIONS_PER_HOST
+        self.timeout = FetchConfig.TIMEOUT if timeout is None else timeout
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        # Concurrent fetches of one URL share a single request
+        self._url_locks = {}
+
+    def _pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = self._pools[key] = ConnectionPool(
+                        scheme, host, port, self.max_connections_per_host, self.timeout
+                    )
+        return pool
+
+    def _url_lock(self, url):
+        with self._pools_lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _meta_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def cached(self, url):
+        """Metadata of the cached copy of a URL, None if there is none"""
+        try:
+            with open(self._meta_path(url)) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta if os.path.exists(meta["path"]) else None
+
+    def _write_meta(self, url, meta):
+        path = self._meta_path(url)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def mark_indexed(self, url, collection=None):
+        """Record that the cached version of a URL was indexed into a collection"""
+        with self._url_lock(url):
+            meta = self.cached(url)
+            if meta is not None and collection not in meta["indexed_collections"]:
+                meta["indexed_collections"].append(collection)
+                self._write_meta(url, meta)
+
+    def fetch(self, url):
+        """
+        Download a URL into the cache, unless the cached copy is still current
+
+        Returns:
+            FetchResult with the local path of the document
+
+        Raises:
+            FetchError: The server answered with an error, or too many redirects
+        """
+        with self._url_lock(url):
+            return self._fetch(url)
+
+    def _fetch(self, url):
+        meta = self.cached(url)
+        headers = {"User-Agent": FetchConfig.USER_AGENT, "Accept-Encoding": "identity"}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        target = url
+        for _ in range(FetchConfig.MAX_REDIRECTS + 1):
+            parts = urlsplit(target)
+            if parts.scheme not in ("http", "https"):
+                raise FetchError(f"Unsupported URL: {target}")
+            request_path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+            with self._pool(parts.scheme, parts.hostname, parts.port).connection() as connection:
+                response = self._request(connection, request_path, headers)
+                status = response.status
+                if status in REDIRECT_STATUSES:
+                    response.read()
+                    target = urljoin(target, response.getheader("Location", ""))
+                    continue
+                if status == 304 and meta is not None:
+                    response.read()
+                    return FetchResult(url, meta["path"], False, status, list(meta["indexed_collections"]))
+                if status != 200:
+                    response.read()
+                    raise FetchError(f"{url}: HTTP {status} {response.reason}")
+                return self._store(url, meta, response)
+        raise FetchError(f"{url}: too many redirects")
+
+    def _request(self, connection, path, headers):
+        for attempt in range(2):
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                break
+            except STALE_CONNECTION_ERRORS:
+                # The server closed the kept-alive connection, GET is safe to retry once
+                connection.close()
+                if attempt or not connection.reused:
+                    raise
+        if response.will_close:
+            connection.reusable = False
+        return response
+
+    def _store(self, url, previous, response):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        content_type = (response.getheader("Content-Type") or "").split(";")[0].strip().lower()
+        extension = os.path.splitext(urlsplit(url).path)[1] or CONTENT_TYPE_EXTENSIONS.get(
+            content_type, mimetypes.guess_extension(content_type) or ""
+        )
+        path = os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + extension)
+
+        began = time.perf_counter()
+        size = 0
+        with open(path + ".part", "wb") as f:
+            while chunk := response.read(1 << 16):
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(path + ".part", path)
+        if previous is not None and previous["path"] != path:
+            try:
+                os.remove(previous["path"])
+            except FileNotFoundError:
+                pass
+
+        meta = {
+            "url": url,
+            "path": path,
+            "etag": response.getheader("ETag"),
+            "last_modified": response.getheader("Last-Modified"),
+            "content_type": content_type,
+            "size": size,
+            "indexed_collections": [],
+        }
+        self._write_meta(url, meta)
+        logger.info(f"Downloaded {url} ({size} bytes in {time.perf_counter() - began:.2f}s)")
+        return FetchResult(url, path, True, response.status)
+
+    def fetch_many(self, urls):
+        """
+        Download several URLs concurrently
+
+        Returns:
+            Dictionary of URL to FetchResult, or to the exception its fetch raised
+        """
+        futures = {url: fetch_executor.submit(self.fetch, url) for url in dict.fromkeys(urls)}
+        results = {}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                results[url] = e
+        return results
+
+    def close(self):
+        for pool in list(self._pools.values()):
+            pool.close()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Fetcher shared by the process, so connections are reused across documents"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = DocumentFetcher()
+    return _fetcher
@@ -1,27 +1,42 @@
+import threading
 from transformers import AutoTokenizer, AutoModelForTokenClassification
 from transformers import pipeline
 
 import rag_agent.config as config
+from rag_agent.tools.utils.executor import run_cpu_bound
 
 model = "elastic/distilbert-base-uncased-finetuned-conll03-english"
 
-tokenizer = AutoTokenizer.from_pretrained(model)
-model = AutoModelForTokenClassification.from_pretrained(model)
+# Loaded on first use, or in the background during startup
+ner_pipeline = None
+_load_lock = threading.Lock()
 
-ner_pipeline = pipeline(
-    "ner",
-    model=model,
-    tokenizer=tokenizer,
-    aggregation_strategy="first",
-    device=config.device,
-)
+
+def load_pipeline():
+    """Load the NER model and tokenizer, once"""
+    global ner_pipeline
+    with _load_lock:
+        if ner_pipeline is None:
+            ner_pipeline = pipeline(
+                "ner",
+                model=AutoModelForTokenClassification.from_pretrained(model),
+                tokenizer=AutoTokenizer.from_pretrained(model),
+                aggregation_strategy="first",
+                device=config.device,
+            )
+    return ner_pipeline
 
 
 def extract_entities(text: str) -> dict[str]:
-    results = ner_pipeline(text)
+    pipe = ner_pipeline if ner_pipeline is not None else load_pipeline()
+    results = pipe(text)
     return {entity["word"]: entity["entity_group"] for entity in results}
 
 
+async def aextract_entities(text: str) -> dict[str]:
+    return await run_cpu_bound(extract_entities, text)
+
+
 if __name__ == "__main__":
     text = (
         "'I wish it need not have happened in my time,' said Frodo. 'So do I,' said Gandalf, "
@@ -0,0 +1,133 @@
+import hashlib
+from rag_agent.config import RetrieverConfig
+from rag_agent.tools.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+
+def shingles(text, size=3):
+    """Set of word n-grams of a text, used to detect near-duplicates"""
+    words = text.lower().split()
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def merge_texts(first, second):
+    """Concatenate two consecutive chunks, dropping the heading lines they share"""
+    first_lines = first.split("\n")
+    second_lines = second.split("\n")
+    shared = 0
+    while (
+        shared < min(len(first_lines), len(second_lines)) - 1
+        and first_lines[shared] == second_lines[shared]
+    ):
+        shared += 1
+    return first + "\n" + "\n".join(second_lines[shared:])
+
+
+def trim_text(text, max_tokens):
+    """Cut a text at a word boundary to fit in max_tokens"""
+    max_chars = max(max_tokens - 1, 0) * CHARS_PER_TOKEN - len(" [...]")
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[: cut if cut > 0 else max_chars] + " [...]"
+
+
+def pack_results(
+    results, token_budget, max_results, near_duplicate_threshold=None, min_trimmed_tokens=None, diagnostics=None
+):
+    """
+    Pack ranked search results into a token budget
+
+    Exact and near-duplicate chunks are dropped, chunks adjacent in the same document
+    are merged, and the lowest-ranked content is trimmed or dropped to fit the budget.
+
+    Args:
+        results: Search results, best first. Dictionaries with doc_name, chunk_text
+            and an optional chunk_index
+        token_budget: Maximum estimated tokens of the packed chunk texts
+        max_results: Maximum number of chunks considered, before merging
+        near_duplicate_threshold: Jaccard similarity above which a chunk is a near-duplicate
+        min_trimmed_tokens: Smallest remaining budget worth trimming a chunk into
+        diagnostics: Optional dictionary the number of distinct results (every result
+            that isn't a duplicate, also past max_results) is stored in, under "distinct"
+
+    Returns:
+        Tuple (packed results, tokens saved compared to the top max_results unpacked)
+    """
+    if near_duplicate_threshold is None:
+        near_duplicate_threshold = RetrieverConfig.NEAR_DUPLICATE_THRESHOLD
+    if min_trimmed_tokens is None:
+        min_trimmed_tokens = RetrieverConfig.MIN_TRIMMED_TOKENS
+
+    unpacked_tokens = sum(estimate_tokens(result["chunk_text"]) for result in results[:max_results])
+
+    # Drop exact and near-duplicates, keeping the best ranked copy
+    kept = []
+    seen_hashes = set()
+    kept_shingles = []
+    for result in results:
+        if len(kept) == max_results and diagnostics is None:
+            break
+        digest = hashlib.sha1(" ".join(result["chunk_text"].split()).encode()).digest()
+        if digest in seen_hashes:
+            continue
+        result_shingles = shingles(result["chunk_text"])
+        if any(jaccard(result_shingles, other) >= near_duplicate_threshold for other in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(result_shingles)
+        if len(kept) < max_results:
+            kept.append(dict(result))
+    if diagnostics is not None:
+        diagnostics["distinct"] = len(kept_shingles)
+
+    # Merge runs of chunks adjacent in the same document, at the rank of their best chunk
+    by_position = {
+        (result["doc_name"], result["chunk_index"]): result
+        for result in kept
+        if result.get("chunk_index") is not None
+    }
+    merged = []
+    absorbed = set()
+    for result in kept:
+        if id(result) in absorbed:
+            continue
+        index = result.get("chunk_index")
+        if index is not None:
+            doc_name = result["doc_name"]
+            first = last = index
+            while (doc_name, first - 1) in by_position:
+                first -= 1
+            while (doc_name, last + 1) in by_position:
+                last += 1
+            run = [by_position[(doc_name, i)] for i in range(first, last + 1)]
+            absorbed.update(id(chunk) for chunk in run)
+            if len(run) > 1:
+                text = run[0]["chunk_text"]
+                for chunk in run[1:]:
+                    text = merge_texts(text, chunk["chunk_text"])
+                result = dict(result, chunk_text=text, chunk_index=first)
+        merged.append(result)
+
+    # Fit in the budget, trimming or dropping the lowest-ranked content
+    packed = []
+    remaining = token_budget
+    for result in merged:
+        tokens = estimate_tokens(result["chunk_text"])
+        if tokens <= remaining:
+            packed.append(result)
+            remaining -= tokens
+            continue
+        if remaining >= min_trimmed_tokens:
+            packed.append(dict(result, chunk_text=trim_text(result["chunk_text"], remaining)))
+        break
+
+    packed_tokens = sum(estimate_tokens(result["chunk_text"]) for result in packed)
+    return packed, max(unpacked_tokens - packed_tokens, 0)
@@ -0,0 +1,94 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from rag_agent.config import DuckDBConfig, SearchTunerConfig
+
+
+class SearchTuner:
+    """
+    Adjusts the HNSW search breadth and the retriever over-fetch factor
+
+    ef_search trades similarity query latency for recall. It is lowered while the p95
+    latency of recent searches is above the target and raised again when there is
+    headroom. The over-fetch factor (candidates fetched per result returned) is raised
+    when dropping duplicate chunks leaves fewer candidates than results needed, and
+    lowered when distinct candidates are consistently left over.
+    """
+
+    def __init__(
+        self,
+        target_p95_ms=None,
+        ef_search=None,
+        overfetch=2.0,
+        window=None,
+        adjust_every=None,
+    ):
+        self.target_p95_ms = SearchTunerConfig.TARGET_P95_MS if target_p95_ms is None else target_p95_ms
+        self.ef_search = ef_search or DuckDBConfig.VSS_EF_SEARCH or 64
+        self.overfetch = overfetch
+        self.adjust_every = adjust_every or SearchTunerConfig.ADJUST_EVERY
+        window = window or SearchTunerConfig.WINDOW
+        self._latencies = deque(maxlen=window)
+        self._starved = deque(maxlen=window)
+        self._surplus = deque(maxlen=window)
+        self._observed = 0
+        self._lock = threading.Lock()
+
+    def settings(self, max_results):
+        """
+        Search settings for the next query
+
+        Returns:
+            Tuple (limit, ef_search)
+        """
+        with self._lock:
+            limit = math.ceil(max_results * self.overfetch)
+            # The index can't return more candidates than it explores
+            return limit, max(self.ef_search, limit)
+
+    def observe(self, sql_seconds, limit, candidates, survivors, max_results):
+        """
+        Record the outcome of a search
+
+        Args:
+            sql_seconds: Latency of the similarity query
+            limit: Limit of the similarity query
+            candidates: Rows it returned
+            survivors: Distinct candidates, once duplicate chunks were dropped
+            max_results: Results the retriever needed
+        """
+        with self._lock:
+            self._latencies.append(sql_seconds * 1000)
+            # Fewer rows than the limit means the corpus (or scope) has no more to give,
+            # fetching more wouldn't have helped
+            self._starved.append(candidates >= limit and survivors < max_results)
+            self._surplus.append(survivors / max(max_results, 1))
+            self._observed += 1
+            if self._observed % self.adjust_every == 0:
+                self._adjust()
+
+    def _adjust(self):
+        p95 = float(np.percentile(self._latencies, 95))
+        if p95 > self.target_p95_ms:
+            self.ef_search = max(SearchTunerConfig.MIN_EF_SEARCH, int(self.ef_search * 0.75))
+        elif p95 < 0.7 * self.target_p95_ms:
+            self.ef_search = min(SearchTunerConfig.MAX_EF_SEARCH, int(self.ef_search * 1.25) + 1)
+
+        starved_rate = sum(self._starved) / len(self._starved)
+        if starved_rate > 0.1 and p95 <= self.target_p95_ms:
+            self.overfetch = min(SearchTunerConfig.MAX_OVERFETCH, self.overfetch * 1.25)
+        elif starved_rate == 0 and min(self._surplus) >= 1.5:
+            self.overfetch = max(SearchTunerConfig.MIN_OVERFETCH, self.overfetch * 0.9)
+
+    def stats(self):
+        """Current settings and the latency they were tuned on"""
+        with self._lock:
+            return {
+                "ef_search": self.ef_search,
+                "overfetch": self.overfetch,
+                "p95_ms": float(np.percentile(self._latencies, 95)) if self._latencies else None,
+                "observed": self._observed,
+            }
@@ -1,8 +1,45 @@
+import heapq
 import json
-from rag_agent.db import get_connection
-from rag_agent.db.models import DocumentModel
+import threading
+from itertools import islice
+import duckdb
+from rag_agent.config import DuckDBConfig, ShardConfig, DeploymentConfig, ExactSearchConfig
+from rag_agent.db import get_cursor, get_write_lock
+from rag_agent.db.models import (
+    DocumentModel, CorpusStateModel, DocumentSummaryModel, IndexCheckpointModel, QueryLogModel
+)
+from rag_agent.db.shards import model_for, shard_for, shard_models
+from rag_agent.tools.utils.exact_search import exact_index, use_exact
+from rag_agent.tools.utils.executor import run_cpu_bound, shard_executor
 
-def store_document_chunk(doc_name, chunk_text, named_entities, embedding):
+_created_collections = set()
+_collections_lock = threading.Lock()
+
+def collection_model(collection=None):
+    """
+    Chunk model of a collection, creating its tables and indexes on first use
+
+    Args:
+        collection: Collection name, None for the default collection
+    """
+    model = DocumentModel.collection(collection)
+    if collection is None or collection in _created_collections:
+        return model
+    if DeploymentConfig.ROLE == "reader":
+        # Snapshots are read-only, the writer creates collections when indexing into them
+        return model
+
+    with _collections_lock:
+        if collection not in _created_collections:
+            conn = get_cursor()
+            with get_write_lock():
+                for shard in shard_models(model):
+                    shard.create_table_if_not_exists(conn)
+                DocumentSummaryModel.collection(collection).create_table_if_not_exists(conn)
+            _created_collections.add(collection)
+    return model
+
+def store_document_chunk(doc_name, chunk_text, named_entities, embedding, collection=None):
     """
     Store a document chunk with its embedding in the database
     
@@ -11,39 +48,61 @@ def store_document_chunk(doc_name, chunk_text, named_entities, embedding):
         chunk_text: Text content of the chunk
         named_entities: List of named entities (will be converted to JSON)
         embedding: Vector embedding as a list of floats
+        collection: Collection to store the chunk in, None for the default collection
     
     Returns:
         Boolean indicating success
     """
-    conn = get_connection()
+    model = collection_model(collection)
+    conn = get_cursor()
     
     # Convert named entities to JSON if needed
     if not isinstance(named_entities, str):
         named_entities = json.dumps(named_entities)
     
-    DocumentModel.insert_document_chunk(
-        conn, 
-        doc_name, 
-        chunk_text, 
-        named_entities, 
-        embedding
-    )
+    with get_write_lock():
+        shard = model_for(doc_name, model)
+        shard.insert_document_chunk(
+            conn, 
+            doc_name, 
+            chunk_text, 
+            named_entities, 
+            embedding
+        )
+        CorpusStateModel.bump_generation(conn)
+        _sync_exact_indexes([shard], conn)
     
     return True
 
-def search_similar_chunks(query_embedding, limit=5, doc_scope=None):
+def search_similar_chunks(query_embedding, limit=5, doc_scope=None, ef_search=None, collection=None):
     """
     Search for similar document chunks using vector similarity
     
     Args:
         query_embedding: Vector embedding as a list of floats
         limit: Maximum number of results to return
+        doc_scope: Optional document the search is limited to
+        ef_search: HNSW search breadth. Defaults to DuckDBConfig.VSS_EF_SEARCH
+        collection: Collection to search, None for the default collection
         
     Returns:
         List of matching document chunks with similarity scores
     """
-    conn = get_connection()
-    results = DocumentModel.search_similar(conn, query_embedding, limit, doc_scope=doc_scope)
+    model = collection_model(collection)
+    ef_search = ef_search if ef_search is not None else DuckDBConfig.VSS_EF_SEARCH
+    if doc_scope is not None:
+        # A document lives in a single shard
+        results = _search_shard(model_for(doc_scope, model), query_embedding, limit, doc_scope, ef_search)
+    elif ShardConfig.NUM_SHARDS == 1:
+        results = _search_shard(model, query_embedding, limit, None, ef_search)
+    else:
+        # Every shard returns its own top-k sorted by distance, merge them into the global top-k
+        futures = [
+            shard_executor.submit(_search_shard, shard, query_embedding, limit, None, ef_search)
+            for shard in shard_models(model)
+        ]
+        per_shard = [future.result() for future in futures]
+        results = list(islice(heapq.merge(*per_shard, key=lambda row: row[3]), limit))
     
     # Format results as dictionaries
     formatted_results = []
@@ -52,12 +111,88 @@ def search_similar_chunks(query_embedding, limit=5, doc_scope=None):
             "doc_name": row[0],
             "chunk_text": row[1],
             "named_entities": json.loads(row[2]) if row[2] else {},
-            "distance": row[3]
+            "distance": row[3],
+            "chunk_index": row[4]
         })
     
     return formatted_results
 
-def bulk_insert_chunks(chunks_list):
+def _search_shard(model, query_embedding, limit, doc_scope, ef_search):
+    """Search one shard on the calling thread's cursor, exactly or with its HNSW index"""
+    conn = get_cursor()
+    try:
+        index = _current_exact_index(model, conn)
+        if index is not None:
+            return _exact_search(index, conn, query_embedding, limit, doc_scope)
+        return model.search_similar(
+            conn,
+            query_embedding,
+            limit,
+            doc_scope=doc_scope,
+            with_position=True,
+            ef_search=ef_search,
+        )
+    except duckdb.CatalogException:
+        if DeploymentConfig.ROLE != "reader":
+            raise
+        # Collection not created yet in the snapshot: nothing indexed in it
+        return []
+
+def _current_exact_index(model, conn):
+    """
+    Exact index of a shard if it is searched exactly, None to use the HNSW index
+
+    The engine is picked by table size. The memory-mapped files are only brought up to
+    date by writes, a search uses them if they hold the table as its cursor sees it.
+    """
+    if ExactSearchConfig.ENGINE == "hnsw":
+        return None
+    index = exact_index(model)
+    index.load()
+    if index.matches(model.table_state(conn)) and use_exact(index.rows):
+        return index
+    return None
+
+def _sync_exact_indexes(models, conn):
+    """Build or update the exact search files of the tables small enough for them, holding the write lock"""
+    if ExactSearchConfig.ENGINE == "hnsw":
+        return
+    for model in models:
+        if use_exact(model.count_rows(conn)):
+            exact_index(model).sync(conn)
+
+def sync_exact_indexes(collection=None):
+    """Build or update the exact search files of the shards of a collection, e.g. at startup"""
+    if DeploymentConfig.ROLE == "reader":
+        # The writer maintains them
+        return
+    conn = get_cursor()
+    with get_write_lock():
+        _sync_exact_indexes(shard_models(collection_model(collection)), conn)
+
+def _exact_search(index, conn, query_embedding, limit, doc_scope):
+    """Brute-force search, rows in the same format as DocumentModel.search_similar"""
+    model = index.model
+    rowids = model.document_rowids(conn, doc_scope) if doc_scope is not None else None
+    found, distances = index.search(query_embedding, limit, rowids)
+    rows = {row[0]: row[1:] for row in model.fetch_rows(conn, found, with_position=True)}
+    return [
+        (*rows[rowid][:3], float(distance), rows[rowid][3])
+        for rowid, distance in zip(found.tolist(), distances)
+        if rowid in rows
+    ]
+
+async def asearch_similar_chunks(query_embedding, limit=5, doc_scope=None, ef_search=None, collection=None):
+    """
+    Async variant of search_similar_chunks
+
+    The query runs on the bounded CPU executor, each worker thread using its own cursor.
+    """
+    return await run_cpu_bound(
+        search_similar_chunks, query_embedding, limit, doc_scope, ef_search, collection
+    )
+
+def bulk_insert_chunks(chunks_list, collection=None, checkpoint=None):
     """
     Bulk insert multiple document chunks
     
@@ -67,11 +202,17 @@ def bulk_insert_chunks(chunks_list):
             - chunk_text: Text content
             - named_entities: Dict of named entities
             - embedding: Vector embedding as list of floats
+            - chunk_index: Optional position of the chunk in its document
+        collection: Collection to store the chunks in, None for the default collection
+        checkpoint: Optional keyword arguments of IndexCheckpointModel.save (doc_name,
+            version, chunks_done, last_chunk_index, completed), committed in the same
+            transaction as the chunks
                 
     Returns:
         Number of chunks inserted
     """
-    conn = get_connection()
+    model = collection_model(collection)
+    conn = get_cursor()
     
     # Convert list of dictionaries to list of tuples
     formatted_chunks = []
@@ -86,10 +227,145 @@ def bulk_insert_chunks(chunks_list):
             chunk["doc_name"],
             chunk["chunk_text"],
             named_entities,
-            chunk["embedding"]
+            chunk["embedding"],
+            chunk.get("chunk_index")
         )
         
         formatted_chunks.append(chunk_tuple)
     
-    doc_count = DocumentModel.insert_document_chunks_batch(conn, formatted_chunks)
-    return doc_count
\ No newline at end of file
+    # Chunks of a document all go to the shard it is routed to
+    shards = {}
+    for chunk_tuple in formatted_chunks:
+        shards.setdefault(shard_for(chunk_tuple[0]), []).append(chunk_tuple)
+
+    # The transaction runs on this thread's cursor; the lock keeps concurrent
+    # writers from conflicting with each other
+    with get_write_lock():
+        if checkpoint is None:
+            doc_count = sum(
+                model.shard(number).insert_document_chunks_batch(conn, shard_chunks)
+                for number, shard_chunks in shards.items()
+            )
+        else:
+            # The checkpoint never records chunks that weren't committed, or the reverse
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                doc_count = sum(
+                    model.shard(number).insert_document_chunks_batch(conn, shard_chunks, transaction=False)
+                    for number, shard_chunks in shards.items()
+                )
+                IndexCheckpointModel.save(conn, collection=collection, **checkpoint)
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                raise e
+        if doc_count:
+            CorpusStateModel.bump_generation(conn)
+            _sync_exact_indexes([model.shard(number) for number in shards], conn)
+    return doc_count
+
+def get_index_checkpoint(doc_name, collection=None):
+    """Indexing checkpoint of a document, None if it was never indexed into the collection"""
+    return IndexCheckpointModel.get(get_cursor(), doc_name, collection)
+
+def discard_document_chunks(doc_name, collection=None):
+    """
+    Delete the chunks and the checkpoint of a document
+
+    Returns:
+        Number of chunks deleted
+    """
+    model = collection_model(collection).shard(shard_for(doc_name))
+    conn = get_cursor()
+    with get_write_lock():
+        count = model.delete_document_chunks(conn, doc_name)
+        IndexCheckpointModel.delete(conn, doc_name, collection)
+        if count:
+            CorpusStateModel.bump_generation(conn)
+            _sync_exact_indexes([model], conn)
+    return count
+
+def replace_document_summaries(doc_name, summaries, collection=None):
+    """
+    Store the summary tree of a document, replacing any previous one
+
+    Args:
+        doc_name: Document name/ID
+        summaries: List of dictionaries, each containing:
+            - level: "section" or "document"
+            - section: Section title, None for the document summary
+            - summary_text: Summary
+            - embedding: Vector embedding as list of floats
+        collection: Collection of the document, None for the default collection
+
+    Returns:
+        Number of summaries inserted
+    """
+    collection_model(collection)
+    conn = get_cursor()
+    rows = [
+        (summary["level"], summary["section"], summary["summary_text"], summary["embedding"])
+        for summary in summaries
+    ]
+    with get_write_lock():
+        count = DocumentSummaryModel.collection(collection).replace_document_summaries(conn, doc_name, rows)
+        CorpusStateModel.bump_generation(conn)
+    return count
+
+def search_similar_summaries(query_embedding, limit=2, doc_scope=None, collection=None):
+    """
+    Search for section and document summaries similar to a query
+
+    Returns:
+        List of matching summaries with distances
+    """
+    collection_model(collection)
+    conn = get_cursor()
+    try:
+        results = DocumentSummaryModel.collection(collection).search_similar(
+            conn, query_embedding, limit, doc_scope=doc_scope
+        )
+    except duckdb.CatalogException:
+        if DeploymentConfig.ROLE != "reader":
+            raise
+        results = []
+    return [
+        {
+            "doc_name": row[0],
+            "level": row[1],
+            "section": row[2],
+            "summary_text": row[3],
+            "distance": row[4],
+        }
+        for row in results
+    ]
+
+def corpus_generation():
+    """
+    Get the generation of the indexed corpus
+
+    It changes whenever documents are indexed, so anything derived from search
+    results can be cached against it.
+    """
+    return CorpusStateModel.get_generation(get_cursor())
+
+def explain_search(query_embedding, limit=5, doc_scope=None, collection=None):
+    """Physical plan search_similar_chunks runs for a query, as text"""
+    model = collection_model(collection)
+    if doc_scope is not None:
+        model = model_for(doc_scope, model)
+    return model.explain_search(get_cursor(), query_embedding, limit, doc_scope)
+
+def log_query(entry, max_entries=None):
+    """
+    Record a search in the query log
+
+    Args:
+        entry: Dictionary of query_log column values
+        max_entries: If provided, the oldest entries beyond it are deleted
+    """
+    conn = get_cursor()
+    with get_write_lock():
+        QueryLogModel.insert_entry(conn, entry)
+        if max_entries is not None:
+            QueryLogModel.evict(conn, max_entries)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+from rag_agent.config import DeploymentConfig, SummaryCacheConfig
+from rag_agent.db import get_cursor, get_write_lock
+from rag_agent.db.models import SummaryCacheModel
+
+
+class SummaryCache:
+    """Content-addressed cache of summaries, bounded with LRU eviction"""
+
+    def __init__(self, max_entries=None, reuse_subsets=None, min_reuse_chars=None):
+        self.max_entries = SummaryCacheConfig.MAX_ENTRIES if max_entries is None else max_entries
+        self.reuse_subsets = SummaryCacheConfig.REUSE_SUBSETS if reuse_subsets is None else reuse_subsets
+        self.min_reuse_chars = (
+            SummaryCacheConfig.MIN_REUSE_CHARS if min_reuse_chars is None else min_reuse_chars
+        )
+
+    @staticmethod
+    def make_key(model_id, template_version, instruction, text, query):
+        """Hash everything that determines a summary"""
+        payload = json.dumps([model_id, template_version, instruction, text, query])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Get a cached summary, or None"""
+        conn = get_cursor()
+        summary = SummaryCacheModel.get_summary(conn, key)
+        if summary is None or DeploymentConfig.ROLE == "reader":
+            # Snapshots are read-only, don't update the LRU order
+            return summary
+        # The LRU order is best-effort: a lookup doesn't wait for a writer to touch it
+        lock = get_write_lock()
+        if lock.acquire(blocking=False):
+            try:
+                SummaryCacheModel.touch(conn, key)
+            finally:
+                lock.release()
+        return summary
+
+    def put(self, key, model_id, query, text, summary):
+        """Cache a summary, evicting the least recently used ones beyond the maximum size"""
+        if DeploymentConfig.ROLE == "reader":
+            return
+        conn = get_cursor()
+        with get_write_lock():
+            SummaryCacheModel.insert_summary(conn, key, model_id, query, text, summary)
+            SummaryCacheModel.evict(conn, self.max_entries)
+
+    def substitute_summarized(self, text, model_id, query):
+        """
+        Replace the longest previously summarized text contained in text by its summary
+
+        This lets a text that extends an already summarized one (e.g. more chunks of
+        the same document) be summarized from the earlier summary plus the new content.
+
+        Returns:
+            The text, with the substitution applied if any
+        """
+        if not self.reuse_subsets:
+            return text
+        match = SummaryCacheModel.find_contained(
+            get_cursor(), text, model_id, query, self.min_reuse_chars
+        )
+        if match is None:
+            return text
+        contained, summary = match
+        return text.replace(contained, f"[Summary of a previously seen passage]\n{summary}\n", 1)
@@ -0,0 +1,7 @@
+# The remote model's tokenizer isn't available locally, so LLM token counts are
+# estimated from the number of characters
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -0,0 +1,111 @@
+import functools
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from rag_agent.config import ToolCacheConfig
+from rag_agent.tools.utils.semantic_search import corpus_generation
+from rag_agent.metrics import record_cache
+
+
+def normalize_argument(value):
+    """Normalize a tool argument so that trivially different calls share a cache entry"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class ToolResultCache:
+    """Bounded LRU cache of tool results for one conversation"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or ToolCacheConfig.MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(tool_name, arguments, generation=None):
+        """Build a cache key from the tool name, its normalized arguments and the corpus generation"""
+        normalized = {name: normalize_argument(value) for name, value in arguments.items()}
+        return json.dumps([tool_name, normalized, generation], sort_keys=True, default=str)
+
+    def get(self, key):
+        """Get a cached result, or None if it isn't cached"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, result):
+        """Cache a result, evicting the least recently used one if the cache is full"""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def memoize_tool(tool, cache, depends_on_corpus=False, cache_if=None):
+    """
+    Wrap the forward method of a smolagents tool with a result cache
+
+    Args:
+        tool: Tool instance to wrap
+        cache: ToolResultCache shared by the tools of a conversation
+        depends_on_corpus: Whether results depend on the indexed documents. If so, the
+            corpus generation is part of the key and indexing new documents invalidates them
+        cache_if: Optional predicate on the result, results for which it's false are not cached
+
+    Returns:
+        The same tool, with its forward method wrapped
+    """
+    forward = tool.forward
+    signature = inspect.signature(forward)
+
+    @functools.wraps(forward)
+    def cached_forward(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        generation = corpus_generation() if depends_on_corpus else None
+        key = cache.make_key(tool.name, bound.arguments, generation)
+
+        result = cache.get(key)
+        record_cache(f"tool:{tool.name}", result is not None)
+        if result is not None:
+            return result
+
+        result = forward(*args, **kwargs)
+        if result is not None and (cache_if is None or cache_if(result)):
+            cache.put(key, result)
+        return result
+
+    tool.forward = cached_forward
+    return tool
+
+
+class ConversationCaches:
+    """Tool result caches keyed by conversation, keeping the most recently active ones"""
+
+    def __init__(self, max_conversations=None):
+        self.max_conversations = max_conversations or ToolCacheConfig.MAX_CONVERSATIONS
+        self._caches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id):
+        """Get the cache of a conversation, creating it if needed"""
+        with self._lock:
+            cache = self._caches.get(conversation_id)
+            if cache is None:
+                cache = self._caches[conversation_id] = ToolResultCache()
+            self._caches.move_to_end(conversation_id)
+            while len(self._caches) > self.max_conversations:
+                self._caches.popitem(last=False)
+            return cache
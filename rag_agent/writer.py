@@ -0,0 +1,89 @@
+"""
+Single-writer deployment helpers.
+
+DuckDB only allows one read-write process per database file. In a multi-process
+deployment one process runs with RAG_ROLE=writer: it owns the database, indexes
+documents and publishes read-only snapshots. Search processes run with
+RAG_ROLE=reader and forward indexing requests to the writer over HTTP.
+
+Document paths are forwarded as-is, so local files must be reachable by the
+writer under the same path (e.g. a shared upload directory).
+"""
+import json
+import logging
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag_agent.config import DeploymentConfig
+
+logger = logging.getLogger(__name__)
+
+
+def forward_index_request(document_path: str, collection=None) -> str:
+    """Ask the writer process to index a document into a collection and return its response text"""
+    request = urllib.request.Request(
+        f"{DeploymentConfig.WRITER_URL}/index",
+        data=json.dumps({"document_path": document_path, "collection": collection}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=DeploymentConfig.WRITER_TIMEOUT) as response:
+        return json.loads(response.read())["result"]
+
+
+class _IndexRequestHandler(BaseHTTPRequestHandler):
+    indexer = None
+    index_lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path != "/index":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            document_path = payload["document_path"]
+            collection = payload.get("collection")
+        except (ValueError, KeyError) as e:
+            self.send_error(400, f"Invalid request: {e}")
+            return
+
+        # Indexing is serialized: a single writer owns the database anyway
+        with self.index_lock:
+            result = self.indexer.index_document(document_path, collection)
+
+        body = json.dumps({"result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format, *args)
+
+
+def start_writer_server(indexer=None, host=None, port=None):
+    """
+    Serve forwarded indexing requests on a background thread
+
+    Args:
+        indexer: DocumentIndexer used for the requests. Created lazily if not provided
+        host: Interface to bind to. Defaults to DeploymentConfig.WRITER_HOST
+        port: Port to bind to. Defaults to DeploymentConfig.WRITER_PORT
+
+    Returns:
+        The running ThreadingHTTPServer
+    """
+    if indexer is None:
+        from rag_agent.tools.indexer import DocumentIndexer
+
+        indexer = DocumentIndexer()
+
+    handler = type("IndexRequestHandler", (_IndexRequestHandler,), {"indexer": indexer})
+    host = DeploymentConfig.WRITER_HOST if host is None else host
+    port = DeploymentConfig.WRITER_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,50 @@
+"""
+Tests for the HNSW recall sweep helpers.
+"""
+import duckdb
+import numpy as np
+
+from benchmarks.ann_sweep import (
+    exact_neighbours,
+    load_corpus,
+    query_sql,
+    recall_at_k,
+    recommend,
+    synthetic_corpus,
+)
+
+
+def test_exact_neighbours_match_duckdb_brute_force():
+    """Test that numpy ground truth agrees with an exact DuckDB scan for every metric"""
+    corpus = synthetic_corpus(300, dim=8, clusters=5)
+    queries = corpus[:4]
+    conn = duckdb.connect(":memory:")
+    load_corpus(conn, corpus)
+
+    for metric in ("cosine", "l2sq", "ip"):
+        expected = exact_neighbours(corpus, queries, metric, 3)
+        found = [
+            [row[0] for row in conn.execute(query_sql(metric, 8, 3), (q.tolist(),)).fetchall()]
+            for q in queries
+        ]
+        assert recall_at_k(found, expected) == 1.0
+    conn.close()
+
+
+def test_recall_at_k():
+    """Test that recall counts the fraction of exact neighbours found"""
+    assert recall_at_k([[1, 2], [3, 4]], np.array([[1, 2], [3, 5]])) == 0.75
+
+
+def test_recommend_picks_fastest_setting_above_target():
+    """Test that the recommendation ignores low recall and unused indexes"""
+    base = {"build_seconds": 1.0, "index_memory_bytes": 100}
+    results = [
+        {**base, "m": 8, "recall_at_k": 0.90, "p95_ms": 1.0, "index_used": True},
+        {**base, "m": 16, "recall_at_k": 0.97, "p95_ms": 3.0, "index_used": True},
+        {**base, "m": 32, "recall_at_k": 0.99, "p95_ms": 2.0, "index_used": True},
+        {**base, "m": 64, "recall_at_k": 1.00, "p95_ms": 0.5, "index_used": False},
+    ]
+
+    assert recommend(results, 0.95)["m"] == 32
+    assert recommend(results, 0.999) is None
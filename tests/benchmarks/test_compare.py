@@ -0,0 +1,49 @@
+"""
+Tests for the benchmark baseline comparison.
+"""
+import numpy as np
+
+from benchmarks import stubs
+from benchmarks.compare import compare, flatten
+
+
+def test_flatten_keeps_numeric_leaves():
+    """Test that nested results are flattened to dotted metric names"""
+    flat = flatten({"size_10": {"search": {"p50_ms": 1.5, "label": "x"}}, "ok": True})
+    assert flat == {"size_10.search.p50_ms": 1.5}
+
+
+def test_compare_flags_regressions_by_direction():
+    """Test that lower throughput and higher latency are regressions beyond the tolerance"""
+    baseline = {"insert": {"rows_per_sec": 1000.0}, "search": {"p95_ms": 10.0, "p99_ms": 20.0}}
+    current = {"insert": {"rows_per_sec": 850.0}, "search": {"p95_ms": 10.5, "p99_ms": 30.0}}
+
+    report = {entry["metric"]: entry for entry in compare(current, baseline, tolerance=0.1)}
+
+    assert report["insert.rows_per_sec"]["regression"]
+    assert not report["search.p95_ms"]["regression"]
+    assert report["search.p99_ms"]["regression"]
+    assert abs(report["search.p99_ms"]["change"] + 0.5) < 1e-9
+
+
+def test_compare_improvements_and_unknown_metrics():
+    """Test that improvements are never flagged and non-performance metrics are skipped"""
+    baseline = {"rows_per_sec": 100.0, "p50_ms": 5.0, "rows": 10}
+    current = {"rows_per_sec": 200.0, "p50_ms": 1.0, "rows": 1}
+
+    report = compare(current, baseline)
+
+    assert [entry["metric"] for entry in report] == ["p50_ms", "rows_per_sec"]
+    assert not any(entry["regression"] for entry in report)
+
+
+def test_stub_encoder_is_deterministic():
+    """Test that the stub encoder returns the same normalized vectors for the same texts"""
+    first = stubs.encode(["a", "b"])
+    second = stubs.encode(["a", "b"])
+
+    assert first.shape == (2, stubs.EMBEDDING_DIM)
+    assert first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+    assert stubs.extract_entities("Frodo met Gandalf") == {"Frodo": "MISC", "Gandalf": "MISC"}
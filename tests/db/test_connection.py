@@ -145,3 +145,76 @@ def test_close():
     
     # Verify conn was set to None
     assert db.conn is None
+
+
+@patch('duckdb.connect')
+def test_cursor_is_per_thread(mock_connect):
+    """Test that each thread gets its own cursor and reuses it"""
+    import threading
+
+    mock_conn = MagicMock()
+    mock_conn.cursor.side_effect = lambda: MagicMock()
+    mock_connect.return_value = mock_conn
+
+    # Reset any existing connection
+    DuckDBConnection._instance = None
+
+    db = DuckDBConnection()
+    main_cursor = db.cursor()
+
+    # The same thread always gets the same cursor
+    assert db.cursor() is main_cursor
+
+    # Another thread gets a different cursor on the same connection
+    other = {}
+    thread = threading.Thread(target=lambda: other.setdefault("cursor", db.cursor()))
+    thread.start()
+    thread.join()
+
+    assert other["cursor"] is not main_cursor
+    assert mock_conn.cursor.call_count == 2
+    mock_connect.assert_called_once()
+
+
+@patch('duckdb.connect')
+def test_close_closes_cursors(mock_connect):
+    """Test that close also closes the cursors and a new cursor is created afterwards"""
+    mock_conn = MagicMock()
+    mock_conn.cursor.side_effect = lambda: MagicMock()
+    mock_connect.return_value = mock_conn
+
+    # Reset any existing connection
+    DuckDBConnection._instance = None
+
+    db = DuckDBConnection()
+    cursor = db.cursor()
+    db.close()
+
+    cursor.close.assert_called_once()
+    assert db.cursor() is not cursor
+
+
+@patch('duckdb.connect')
+def test_cursors_of_finished_threads_are_closed(mock_connect):
+    """Test that short-lived threads don't leave their cursors open"""
+    import gc
+    import threading
+
+    mock_conn = MagicMock()
+    mock_conn.cursor.side_effect = lambda: MagicMock()
+    mock_connect.return_value = mock_conn
+
+    # Reset any existing connection
+    DuckDBConnection._instance = None
+
+    db = DuckDBConnection()
+    cursors = []
+    for _ in range(50):
+        thread = threading.Thread(target=lambda: cursors.append(db.cursor()))
+        thread.start()
+        thread.join()
+    del thread
+    gc.collect()
+
+    assert db._cursors == []
+    assert all(cursor.close.call_count == 1 for cursor in cursors)
@@ -95,3 +95,170 @@ def test_search_similar(populated_document_table, sample_embedding):
     # Verify we got a result filtered by doc_name
     assert len(results_with_scope) == 1
     assert results_with_scope[0][0] == "test_doc_1.txt"
+
+
+def test_corpus_state_generation():
+    """Test that the corpus generation starts at 0 and is bumped"""
+    import duckdb
+    from rag_agent.db.models import CorpusStateModel
+
+    conn = duckdb.connect(":memory:")
+    CorpusStateModel.create_table_if_not_exists(conn)
+    # Creating it again must not add a second row
+    CorpusStateModel.create_table_if_not_exists(conn)
+
+    assert CorpusStateModel.get_generation(conn) == 0
+    assert CorpusStateModel.bump_generation(conn) == 1
+    assert CorpusStateModel.get_generation(conn) == 1
+
+
+def test_answer_cache_find_similar(sample_embedding):
+    """Test that cached answers are matched by similarity and corpus generation"""
+    import duckdb
+    import numpy as np
+    from rag_agent.db.models import AnswerCacheModel
+
+    conn = duckdb.connect(":memory:")
+    AnswerCacheModel.create_table_if_not_exists(conn)
+    AnswerCacheModel.insert_answer(conn, "Who is Frodo?", "A hobbit.", sample_embedding, 3)
+
+    match = AnswerCacheModel.find_similar(conn, sample_embedding, 3, 0.95, 3600)
+    assert match[1:3] == ("Who is Frodo?", "A hobbit.")
+    assert match[3] > 0.99
+
+    # Stale corpus generation
+    assert AnswerCacheModel.find_similar(conn, sample_embedding, 4, 0.95, 3600) is None
+
+    # Dissimilar question
+    other = (-np.array(sample_embedding)).tolist()
+    assert AnswerCacheModel.find_similar(conn, other, 3, 0.95, 3600) is None
+
+    # Answers given in another collection
+    assert AnswerCacheModel.find_similar(conn, sample_embedding, 3, 0.95, 3600, "team_a") is None
+
+    # Hits are recorded
+    AnswerCacheModel.record_hit(conn, match[0])
+    assert conn.execute("SELECT hits FROM answer_cache").fetchone()[0] == 1
+
+
+def test_answer_cache_evict(sample_embedding):
+    """Test that stale answers and answers beyond the maximum are evicted"""
+    import duckdb
+    from rag_agent.db.models import AnswerCacheModel
+
+    conn = duckdb.connect(":memory:")
+    AnswerCacheModel.create_table_if_not_exists(conn)
+    AnswerCacheModel.insert_answer(conn, "Old corpus", "Answer", sample_embedding, 1)
+    for i in range(3):
+        AnswerCacheModel.insert_answer(conn, f"Question {i}", "Answer", sample_embedding, 2)
+
+    AnswerCacheModel.evict(conn, max_entries=2, ttl_seconds=3600, corpus_generation=2)
+
+    questions = [row[0] for row in conn.execute("SELECT question FROM answer_cache").fetchall()]
+    assert len(questions) == 2
+    assert "Old corpus" not in questions
+
+
+def test_replace_document_summaries(sample_embedding):
+    """Test that the summaries of a document are replaced and searchable"""
+    import duckdb
+    from rag_agent.db.models import DocumentSummaryModel
+
+    conn = duckdb.connect(":memory:")
+    DocumentSummaryModel.create_table_if_not_exists(conn)
+
+    DocumentSummaryModel.replace_document_summaries(
+        conn,
+        "report.pdf",
+        [
+            ("section", "Introduction", "Old section summary", sample_embedding),
+            ("document", None, "Old document summary", sample_embedding),
+        ],
+    )
+    count = DocumentSummaryModel.replace_document_summaries(
+        conn, "report.pdf", [("document", None, "New document summary", sample_embedding)]
+    )
+
+    assert count == 1
+    results = DocumentSummaryModel.search_similar(conn, sample_embedding, limit=2)
+    assert len(results) == 1
+    assert results[0][:4] == ("report.pdf", "document", None, "New document summary")
+
+    # Doc scope
+    assert DocumentSummaryModel.search_similar(conn, sample_embedding, doc_scope="other.pdf") == []
+
+
+def test_query_log_worst_and_summary():
+    """Test that the query log reports the slowest searches and aggregates"""
+    import duckdb
+    from rag_agent.db.models import QueryLogModel
+
+    conn = duckdb.connect(":memory:")
+    QueryLogModel.create_table_if_not_exists(conn)
+    for i, total_ms in enumerate([600.0, 1500.0, 900.0]):
+        QueryLogModel.insert_entry(
+            conn,
+            {
+                "query_text": f"Query {i}",
+                "doc_scope": None,
+                "total_ms": total_ms,
+                "sql_ms": total_ms / 2,
+                "candidates": 10,
+                "returned": 5,
+                "distances": [0.1, 0.2],
+                "index_used": i != 1,
+            },
+        )
+
+    worst = QueryLogModel.worst(conn, limit=2)
+    assert [row[1] for row in worst] == ["Query 1", "Query 2"]
+    assert worst[0][10] == [0.1, 0.2]
+
+    count, p50, p95, max_ms, _, _, sql_ms, _, without_index = QueryLogModel.summary(conn, since_hours=1)
+    assert count == 3
+    assert p50 == 900.0
+    assert max_ms == 1500.0
+    assert sql_ms == 500.0
+    assert without_index == 1
+
+    QueryLogModel.evict(conn, max_entries=1)
+    assert conn.execute("SELECT count(*) FROM query_log").fetchone()[0] == 1
+
+
+def test_search_similar_sets_ef_search(sample_embedding):
+    """Test that a per-query ef_search is applied to the session before searching"""
+    from unittest.mock import MagicMock
+    from rag_agent.db.models import DocumentModel
+
+    conn = MagicMock()
+    conn.execute.return_value.fetchall.return_value = []
+
+    DocumentModel.search_similar(conn, sample_embedding, limit=5, ef_search=200)
+    assert conn.execute.call_args_list[0].args[0] == "SET SESSION hnsw_ef_search = 200"
+
+    # The next search without one doesn't inherit it
+    conn.reset_mock()
+    DocumentModel.search_similar(conn, sample_embedding, limit=5)
+    assert conn.execute.call_args_list[0].args[0] == "RESET SESSION hnsw_ef_search"
+
+    # Reset once, until a value is set again
+    conn.reset_mock()
+    DocumentModel.search_similar(conn, sample_embedding, limit=5)
+    assert "hnsw_ef_search" not in str(conn.execute.call_args_list)
+
+
+def test_summary_search_resets_a_tuned_ef_search(sample_embedding):
+    """Test that a summary search uses the default search breadth after a tuned chunk search"""
+    from unittest.mock import MagicMock
+    from rag_agent.db.models import DocumentModel, DocumentSummaryModel
+
+    conn = MagicMock()
+    conn.execute.return_value.fetchall.return_value = []
+
+    DocumentSummaryModel.search_similar(conn, sample_embedding)
+    assert "hnsw_ef_search" not in str(conn.execute.call_args_list)
+
+    DocumentModel.search_similar(conn, sample_embedding, limit=5, ef_search=200)
+    conn.reset_mock()
+    DocumentSummaryModel.search_similar(conn, sample_embedding)
+    assert conn.execute.call_args_list[0].args[0] == "RESET SESSION hnsw_ef_search"
@@ -0,0 +1,99 @@
+"""
+Unit tests for the Parquet export and import of the corpus.
+"""
+import json
+from unittest.mock import patch
+
+import duckdb
+import numpy as np
+import pytest
+
+from rag_agent.db.export import corpus_tables, export_snapshot, import_snapshot
+from rag_agent.db.models import CorpusStateModel, DocumentModel, DocumentSummaryModel
+from rag_agent.tools.utils.exact_search import ExactIndex
+
+
+def populate(conn):
+    rng = np.random.default_rng(0)
+    models = [DocumentModel, DocumentModel.shard(1), DocumentModel.collection("team_a")]
+    for model in models:
+        model.create_table_if_not_exists(conn)
+        model.insert_document_chunks_batch(conn, [
+            (f"doc-{i}.pdf", f"{model.table_name} chunk {i}", '{"Frodo": "PER"}', rng.random(384).tolist(), i)
+            for i in range(5)
+        ])
+    DocumentSummaryModel.create_table_if_not_exists(conn)
+    DocumentSummaryModel.replace_document_summaries(
+        conn, "doc-0.pdf", [("document", None, "A summary", rng.random(384).tolist())]
+    )
+    CorpusStateModel.create_table_if_not_exists(conn)
+    CorpusStateModel.bump_generation(conn)
+
+
+def test_export_then_import_round_trip(tmp_path):
+    """Test that every chunk and summary table is restored with identical rows and embeddings"""
+    source = duckdb.connect(":memory:")
+    populate(source)
+    path = str(tmp_path / "snapshot")
+
+    manifest = export_snapshot(source, path)
+
+    assert set(manifest["tables"]) == {
+        "document_chunks", "document_chunks_shard1", "document_chunks__team_a", "document_summaries"
+    }
+    assert manifest["tables"]["document_chunks"]["rows"] == 5
+    assert json.loads((tmp_path / "snapshot" / "manifest.json").read_text()) == manifest
+
+    target = duckdb.connect(":memory:")
+    CorpusStateModel.create_table_if_not_exists(target)
+    loaded = import_snapshot(target, path)
+
+    assert loaded == {table_name: table["rows"] for table_name, table in manifest["tables"].items()}
+    assert set(corpus_tables(target)) == set(manifest["tables"])
+    for table_name in manifest["tables"]:
+        query = f"SELECT * FROM {table_name} ORDER BY ALL"
+        assert target.execute(query).fetchall() == source.execute(query).fetchall()
+    embedding_type = target.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'document_chunks' AND column_name = 'embedding'"
+    ).fetchone()[0]
+    assert embedding_type == "FLOAT[384]"
+    # Caches derived from the previous corpus are invalidated
+    assert CorpusStateModel.get_generation(target) == 1
+
+
+def test_import_deletes_exact_search_files(tmp_path):
+    """Test that the exact search files of the recreated tables are deleted, other tables' are kept"""
+    source = duckdb.connect(":memory:")
+    populate(source)
+    path = str(tmp_path / "snapshot")
+    export_snapshot(source, path)
+    exact_dir = tmp_path / "exact"
+    DocumentModel.shard(2).create_table_if_not_exists(source)
+    for model in (DocumentModel, DocumentModel.shard(2)):
+        ExactIndex(model, str(exact_dir)).sync(source)
+
+    with patch("rag_agent.tools.utils.exact_search.ExactSearchConfig.DIR", str(exact_dir)):
+        import_snapshot(source, path)
+
+    assert sorted(file.name for file in exact_dir.iterdir()) == [
+        "document_chunks_shard2-0.f32", "document_chunks_shard2-0.rowid", "document_chunks_shard2.json"
+    ]
+
+
+def test_import_rejects_other_embedding_dimensions(tmp_path):
+    """Test that a snapshot made with another embedding model isn't loaded"""
+    source = duckdb.connect(":memory:")
+    populate(source)
+    path = str(tmp_path / "snapshot")
+    export_snapshot(source, path)
+
+    manifest_path = tmp_path / "snapshot" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["embedding_dim"] = 768
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        import_snapshot(duckdb.connect(":memory:"), path)
+    with pytest.raises(FileExistsError):
+        export_snapshot(source, path)
@@ -0,0 +1,131 @@
+"""
+Unit tests for the document chunk shards.
+"""
+import threading
+from unittest.mock import patch
+
+import duckdb
+import numpy as np
+import pytest
+
+from rag_agent.db.models import CorpusStateModel, DocumentModel
+from rag_agent.db.shards import (
+    existing_collections, existing_shards, main, model_for, rebalance, shard_for, shard_models
+)
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def insert(conn, doc_names, num_shards, model=DocumentModel):
+    rng = np.random.default_rng(0)
+    for doc_name in doc_names:
+        model_for(doc_name, model, num_shards=num_shards).insert_document_chunks_batch(
+            conn,
+            [(doc_name, f"{doc_name} chunk {i}", "{}", rng.random(384).tolist(), i) for i in range(2)],
+        )
+
+
+def test_shard_for_is_stable_and_in_range():
+    """Test that routing is deterministic and covers the configured shards"""
+    shards = {shard_for(f"doc-{i}.pdf", 4) for i in range(100)}
+
+    assert shards == {0, 1, 2, 3}
+    assert shard_for("report.pdf", 4) == shard_for("report.pdf", 4)
+    assert shard_for("report.pdf", 1) == 0
+
+
+def test_shard_models_names():
+    """Test that shard 0 is the original table and the others get their own tables and indexes"""
+    models = shard_models(num_shards=3)
+
+    assert models[0] is DocumentModel
+    assert [model.table_name for model in models[1:]] == ["document_chunks_shard1", "document_chunks_shard2"]
+    assert models[2].index_name == "document_chunks_shard2_embedding_idx"
+    assert DocumentModel.shard(2) is models[2]
+
+
+def test_collection_models():
+    """Test that collections get their own tables, compose with shards and validate their names"""
+    team = DocumentModel.collection("team_a")
+
+    assert DocumentModel.collection(None) is DocumentModel
+    assert DocumentModel.collection("team_a") is team
+    assert team.table_name == "document_chunks__team_a"
+    assert team.index_name == "document_chunks__team_a_embedding_idx"
+    assert team.shard(1).table_name == "document_chunks__team_a_shard1"
+    with pytest.raises(ValueError):
+        DocumentModel.collection("Team A; DROP TABLE")
+    # Would be the table of shard 1 of collection "team_a"
+    with pytest.raises(ValueError):
+        DocumentModel.collection("team_a_shard1")
+    assert DocumentModel.collection("team_a_shard").table_name == "document_chunks__team_a_shard"
+
+
+def test_rebalance_after_adding_shards(conn):
+    """Test that documents move to their new shard when shards are added"""
+    doc_names = [f"doc-{i}.pdf" for i in range(12)]
+    DocumentModel.create_table_if_not_exists(conn)
+    insert(conn, doc_names, num_shards=1)
+
+    moved = rebalance(conn, num_shards=3)
+
+    assert existing_shards(conn) == [0, 1, 2]
+    assert moved and all(source == 0 for source, _ in moved.values())
+    for doc_name in doc_names:
+        table_name = model_for(doc_name, num_shards=3).table_name
+        count = conn.execute(f"SELECT count(*) FROM {table_name} WHERE doc_name = ?", (doc_name,)).fetchone()[0]
+        assert count == 2
+    total = sum(
+        conn.execute(f"SELECT count(*) FROM {model.table_name}").fetchone()[0]
+        for model in shard_models(num_shards=3)
+    )
+    assert total == 24
+
+    # Nothing left to move
+    assert rebalance(conn, num_shards=3) == {}
+
+
+def test_rebalance_drops_removed_shards(conn):
+    """Test that shards beyond the new count are drained and dropped"""
+    doc_names = [f"doc-{i}.pdf" for i in range(10)]
+    for model in shard_models(num_shards=3):
+        model.create_table_if_not_exists(conn)
+    insert(conn, doc_names, num_shards=3)
+
+    rebalance(conn, num_shards=2)
+
+    assert existing_shards(conn) == [0, 1]
+    total = sum(
+        conn.execute(f"SELECT count(*) FROM {model.table_name}").fetchone()[0]
+        for model in shard_models(num_shards=2)
+    )
+    assert total == 20
+
+
+def test_rebalance_covers_collections(conn, capsys):
+    """Test that the rebalance command moves the documents of every collection"""
+    team = DocumentModel.collection("team_a")
+    doc_names = [f"doc-{i}.pdf" for i in range(12)]
+    CorpusStateModel.create_table_if_not_exists(conn)
+    for model in (DocumentModel, team):
+        model.create_table_if_not_exists(conn)
+        insert(conn, doc_names, num_shards=1, model=model)
+    DocumentModel.collection("team_a_shard").create_table_if_not_exists(conn)
+
+    assert existing_collections(conn) == ["team_a", "team_a_shard"]
+
+    with patch("rag_agent.db.init_db", return_value=conn), \
+         patch("rag_agent.db.get_write_lock", return_value=threading.Lock()):
+        assert main(["rebalance", "--shards", "3"]) == 0
+
+    assert existing_shards(conn, team) == [0, 1, 2]
+    for doc_name in doc_names:
+        table_name = model_for(doc_name, team, num_shards=3).table_name
+        count = conn.execute(f"SELECT count(*) FROM {table_name} WHERE doc_name = ?", (doc_name,)).fetchone()[0]
+        assert count == 2
+    assert "document_chunks__team_a_shard2" in capsys.readouterr().out
@@ -0,0 +1,176 @@
+"""
+Unit tests for snapshot publishing and read-only reader connections.
+"""
+import os
+import shutil
+import threading
+import time
+from unittest.mock import patch, MagicMock
+import duckdb
+import pytest
+from rag_agent.db.connection import DuckDBConnection
+from rag_agent.db.snapshots import PublishScheduler, current_snapshot, publish_snapshot
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    """Point the snapshot directory to a temporary path"""
+    with patch('rag_agent.config.DeploymentConfig.SNAPSHOT_DIR', str(tmp_path / "snapshots")):
+        yield tmp_path / "snapshots"
+
+
+def test_current_snapshot_without_publish(snapshot_dir):
+    """Test that no generation is reported before the first publish"""
+    assert current_snapshot() == (None, None)
+
+
+def test_publish_snapshot(snapshot_dir, tmp_path):
+    """Test that a published snapshot is a readable copy of the database"""
+    db_path = str(tmp_path / "main.duckdb")
+    conn = duckdb.connect(db_path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.execute("INSERT INTO t VALUES (1), (2)")
+
+    generation = publish_snapshot(conn, db_path, threading.Lock())
+
+    assert generation == 0
+    assert current_snapshot()[0] == 0
+
+    snapshot = duckdb.connect(current_snapshot()[1], read_only=True)
+    assert snapshot.execute("SELECT count(*) FROM t").fetchone()[0] == 2
+    snapshot.close()
+
+    # A new publish bumps the generation
+    conn.execute("INSERT INTO t VALUES (3)")
+    assert publish_snapshot(conn, db_path, threading.Lock()) == 1
+    conn.close()
+
+
+def test_publish_snapshot_prunes_old_generations(snapshot_dir, tmp_path):
+    """Test that only the configured number of generations is kept"""
+    db_path = str(tmp_path / "main.duckdb")
+    conn = duckdb.connect(db_path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+
+    with patch('rag_agent.config.DeploymentConfig.SNAPSHOT_KEEP', 2):
+        for _ in range(4):
+            publish_snapshot(conn, db_path, threading.Lock())
+    conn.close()
+
+    snapshots = sorted(f for f in os.listdir(snapshot_dir) if f.endswith(".duckdb"))
+    assert snapshots == ["gen-00000002.duckdb", "gen-00000003.duckdb"]
+
+
+def test_concurrent_publishes_get_distinct_generations(snapshot_dir, tmp_path):
+    """Test that publishes racing in one process don't share a generation or a temporary file"""
+    db_path = str(tmp_path / "main.duckdb")
+    conn = duckdb.connect(db_path)
+    conn.execute("CREATE TABLE t AS SELECT range AS x FROM range(100000)")
+    write_lock = threading.RLock()
+    generations, errors = [], []
+
+    def publish():
+        try:
+            generations.append(publish_snapshot(conn, db_path, write_lock))
+        except Exception as e:
+            errors.append(e)
+
+    with patch('rag_agent.config.DeploymentConfig.SNAPSHOT_KEEP', 10):
+        threads = [threading.Thread(target=publish) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    conn.close()
+
+    assert errors == []
+    assert sorted(generations) == list(range(6))
+    assert current_snapshot()[0] == 5
+
+
+def test_publish_copies_without_the_write_lock(snapshot_dir, tmp_path):
+    """Test that writers are only held up by the checkpoint, not by the copy of the file"""
+    db_path = str(tmp_path / "main.duckdb")
+    conn = duckdb.connect(db_path)
+    conn.execute("CREATE TABLE t AS SELECT range AS x FROM range(1000)")
+    write_lock = threading.Lock()
+    threshold = conn.execute("SELECT current_setting('checkpoint_threshold')").fetchone()[0]
+    copyfile = shutil.copyfile
+
+    def copy(source, target):
+        assert not write_lock.locked()
+        # Committed during the copy, not part of the snapshot
+        conn.cursor().execute("INSERT INTO t VALUES (-1)")
+        copyfile(source, target)
+
+    with patch('rag_agent.db.snapshots.shutil.copyfile', side_effect=copy):
+        publish_snapshot(conn, db_path, write_lock)
+
+    assert conn.execute("SELECT current_setting('checkpoint_threshold')").fetchone()[0] == threshold
+    conn.close()
+    snapshot = duckdb.connect(current_snapshot()[1], read_only=True)
+    assert snapshot.execute("SELECT count(*) FROM t").fetchone()[0] == 1000
+    snapshot.close()
+
+
+def test_publish_requests_are_coalesced():
+    """Test that requests made while a publish is pending or running need at most one more publish"""
+    started, release = [], threading.Event()
+
+    def publish():
+        started.append(time.monotonic())
+        release.wait(5)
+
+    scheduler = PublishScheduler(publish, interval=0.2)
+    scheduler.request()
+    deadline = time.monotonic() + 5
+    while not started and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for _ in range(5):
+        scheduler.request()
+    release.set()
+
+    time.sleep(0.6)
+    assert len(started) == 2
+    assert started[1] - started[0] >= 0.2
+
+
+@patch('duckdb.connect')
+def test_reader_reopens_new_generation(mock_connect):
+    """Test that a reader opens snapshots read-only and switches to new generations"""
+    connections = [MagicMock(), MagicMock()]
+    mock_connect.side_effect = connections
+
+    # Reset any existing connection
+    DuckDBConnection._instance = None
+
+    with patch('rag_agent.config.DeploymentConfig.ROLE', "reader"), \
+         patch('rag_agent.config.DeploymentConfig.SNAPSHOT_REFRESH_INTERVAL', 0), \
+         patch('rag_agent.db.connection.current_snapshot') as mock_current:
+        mock_current.return_value = (0, "/snapshots/gen-00000000.duckdb")
+        db = DuckDBConnection()
+        first_cursor = db.cursor()
+
+        mock_connect.assert_called_once_with("/snapshots/gen-00000000.duckdb", read_only=True)
+        assert db.cursor() is first_cursor
+
+        # The writer publishes a new generation
+        mock_current.return_value = (1, "/snapshots/gen-00000001.duckdb")
+        second_cursor = db.cursor()
+
+        assert db.conn is connections[1]
+        assert second_cursor is not first_cursor
+        assert db.generation == 1
+
+    db.close()
+
+
+def test_reader_without_snapshot():
+    """Test that a reader fails clearly when no snapshot was published"""
+    # Reset any existing connection
+    DuckDBConnection._instance = None
+
+    with patch('rag_agent.config.DeploymentConfig.ROLE', "reader"), \
+         patch('rag_agent.db.connection.current_snapshot', return_value=(None, None)):
+        with pytest.raises(RuntimeError, match="No snapshot published"):
+            DuckDBConnection().connect()
@@ -0,0 +1,92 @@
+"""
+Tests for the per-stage metrics.
+"""
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from rag_agent import metrics
+from rag_agent.metrics import Counter, Histogram, MetricsRegistry
+
+
+@pytest.fixture
+def enabled():
+    with patch.object(metrics.MetricsConfig, "ENABLED", True):
+        yield
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test that histograms render cumulative buckets, sum and count in Prometheus format"""
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1)))
+    histogram.observe(0.05, "embed")
+    histogram.observe(0.1, "embed")
+    histogram.observe(5, "embed")
+
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="embed",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="embed",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="embed",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="embed"} 3' in text
+    assert 'latency_seconds_sum{stage="embed"} 5.15' in text
+
+
+def test_counter_escapes_labels():
+    """Test that label values are escaped"""
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests", ("cache",)))
+    counter.inc('a"b')
+    counter.inc('a"b', value=2)
+
+    assert 'requests_total{cache="a\\"b"} 3.0' in registry.render()
+
+
+def test_span_records_duration_items_and_errors(enabled):
+    """Test that spans observe their duration, count items and count failures"""
+    before = metrics.stage_seconds.count("test", "stage")
+
+    with metrics.span("test", "stage") as stage:
+        stage.add_items(3)
+    with pytest.raises(ValueError):
+        with metrics.span("test", "stage"):
+            raise ValueError("boom")
+
+    assert metrics.stage_seconds.count("test", "stage") == before + 2
+    assert metrics.items_processed.value("test", "stage") >= 3
+    assert metrics.stage_errors.value("test", "stage") >= 1
+
+
+def test_disabled_span_is_a_shared_noop():
+    """Test that nothing is recorded while metrics are disabled"""
+    with patch.object(metrics.MetricsConfig, "ENABLED", False):
+        span = metrics.span("disabled", "stage")
+        with span as stage:
+            stage.add_items(1)
+        metrics.record_cache("disabled", True)
+        assert metrics.span("other", "stage") is span
+
+    assert metrics.stage_seconds.count("disabled", "stage") == 0
+    assert metrics.cache_requests.value("disabled", "hit") == 0
+
+
+def test_metrics_server_and_file(enabled, tmp_path):
+    """Test that the metrics are served over HTTP and written to a file"""
+    metrics.record_cache("answer", True)
+
+    server = metrics.start_metrics_server(host="127.0.0.1", port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'rag_cache_requests_total{cache="answer",result="hit"}' in body
+
+    path = tmp_path / "rag.prom"
+    metrics.write_metrics_file(str(path))
+    assert "rag_stage_duration_seconds" in path.read_text()
@@ -0,0 +1,80 @@
+"""
+Tests for the slow-query log.
+"""
+from datetime import datetime
+from unittest.mock import patch
+
+from rag_agent.query_log import SlowQueryLog, format_report, plan_uses_index
+
+
+def test_fast_queries_are_not_logged():
+    """Test that searches under the threshold are not recorded"""
+    log = SlowQueryLog(threshold_ms=100)
+
+    with patch("rag_agent.query_log.io_executor") as mock_executor:
+        assert log.record("query", None, {"search": 0.01}, 0.05, 10, 5, [0.1]) is None
+
+    mock_executor.submit.assert_not_called()
+
+
+def test_slow_query_entry_and_plan():
+    """Test that slow searches are written with phase timings and index usage"""
+    log = SlowQueryLog(threshold_ms=100, explain=True, max_entries=50)
+    timings = {"ner": 0.01, "embed": 0.02, "search": 0.2, "search_summaries": 0.05, "rerank": 0.001}
+
+    with patch("rag_agent.query_log.explain_search", return_value="HNSW_INDEX_SCAN\n") as mock_explain, \
+         patch("rag_agent.query_log.log_query") as mock_log:
+        future = log.record(
+            "Who is Frodo?", "lotr.pdf", timings, 0.3, 10, 4, [0.1, 0.3],
+            query_embedding=[0.1] * 384, limit=10,
+        )
+        future.result(timeout=5)
+
+    mock_explain.assert_called_once_with([0.1] * 384, 10, "lotr.pdf", None)
+    entry, max_entries = mock_log.call_args.args
+    assert max_entries == 50
+    assert entry["query_text"] == "Who is Frodo?"
+    assert entry["doc_scope"] == "lotr.pdf"
+    assert round(entry["total_ms"]) == 300
+    assert round(entry["sql_ms"]) == 250
+    assert round(entry["ner_ms"]) == 10
+    assert entry["candidates"] == 10
+    assert entry["returned"] == 4
+    assert entry["distances"] == [0.1, 0.3]
+    assert entry["index_used"] is True
+
+
+def test_reader_role_does_not_log():
+    """Test that readers never write to their read-only snapshot"""
+    log = SlowQueryLog(threshold_ms=0)
+
+    with patch("rag_agent.query_log.DeploymentConfig") as mock_config, \
+         patch("rag_agent.query_log.io_executor") as mock_executor:
+        mock_config.ROLE = "reader"
+        assert log.record("query", None, {}, 1.0, 10, 5, []) is None
+
+    mock_executor.submit.assert_not_called()
+
+
+def test_plan_uses_index():
+    """Test the detection of HNSW scans in plans"""
+    assert plan_uses_index("┌─────┐\n│ HNSW_INDEX_SCAN │")
+    assert not plan_uses_index("│ SEQ_SCAN │\n│ TOP_N │")
+
+
+def test_format_report():
+    """Test the report of the worst offenders"""
+    summary = (1, 1200.0, 1200.0, 1200.0, 5.0, 20.0, 1100.0, 2.0, 1)
+    worst = [
+        (datetime(2025, 1, 1, 12, 0), "Who is Frodo?", None, 1200.0, 5.0, 20.0, 1100.0, 2.0,
+         10, 3, [0.42, 0.5], False),
+    ]
+
+    report = format_report(summary, worst)
+
+    assert "1 slow searches" in report
+    assert "'Who is Frodo?'" in report
+    assert "10 candidates -> 3 returned" in report
+    assert "best distance 0.420" in report
+    assert "index used: NO" in report
+    assert format_report((0, None, None, None, None, None, None, None, 0), []) == "No slow queries logged."
@@ -0,0 +1,73 @@
+"""
+Unit tests for the phased startup and the health endpoints.
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from rag_agent.startup import Startup, start_health_server
+
+
+def get(server, path):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, json.loads(body) if e.headers.get("Content-Type") == "application/json" else None
+
+
+def test_readiness_flips_when_all_phases_are_done():
+    """Test that the process is healthy right away and ready once every phase completed"""
+    startup = Startup()
+    release = threading.Event()
+
+    startup.run(
+        [("database", lambda: None), ("indexes", release.wait)],
+        [("embedding_model", lambda: None)],
+    )
+    server = start_health_server(startup, host="127.0.0.1", port=0)
+    try:
+        assert get(server, "/healthz")[0] == 200
+        code, status = get(server, "/readyz")
+        assert code == 503 and not status["ready"]
+
+        release.set()
+        assert startup.wait(5)
+
+        code, status = get(server, "/readyz")
+        assert code == 200
+        assert all(phase["state"] == "done" for phase in status["phases"].values())
+        assert status["phases"]["indexes"]["seconds"] >= 0
+        assert get(server, "/other")[0] == 404
+    finally:
+        server.shutdown()
+
+
+def test_failed_phase_skips_its_chain():
+    """Test that a failed phase is reported and never becomes ready"""
+    startup = Startup()
+
+    def fail():
+        raise RuntimeError("No snapshot published")
+
+    startup.run([("database", fail), ("indexes", lambda: None)], [("ner_model", lambda: None)])
+
+    assert not startup.wait(5)
+    phases = startup.status()["phases"]
+    assert phases["database"]["state"] == "failed"
+    assert phases["database"]["error"] == "No snapshot published"
+    assert phases["indexes"]["state"] == "skipped"
+    assert "failed" in startup.summary()
+
+
+def test_health_server_listens_on_localhost_by_default():
+    """Test that the health endpoints aren't exposed to other hosts unless configured"""
+    server = start_health_server(Startup(), port=0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        assert get(server, "/healthz")[0] == 200
+    finally:
+        server.shutdown()
@@ -0,0 +1,68 @@
+"""
+Unit tests for streaming agent steps to the chat UI.
+"""
+from unittest.mock import MagicMock
+from smolagents.memory import ActionStep, FinalAnswerStep, ToolCall
+from smolagents.models import ChatMessageStreamDelta
+from rag_agent.streaming import stream_agent_events
+
+
+def make_agent(events):
+    """Create a mock agent whose streamed run yields the given events"""
+    agent = MagicMock()
+    agent.tools = {"search_tool": MagicMock(), "summarizer_tool": MagicMock(), "final_answer": MagicMock()}
+    agent.run.return_value = iter(events)
+    return agent
+
+
+def test_stream_agent_events():
+    """Test that tool calls, retrieved documents and the final answer are streamed in order"""
+    step = ActionStep(
+        step_number=1,
+        tool_calls=[ToolCall(name="python_interpreter", arguments="print(search_tool(query='Frodo'))", id="1")],
+        observations=(
+            "Execution logs:\nRetrieved texts:\n"
+            "<document_chunk> \nDocument of Origin: lotr.pdf\n=====\nText\n</document_chunk>"
+            "<document_chunk> \nDocument of Origin: lotr.pdf\n=====\nText\n</document_chunk>"
+            "<document_chunk> \nDocument of Origin: hobbit.pdf\n=====\nText\n</document_chunk>"
+        ),
+    )
+    agent = make_agent(
+        [
+            ChatMessageStreamDelta(content="Thought: "),
+            ChatMessageStreamDelta(content="search"),
+            step,
+            FinalAnswerStep(final_answer="Frodo is a hobbit."),
+        ]
+    )
+
+    updates = list(stream_agent_events(agent, "Who is Frodo?", additional_args={"a": 1}))
+
+    agent.run.assert_called_once_with("Who is Frodo?", stream=True, additional_args={"a": 1})
+
+    # Partial output is visible before the step completes
+    assert updates[0][0]["content"] == "Thought: "
+    assert updates[1][0]["content"] == "Thought: search"
+    assert updates[1][0]["metadata"]["status"] == "pending"
+
+    final = updates[-1]
+    assert final[0]["metadata"]["status"] == "done"
+    assert final[1]["metadata"]["title"] == "🛠️ Step 1: search_tool"
+    assert final[2]["metadata"]["title"] == "📚 Retrieved documents"
+    assert final[2]["content"] == "- lotr.pdf\n- hobbit.pdf"
+    assert final[-1] == {"role": "assistant", "content": "Frodo is a hobbit."}
+
+
+def test_stream_agent_events_updates_are_independent():
+    """Test that earlier updates are not mutated by later events"""
+    agent = make_agent(
+        [
+            ChatMessageStreamDelta(content="a"),
+            ChatMessageStreamDelta(content="b"),
+        ]
+    )
+
+    updates = list(stream_agent_events(agent, "Task"))
+
+    assert updates[0][0]["content"] == "a"
+    assert updates[1][0]["content"] == "ab"
@@ -0,0 +1,22 @@
+"""
+Unit tests for forwarding indexing requests to the writer process.
+"""
+from unittest.mock import patch, MagicMock
+from rag_agent.writer import forward_index_request, start_writer_server
+
+
+def test_forward_index_request():
+    """Test that an indexing request is executed by the writer and its result returned"""
+    indexer = MagicMock()
+    indexer.index_document.return_value = "Document indexed successfully."
+
+    server = start_writer_server(indexer=indexer, host="127.0.0.1", port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with patch('rag_agent.config.DeploymentConfig.WRITER_URL', url):
+            result = forward_index_request("/shared/uploads/report.pdf", "team_a")
+    finally:
+        server.shutdown()
+
+    indexer.index_document.assert_called_once_with("/shared/uploads/report.pdf", "team_a")
+    assert result == "Document indexed successfully."
@@ -1,14 +1,43 @@
 """
 Unit tests for the DocumentIndexer tool.
 """
+import os
+import time
 from unittest.mock import patch, MagicMock
+
+import pytest
+
 from rag_agent.tools.indexer import DocumentIndexer
+from rag_agent.config import ConversionConfig, IndexerConfig
+from rag_agent.tools.utils.fetcher import FetchResult
+
+
+@pytest.fixture(autouse=True)
+def mock_checkpoints():
+    """No document has a checkpoint unless a test sets one"""
+    with patch('rag_agent.tools.indexer.get_index_checkpoint', return_value=None) as mock_get, \
+         patch('rag_agent.tools.indexer.discard_document_chunks') as mock_discard:
+        yield mock_get, mock_discard
+
+
+def chunker_with(texts):
+    """Mock HybridChunker producing one chunk per text"""
+    chunker = MagicMock()
+    chunker.chunk.return_value = [MagicMock() for _ in texts]
+    chunker.contextualize.side_effect = list(texts)
+    return chunker
+
+
+def embedded(text):
+    embedding = MagicMock()
+    embedding.tolist.return_value = [0.1] * 384
+    return [(text, embedding)]
 
 
 def test_indexer_initialization():
     """Test that the document indexer tool initializes correctly"""
     # Patch at the import point in the module being tested, not where it's defined
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker:
         
         # Create the tool
@@ -27,7 +56,7 @@ def test_indexer_initialization():
 
 def test_indexer_document_conversion_failure():
     """Test handling of document conversion failure"""
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker:
         
         # Configure the converter to raise an exception
@@ -47,10 +76,10 @@ def test_indexer_document_conversion_failure():
 
 def test_indexer_forward_success():
     """Test successful document indexing"""
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
          patch('rag_agent.tools.indexer.extract_entities') as mock_extract_entities, \
-         patch('rag_agent.tools.indexer.encode') as mock_encode, \
+         patch('rag_agent.tools.indexer.encode_chunk') as mock_encode_chunk, \
          patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
         
         # Configure mocks for a successful indexing process
@@ -70,9 +99,9 @@ def test_indexer_forward_success():
         
         mock_extract_entities.return_value = {"Entity": "ORG"}
         
-        mock_embeddings = [MagicMock()]
-        mock_encode.return_value = mock_embeddings
-        mock_embeddings[0].tolist.return_value = [0.1] * 384
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode_chunk.side_effect = lambda text: [(text, mock_embedding)]
         
         # Create the tool and call forward
         tool = DocumentIndexer()
@@ -86,7 +115,7 @@ def test_indexer_forward_success():
         
         # Verify named entity extraction and embedding generation
         assert mock_extract_entities.call_count == len(mock_chunks)
-        assert mock_encode.call_count >= 1
+        assert mock_encode_chunk.call_count == len(mock_chunks)
         
         # Verify bulk insertion was called
         assert mock_bulk_insert.called
@@ -97,12 +126,175 @@ def test_indexer_forward_success():
         assert "Document indexed successfully" in result
 
 
+def test_indexer_splits_chunks_longer_than_the_model_window():
+    """Test that each piece of a split chunk is stored as its own row"""
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities') as mock_extract_entities, \
+         patch('rag_agent.tools.indexer.encode_chunk') as mock_encode_chunk, \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
+
+        mock_chunker = MagicMock()
+        MockChunker.return_value = mock_chunker
+        mock_chunker.chunk.return_value = [MagicMock(), MagicMock()]
+        mock_chunker.contextualize.side_effect = ["Long chunk", "Short chunk"]
+        mock_extract_entities.return_value = {}
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode_chunk.side_effect = [
+            [("Long", mock_embedding), (" chunk", mock_embedding)],
+            [("Short chunk", mock_embedding)],
+        ]
+
+        tool = DocumentIndexer()
+        result = tool.forward(document_path="/path/to/document.pdf")
+
+        rows = mock_bulk_insert.call_args[0][0]
+        assert [row["chunk_text"] for row in rows] == ["Long", " chunk", "Short chunk"]
+        assert [row["chunk_index"] for row in rows] == [0, 1, 2]
+        assert "Document indexed successfully" in result
+
+
+def test_indexer_converts_in_the_pool_when_configured():
+    """Test that documents go to the conversion workers when there are some"""
+    with patch.object(ConversionConfig, 'WORKERS', 2), \
+         patch('rag_agent.tools.indexer.get_conversion_pool') as mock_get_pool, \
+         patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks'):
+
+        MockChunker.return_value.chunk.return_value = []
+
+        tool = DocumentIndexer()
+        result = tool.forward(document_path="/path/to/document.pdf")
+
+        mock_get_pool.return_value.convert.assert_called_once_with("/path/to/document.pdf")
+        assert not MockConverter.called
+        assert "Document indexed successfully" in result
+
+
+def test_indexer_writes_in_batches_with_checkpoints():
+    """Test that rows are flushed every BATCH_SIZE rows with the progress of the document"""
+    with patch.object(IndexerConfig, 'BATCH_SIZE', 2), \
+         patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities', return_value={}), \
+         patch('rag_agent.tools.indexer.encode_chunk', side_effect=embedded), \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
+
+        MockChunker.return_value = chunker_with([f"Chunk {i}" for i in range(5)])
+
+        result = DocumentIndexer().forward(document_path="/path/to/document.pdf")
+
+        batches = [call.args[0] for call in mock_bulk_insert.call_args_list]
+        checkpoints = [call.kwargs["checkpoint"] for call in mock_bulk_insert.call_args_list]
+        assert [[row["chunk_index"] for row in batch] for batch in batches] == [[0, 1], [2, 3], [4]]
+        assert [checkpoint["chunks_done"] for checkpoint in checkpoints] == [2, 4, 5]
+        assert [checkpoint["last_chunk_index"] for checkpoint in checkpoints] == [1, 3, 4]
+        assert [checkpoint["completed"] for checkpoint in checkpoints] == [False, False, True]
+        assert "Document indexed successfully" in result
+
+
+def test_indexer_resumes_from_checkpoint(tmp_path, mock_checkpoints):
+    """Test that the chunks committed by an interrupted run are not processed again"""
+    mock_get, mock_discard = mock_checkpoints
+    path = tmp_path / "document.md"
+    path.write_text("# Document")
+    stat = os.stat(path)
+    mock_get.return_value = {
+        "version": f"{stat.st_size}:{stat.st_mtime_ns}",
+        "chunks_done": 2,
+        "last_chunk_index": 2,  # A chunk was split in two
+        "completed": False,
+    }
+
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities', return_value={}), \
+         patch('rag_agent.tools.indexer.encode_chunk', side_effect=embedded) as mock_encode_chunk, \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
+
+        MockChunker.return_value = chunker_with([f"Chunk {i}" for i in range(4)])
+
+        result = DocumentIndexer().forward(document_path=str(path))
+
+        assert [call.args[0] for call in mock_encode_chunk.call_args_list] == ["Chunk 2", "Chunk 3"]
+        rows = mock_bulk_insert.call_args.args[0]
+        assert [row["chunk_index"] for row in rows] == [3, 4]
+        assert mock_bulk_insert.call_args.kwargs["checkpoint"]["completed"]
+        assert not mock_discard.called
+        assert "Document indexed successfully" in result
+
+
+def test_indexer_resumes_a_chunk_whose_pieces_failed(tmp_path, mock_checkpoints):
+    """Test that a split chunk failing on its second piece is written by the resumed run, once"""
+    mock_get, _ = mock_checkpoints
+    path = tmp_path / "document.md"
+    path.write_text("# Document")
+    written, failed = [], []
+
+    def insert(rows, collection=None, checkpoint=None):
+        written.extend(row["chunk_text"] for row in rows)
+        mock_get.return_value = {key: checkpoint[key] for key in checkpoint if key != "doc_name"}
+
+    def split(text):
+        return embedded(text) if text == "Chunk 0" else embedded(f"{text} a") + embedded(f"{text} b")
+
+    def extract_entities(text):
+        if text == "Chunk 1 b" and not failed:
+            failed.append(text)
+            raise RuntimeError("NER failed")
+        return {}
+
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities', side_effect=extract_entities), \
+         patch('rag_agent.tools.indexer.encode_chunk', side_effect=split), \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks', side_effect=insert):
+
+        MockChunker.return_value = chunker_with(["Chunk 0", "Chunk 1"])
+        first = DocumentIndexer().forward(document_path=str(path))
+        assert "Failed to process chuncks" in first
+        assert written == ["Chunk 0"]
+        assert (mock_get.return_value["chunks_done"], mock_get.return_value["last_chunk_index"]) == (1, 0)
+
+        MockChunker.return_value = chunker_with(["Chunk 0", "Chunk 1"])
+        second = DocumentIndexer().forward(document_path=str(path))
+
+    assert "Document indexed successfully" in second
+    assert written == ["Chunk 0", "Chunk 1 a", "Chunk 1 b"]
+    assert mock_get.return_value["completed"]
+
+
+def test_indexer_discards_partial_run_over_another_version(tmp_path, mock_checkpoints):
+    """Test that a document that changed since the interrupted run is indexed from the start"""
+    mock_get, mock_discard = mock_checkpoints
+    path = tmp_path / "document.md"
+    path.write_text("# Document, second version")
+    mock_get.return_value = {"version": "10:1", "chunks_done": 1, "last_chunk_index": 0, "completed": False}
+
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities', return_value={}), \
+         patch('rag_agent.tools.indexer.encode_chunk', side_effect=embedded), \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
+
+        MockChunker.return_value = chunker_with(["Chunk 0", "Chunk 1"])
+
+        DocumentIndexer().forward(document_path=str(path))
+
+        mock_discard.assert_called_once_with("document.md", None)
+        rows = mock_bulk_insert.call_args.args[0]
+        assert [row["chunk_index"] for row in rows] == [0, 1]
+
+
 def test_indexer_forward_chunking_failure():
     """Test handling of chunking failure"""
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
          patch('rag_agent.tools.indexer.extract_entities') as mock_extract_entities, \
-         patch('rag_agent.tools.indexer.encode') as mock_encode, \
+         patch('rag_agent.tools.indexer.encode_chunk') as mock_encode_chunk, \
          patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
         
         # Configure the document conversion to succeed
@@ -133,10 +325,10 @@ def test_indexer_forward_chunking_failure():
 
 def test_indexer_forward_indexing_failure():
     """Test handling of indexing failure"""
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
          patch('rag_agent.tools.indexer.extract_entities') as mock_extract_entities, \
-         patch('rag_agent.tools.indexer.encode') as mock_encode, \
+         patch('rag_agent.tools.indexer.encode_chunk') as mock_encode_chunk, \
          patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
         
         # Configure document conversion and chunking to succeed
@@ -157,9 +349,9 @@ def test_indexer_forward_indexing_failure():
         # Configure named entity extraction and encoding to succeed
         mock_extract_entities.return_value = {"Entity": "ORG"}
         
-        mock_embeddings = [MagicMock()]
-        mock_encode.return_value = mock_embeddings
-        mock_embeddings[0].tolist.return_value = [0.1] * 384
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode_chunk.side_effect = lambda text: [(text, mock_embedding)]
         
         # Configure bulk_insert to raise an exception
         mock_bulk_insert.side_effect = Exception("Indexing error")
@@ -176,7 +368,7 @@ def test_indexer_forward_indexing_failure():
 
 def test_indexer_url_handling():
     """Test handling of URL documents"""
-    with patch('rag_agent.tools.indexer.DocumentConverter') as MockConverter, \
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
          patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
          patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
         
@@ -197,12 +389,103 @@ def test_indexer_url_handling():
         # Configure bulk_insert to succeed with empty list
         mock_bulk_insert.return_value = 0
         
-        # URL to test
+        # URL to test, downloaded by the fetcher
         url = "https://example.com/document.pdf"
+        mock_fetcher = MagicMock()
+        mock_fetcher.fetch.return_value = FetchResult(url, "/cache/0a1b.pdf", True, 200)
         
         # Create the tool and call forward
-        tool = DocumentIndexer()
+        tool = DocumentIndexer(fetcher=mock_fetcher)
         result = tool.forward(document_path=url)
         
-        # Verify the document was converted with the URL
-        mock_converter.convert.assert_called_once_with(url)
+        # Verify the downloaded copy was converted and recorded as indexed
+        mock_fetcher.fetch.assert_called_once_with(url)
+        mock_converter.convert.assert_called_once_with("/cache/0a1b.pdf")
+        mock_fetcher.mark_indexed.assert_called_once_with(url, None)
+        assert "successfully" in result
+
+
+def test_indexer_skips_unchanged_url():
+    """Test that a URL the server reports unchanged since it was indexed is not converted again"""
+    with patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
+         patch('rag_agent.tools.indexer.HybridChunker'), \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks') as mock_bulk_insert:
+
+        url = "https://example.com/document.pdf"
+        mock_fetcher = MagicMock()
+        mock_fetcher.fetch.return_value = FetchResult(url, "/cache/0a1b.pdf", False, 304, ["team_a"])
+
+        tool = DocumentIndexer(collection="team_a", fetcher=mock_fetcher)
+        result = tool.forward(document_path=url)
+
+        assert not MockConverter.return_value.convert.called
+        assert not mock_bulk_insert.called
+        assert "unchanged" in result
+
+
+def test_indexer_reader_forwards_to_writer():
+    """Test that a reader process forwards indexing to the writer instead of converting"""
+    with patch('rag_agent.config.DeploymentConfig.ROLE', "reader"), \
+         patch('rag_agent.tools.indexer.ProfiledConverter') as MockConverter, \
+         patch('rag_agent.tools.indexer.forward_index_request') as mock_forward:
+
+        mock_forward.return_value = "Processing document.pdf...\nDocument indexed successfully."
+
+        tool = DocumentIndexer()
+        result = tool.forward(document_path="/path/to/document.pdf")
+
+        # Verify nothing was converted locally
+        assert not MockConverter.called
+        mock_forward.assert_called_once_with("/path/to/document.pdf", None)
+        assert "Document indexed successfully" in result
+
+
+def test_indexer_builds_summary_tree():
+    """Test that section and document summaries are built for an indexed document"""
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker'), \
+         patch('rag_agent.tools.indexer.encode') as mock_encode, \
+         patch('rag_agent.tools.indexer.replace_document_summaries') as mock_replace:
+
+        mock_summarizer = MagicMock()
+        mock_summarizer.forward.side_effect = lambda text: f"Summary of {len(text)} chars"
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.side_effect = lambda texts: [mock_embedding] * len(texts)
+        mock_replace.return_value = 3
+
+        tool = DocumentIndexer(summarizer=mock_summarizer)
+        count = tool.build_summary_tree(
+            "report.pdf",
+            {"Introduction": ["Chunk 1", "Chunk 2"], "Results": ["Chunk 3"]},
+        )
+
+        # Two sections and the document
+        assert count == 3
+        assert mock_summarizer.forward.call_count == 3
+        summaries = mock_replace.call_args[0][1]
+        assert [summary["level"] for summary in summaries] == ["section", "section", "document"]
+        assert [summary["section"] for summary in summaries] == ["Introduction", "Results", None]
+
+
+def test_indexer_forgets_finished_summary_trees():
+    """Test that the summary trees built in the background are not kept once done"""
+    with patch('rag_agent.tools.indexer.ProfiledConverter'), \
+         patch('rag_agent.tools.indexer.HybridChunker') as MockChunker, \
+         patch('rag_agent.tools.indexer.extract_entities', return_value={}), \
+         patch('rag_agent.tools.indexer.encode_chunk', side_effect=embedded), \
+         patch('rag_agent.tools.indexer.bulk_insert_chunks'), \
+         patch.object(DocumentIndexer, 'build_summary_tree', return_value=1):
+
+        tool = DocumentIndexer(summarizer=MagicMock())
+        for i in range(3):
+            MockChunker.return_value.chunk.return_value = [MagicMock()]
+            MockChunker.return_value.contextualize.side_effect = [f"Chunk of document {i}"]
+            tool.forward(document_path=f"/path/to/document-{i}.pdf")
+
+        deadline = time.monotonic() + 5
+        while tool.pending_summaries and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert DocumentIndexer.build_summary_tree.call_count == 3
+        assert not tool.pending_summaries
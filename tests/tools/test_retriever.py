@@ -184,3 +184,130 @@ def test_retriever_input_validation():
         # These should not raise any exceptions
         tool.forward(query="Valid query")
         tool.forward(query="Valid query", doc_name="doc.txt")
+
+
+def test_retriever_aforward():
+    """Test the async retrieval path returns the same output as forward"""
+    import asyncio
+
+    query = "Who is Frodo Baggins?"
+
+    with patch('rag_agent.tools.retriever.aencode') as mock_aencode, \
+         patch('rag_agent.tools.retriever.aextract_entities') as mock_aextract, \
+         patch('rag_agent.tools.retriever.asearch_similar_chunks') as mock_asearch:
+
+        # Configure the mocks
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+
+        async def aencode(texts):
+            return [mock_embedding]
+
+        async def aextract(text):
+            return {"Frodo": "PER"}
+
+        async def asearch(query_embedding, limit, doc_scope, ef_search=None, collection=None):
+            return [
+                {
+                    "doc_name": "lotr.txt",
+                    "chunk_text": "Text about Frodo",
+                    "named_entities": {"Frodo": "PER"},
+                    "distance": 0.2
+                }
+            ]
+
+        mock_aencode.side_effect = aencode
+        mock_aextract.side_effect = aextract
+        mock_asearch.side_effect = asearch
+
+        tool = TextRetriever(max_results=2)
+        result = asyncio.run(tool.aforward(query=query))
+
+        mock_aencode.assert_called_once_with([query])
+        mock_aextract.assert_called_once_with(query)
+        assert mock_asearch.call_args[1]["limit"] == 4
+        assert "Text about Frodo" in result
+
+
+def test_retriever_prefers_closer_summaries():
+    """Test that summaries closer to the query than all chunks replace chunks in the output"""
+    with patch('rag_agent.tools.retriever.encode') as mock_encode, \
+         patch('rag_agent.tools.retriever.extract_entities') as mock_extract, \
+         patch('rag_agent.tools.retriever.search_similar_chunks') as mock_search, \
+         patch('rag_agent.tools.retriever.search_similar_summaries') as mock_search_summaries:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        mock_extract.return_value = {}
+
+        mock_search.return_value = [
+            {"doc_name": "report.pdf", "chunk_text": f"Chunk {i}", "named_entities": {}, "distance": 0.3 + i / 100}
+            for i in range(4)
+        ]
+        mock_search_summaries.return_value = [
+            {"doc_name": "report.pdf", "level": "document", "section": None,
+             "summary_text": "The report is about hobbits.", "distance": 0.1},
+            {"doc_name": "report.pdf", "level": "section", "section": "Appendix",
+             "summary_text": "Unrelated appendix.", "distance": 0.5},
+        ]
+
+        tool = TextRetriever(max_results=3, summary_results=2)
+        result = tool.forward(query="What is the report about?")
+
+        assert "The report is about hobbits." in result
+        assert "Unrelated appendix." not in result
+        assert "Chunk 1" in result
+        assert "Chunk 2" not in result
+
+
+def test_retriever_packs_duplicates():
+    """Test that duplicate chunks are dropped and the saved tokens reported"""
+    with patch('rag_agent.tools.retriever.encode') as mock_encode, \
+         patch('rag_agent.tools.retriever.extract_entities') as mock_extract, \
+         patch('rag_agent.tools.retriever.search_similar_chunks') as mock_search:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        mock_extract.return_value = {}
+
+        text = "The ring was destroyed in the fires of Mount Doom."
+        mock_search.return_value = [
+            {"doc_name": "a.pdf", "chunk_text": text, "named_entities": {}, "distance": 0.1, "chunk_index": 0},
+            {"doc_name": "b.pdf", "chunk_text": text, "named_entities": {}, "distance": 0.2, "chunk_index": 7},
+        ]
+
+        tool = TextRetriever(max_results=2)
+        result = tool.forward(query="Where was the ring destroyed?")
+
+        assert result.count(text) == 1
+        assert "saving about" in result
+
+
+def test_retriever_uses_tuner_settings():
+    """Test that the tuner chooses the candidate limit and ef_search, and observes the outcome"""
+    with patch('rag_agent.tools.retriever.encode') as mock_encode, \
+         patch('rag_agent.tools.retriever.extract_entities') as mock_extract, \
+         patch('rag_agent.tools.retriever.search_similar_chunks') as mock_search:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        mock_extract.return_value = {}
+        mock_search.return_value = [
+            {"doc_name": "lotr.txt", "chunk_text": text, "named_entities": {}, "distance": 0.1 * i}
+            for i, text in enumerate(["Chunk 0", "Chunk 1", "Chunk 0"])
+        ]
+        tuner = MagicMock()
+        tuner.settings.return_value = (7, 128)
+
+        tool = TextRetriever(max_results=2, tuner=tuner)
+        tool.forward(query="Frodo")
+
+        assert mock_search.call_args[1]["limit"] == 7
+        assert mock_search.call_args[1]["ef_search"] == 128
+        tuner.settings.assert_called_once_with(2)
+        sql_seconds, limit, candidates, survivors, max_results = tuner.observe.call_args.args
+        # The duplicate of the first chunk doesn't survive
+        assert (limit, candidates, survivors, max_results) == (7, 3, 2, 2)
@@ -74,3 +74,69 @@ def test_summarizer_response_processing(mock_model):
     
     # Check that whitespace was stripped
     assert result == "This is a summary with whitespace"
+
+
+def test_summarizer_aforward(mock_model, sample_text):
+    """Test that the async variant calls the model and returns the summary"""
+    import asyncio
+
+    tool = SummarizerTool(model=mock_model)
+    result = asyncio.run(tool.aforward(text=sample_text))
+
+    mock_model.assert_called_once()
+    assert result == "This is a mock summary response"
+
+
+def test_split_into_segments():
+    """Test that segments respect the budget and prefer paragraph boundaries"""
+    from rag_agent.tools.summarizer import split_into_segments
+
+    text = "\n\n".join(["word " * 30] * 10)
+
+    # 40 tokens is about 160 characters, one paragraph is 150
+    segments = split_into_segments(text, max_tokens=40)
+
+    assert len(segments) == 10
+    assert all(len(segment) <= 160 for segment in segments)
+    assert "".join(segments).replace(" ", "") == text.replace("\n", "").replace(" ", "")
+
+
+def test_split_into_segments_without_boundaries():
+    """Test that text without any boundary is split at the character budget"""
+    from rag_agent.tools.summarizer import split_into_segments
+
+    segments = split_into_segments("x" * 100, max_tokens=10)
+
+    assert segments == ["x" * 40, "x" * 40, "x" * 20]
+
+
+def test_summarizer_map_reduce(mock_model):
+    """Test that long inputs are summarized in segments and then combined"""
+    tool = SummarizerTool(model=mock_model, segment_tokens=45, max_concurrency=2)
+    text = "\n\n".join(["word " * 30] * 5)
+    query = "What is the word?"
+
+    result = tool.forward(text=text, query=query)
+
+    # Five segment summaries and one final combination
+    assert mock_model.call_count == 6
+    prompts = [call[1]["messages"][0]["content"][0]["text"] for call in mock_model.call_args_list]
+    assert sum(prompt.startswith("Summarize the following part") for prompt in prompts) == 5
+    assert prompts[-1].startswith("Combine the following partial summaries")
+
+    # The query guides every level
+    assert all(query in prompt for prompt in prompts)
+    assert result == "This is a mock summary response"
+
+
+def test_summarizer_map_reduce_stops_when_not_shrinking(mock_model):
+    """Test that reduction stops if the summaries are not shorter than the input"""
+    mock_response = MagicMock()
+    mock_response.content = "long " * 100
+    mock_model.return_value = mock_response
+
+    tool = SummarizerTool(model=mock_model, segment_tokens=40)
+    tool.forward(text="\n\n".join(["word " * 30] * 2))
+
+    # Two segments, then the final combination despite the summaries being too long
+    assert mock_model.call_count == 3
@@ -0,0 +1,76 @@
+"""
+Unit tests for the semantic answer cache.
+"""
+from unittest.mock import patch, MagicMock
+from rag_agent.tools.utils.answer_cache import SemanticAnswerCache
+
+
+def test_lookup_miss_then_store():
+    """Test that a miss returns the question embedding, which store reuses"""
+    with patch('rag_agent.tools.utils.answer_cache.encode') as mock_encode, \
+         patch('rag_agent.tools.utils.answer_cache.get_cursor') as mock_get_cursor, \
+         patch('rag_agent.tools.utils.answer_cache.corpus_generation', return_value=7), \
+         patch('rag_agent.tools.utils.answer_cache.AnswerCacheModel') as MockModel:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        MockModel.find_similar.return_value = None
+
+        cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+        answer, embedding, generation = cache.lookup("Who is Frodo?")
+
+        assert answer is None
+        assert generation == 7
+        MockModel.find_similar.assert_called_once_with(
+            mock_get_cursor.return_value, [0.1] * 384, 7, 0.9, 60, None
+        )
+
+        cache.store("Who is Frodo?", "A hobbit.", embedding, generation=generation)
+
+        # The question was only encoded once
+        mock_encode.assert_called_once_with(["Who is Frodo?"])
+        MockModel.insert_answer.assert_called_once_with(
+            mock_get_cursor.return_value, "Who is Frodo?", "A hobbit.", [0.1] * 384, 7, None
+        )
+        assert MockModel.evict.called
+        assert cache.stats() == {"hits": 0, "misses": 1, "hit_rate": 0.0}
+
+
+def test_lookup_hit():
+    """Test that a hit returns the cached answer and records it"""
+    with patch('rag_agent.tools.utils.answer_cache.encode') as mock_encode, \
+         patch('rag_agent.tools.utils.answer_cache.get_cursor'), \
+         patch('rag_agent.tools.utils.answer_cache.corpus_generation', return_value=7), \
+         patch('rag_agent.tools.utils.answer_cache.AnswerCacheModel') as MockModel:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        MockModel.find_similar.return_value = (3, "Who's Frodo?", "A hobbit.", 0.97)
+
+        cache = SemanticAnswerCache()
+        answer, _, _ = cache.lookup("Who is Frodo?")
+
+        assert answer == "A hobbit."
+        assert MockModel.record_hit.call_args[0][1] == 3
+        assert cache.stats()["hit_rate"] == 1.0
+
+
+def test_answer_produced_against_an_older_corpus_is_not_stored():
+    """Test that an answer isn't cached if documents were indexed while it was produced"""
+    with patch('rag_agent.tools.utils.answer_cache.encode') as mock_encode, \
+         patch('rag_agent.tools.utils.answer_cache.get_cursor'), \
+         patch('rag_agent.tools.utils.answer_cache.corpus_generation', side_effect=[7, 8]), \
+         patch('rag_agent.tools.utils.answer_cache.AnswerCacheModel') as MockModel:
+
+        mock_embedding = MagicMock()
+        mock_embedding.tolist.return_value = [0.1] * 384
+        mock_encode.return_value = [mock_embedding]
+        MockModel.find_similar.return_value = None
+
+        cache = SemanticAnswerCache()
+        _, embedding, generation = cache.lookup("Who is Frodo?")
+        cache.store("Who is Frodo?", "A hobbit.", embedding, generation=generation)
+
+        assert not MockModel.insert_answer.called
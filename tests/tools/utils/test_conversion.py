@@ -0,0 +1,112 @@
+"""
+Unit tests for the format-aware document conversion.
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from rag_agent.config import ConversionConfig
+from rag_agent.tools.utils.conversion import ProfiledConverter, conversion_profile, is_scanned_pdf
+
+
+def mock_pdf(page_texts):
+    """pypdfium2 PdfDocument whose pages have the given text layers"""
+    pdf = MagicMock()
+    pdf.__len__.return_value = len(page_texts)
+    pages = []
+    for text in page_texts:
+        page = MagicMock()
+        page.get_textpage.return_value.get_text_range.return_value = text
+        pages.append(page)
+    pdf.__getitem__.side_effect = lambda index: pages[index]
+    return pdf
+
+
+@pytest.mark.parametrize("path, profile", [
+    ("notes.md", "light"),
+    ("notes.txt", "light"),
+    ("page.HTML", "light"),
+    ("slides.pptx", "default"),
+    ("missing.pdf", "default"),
+])
+def test_conversion_profile_by_extension(path, profile):
+    """Test that text formats take the light profile"""
+    assert conversion_profile(path) == profile
+
+
+def test_conversion_profile_of_pdfs(tmp_path):
+    """Test that PDFs are told apart by their text layer"""
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.7")
+
+    with patch("rag_agent.tools.utils.conversion.is_scanned_pdf", return_value=False):
+        assert conversion_profile(str(path)) == "digital"
+    with patch("rag_agent.tools.utils.conversion.is_scanned_pdf", return_value=True):
+        assert conversion_profile(str(path)) == "scanned"
+
+
+def test_conversion_profile_without_fast_paths():
+    """Test that every document takes the default profile when fast paths are disabled"""
+    with patch.object(ConversionConfig, "FAST_PATHS", False):
+        assert conversion_profile("notes.md") == "default"
+
+
+def test_is_scanned_pdf():
+    """Test that a PDF is scanned when its first pages have (almost) no text"""
+    with patch("rag_agent.tools.utils.conversion.pdfium.PdfDocument") as MockPdf:
+        MockPdf.return_value = mock_pdf(["A page of text " * 10, "More text " * 10])
+        assert not is_scanned_pdf("report.pdf", sample_pages=3, min_chars=32)
+
+        MockPdf.return_value = mock_pdf(["", "  ", "7", "A last page with text " * 10])
+        assert is_scanned_pdf("scan.pdf", sample_pages=3, min_chars=32)
+
+        MockPdf.side_effect = Exception("Not a PDF")
+        assert is_scanned_pdf("broken.pdf")
+
+
+def test_profiled_converter_reuses_converters():
+    """Test that each profile's converter is built once and used for its documents"""
+    with patch("rag_agent.tools.utils.conversion.build_converter") as mock_build:
+        converters = {"digital": MagicMock(), "default": MagicMock()}
+        mock_build.side_effect = lambda profile: converters[profile]
+
+        converter = ProfiledConverter()
+        converter.convert("a.pdf", profile="digital")
+        converter.convert("b.pdf", profile="digital")
+        converter.convert("https://example.com/c.pdf")
+
+        assert [call.args[0] for call in mock_build.call_args_list] == ["digital", "default"]
+        assert converters["digital"].convert.call_count == 2
+        converters["default"].convert.assert_called_once_with("https://example.com/c.pdf")
+
+
+def test_profiled_converter_reads_text_as_markdown(tmp_path):
+    """Test that plain text is handed to the Markdown backend"""
+    path = tmp_path / "notes.txt"
+    path.write_text("Plain text notes")
+
+    with patch("rag_agent.tools.utils.conversion.build_converter") as mock_build, \
+         patch("rag_agent.tools.utils.conversion.DocumentStream") as MockStream:
+        ProfiledConverter().convert(str(path))
+
+        mock_build.assert_called_once_with("light")
+        assert MockStream.call_args.kwargs["name"] == "notes.md"
+        assert MockStream.call_args.kwargs["stream"].read() == b"Plain text notes"
+        mock_build.return_value.convert.assert_called_once_with(MockStream.return_value)
+
+
+def test_is_scanned_pdf_holds_the_pdfium_lock():
+    """Test that pdfium is only called holding the lock docling's backend takes"""
+    lock = MagicMock()
+    held = []
+
+    def read(path):
+        held.append(lock.__enter__.called and not lock.__exit__.called)
+        return mock_pdf(["A page of text " * 10])
+
+    with patch("rag_agent.tools.utils.conversion.pypdfium2_lock", lock), \
+         patch("rag_agent.tools.utils.conversion.pdfium.PdfDocument", side_effect=read):
+        is_scanned_pdf("report.pdf")
+
+    assert held == [True]
+    lock.__exit__.assert_called_once()
@@ -0,0 +1,156 @@
+"""
+Unit tests for the conversion process pool, with a stand-in converter in the workers.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from rag_agent.tools.utils.conversion_pool import ConversionError, ConversionPool, ConversionTimeout
+
+
+class FakeConverter:
+    """Stands in for ProfiledConverter in the worker processes"""
+
+    def __init__(self):
+        self.warmed = []
+
+    def warm(self, profiles):
+        self.warmed = list(profiles)
+
+    def convert(self, source, profile=None):
+        if source.startswith("sleep:"):
+            time.sleep(float(source[len("sleep:"):]))
+        if source == "fail":
+            raise ValueError("Unsupported document")
+        if source == "crash":
+            os._exit(1)
+        document = {"name": source, "pid": os.getpid(), "profile": profile, "warmed": self.warmed}
+        return SimpleNamespace(document=SimpleNamespace(export_to_dict=lambda: document))
+
+
+# Application module in the shape of rag_agent/main.py: it claims a resource only one
+# process may hold (the DuckDB file, the health port) and starts a pool. The workers
+# import it as __mp_main__, its side effects run in main() only.
+APP_MODULE = textwrap.dedent("""
+    import json
+    import os
+    import sys
+    from types import SimpleNamespace
+    from unittest.mock import patch
+
+    from rag_agent.tools.utils.conversion_pool import ConversionPool
+
+
+    class EchoConverter:
+        def warm(self, profiles):
+            pass
+
+        def convert(self, source, profile=None):
+            document = {"name": source, "pid": os.getpid()}
+            return SimpleNamespace(document=SimpleNamespace(export_to_dict=lambda: document))
+
+
+    def main(lock_path):
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+        pool = ConversionPool(workers=2, warm_profiles=[], converter_factory=EchoConverter)
+        with patch("rag_agent.tools.utils.conversion_pool.DoclingDocument") as MockDocument:
+            MockDocument.model_validate.side_effect = lambda data: data
+            pool.start(timeout=60)
+            print(json.dumps(pool.convert("notes.md", "light").document))
+        pool.close()
+
+
+    if __name__ == "__main__":
+        main(sys.argv[1])
+""")
+
+
+@pytest.fixture
+def make_pool():
+    """Creates pools of FakeConverter workers, documents come back as dictionaries"""
+    pools = []
+
+    def make(**kwargs):
+        pool = ConversionPool(converter_factory=FakeConverter, **kwargs)
+        pools.append(pool)
+        return pool
+
+    with patch("rag_agent.tools.utils.conversion_pool.DoclingDocument") as MockDocument:
+        MockDocument.model_validate.side_effect = lambda data: data
+        yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_documents_are_converted_in_warm_workers(make_pool):
+    """Test that workers load their converter once and return the serialized documents"""
+    pool = make_pool(workers=2, warm_profiles=["light"])
+    pool.start()
+
+    first = pool.convert("notes.md", "light")
+    second = pool.convert("other.md", "light")
+
+    assert first.document["name"] == "notes.md"
+    assert first.profile == "light"
+    assert first.document["warmed"] == ["light"]
+    assert first.document["pid"] != os.getpid()
+    assert second.document["name"] == "other.md"
+
+
+def test_workers_are_recycled(make_pool):
+    """Test that a worker is replaced after the configured number of documents"""
+    pool = make_pool(workers=1, max_tasks_per_worker=2, warm_profiles=[])
+
+    pids = [pool.convert(f"doc-{i}.md", "light").document["pid"] for i in range(3)]
+
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[0]
+
+
+def test_timeout_kills_the_worker(make_pool):
+    """Test that a conversion over the timeout raises and the worker is replaced"""
+    pool = make_pool(workers=1, task_timeout=0.5, warm_profiles=[])
+    before = pool.convert("notes.md", "light").document["pid"]
+
+    with pytest.raises(ConversionTimeout):
+        pool.convert("sleep:30", "light")
+
+    assert pool.convert("notes.md", "light").document["pid"] != before
+
+
+def test_failures(make_pool):
+    """Test that a failed conversion keeps the worker, a crashed worker is replaced"""
+    pool = make_pool(workers=1, warm_profiles=[])
+    before = pool.convert("notes.md", "light").document["pid"]
+
+    with pytest.raises(ConversionError, match="Unsupported document"):
+        pool.convert("fail", "light")
+    assert pool.convert("notes.md", "light").document["pid"] == before
+
+    with pytest.raises(ConversionError):
+        pool.convert("crash", "light")
+    assert pool.convert("notes.md", "light").document["pid"] != before
+
+
+def test_pool_started_from_an_application_module(tmp_path):
+    """Test that workers spawned from a main module don't rerun its side effects"""
+    app = tmp_path / "app.py"
+    app.write_text(APP_MODULE)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+
+    result = subprocess.run(
+        [sys.executable, str(app), str(tmp_path / "app.lock")],
+        capture_output=True, text=True, timeout=120, env=env,
+    )
+
+    assert result.returncode == 0, result.stderr
+    document = json.loads(result.stdout.strip().splitlines()[-1])
+    assert document["name"] == "notes.md"
@@ -4,7 +4,7 @@ Unit tests for the embeddings utility.
 import pytest
 import numpy as np
 from unittest.mock import patch
-from rag_agent.tools.utils.embeddings import encode
+from rag_agent.tools.utils.embeddings import encode, encode_chunk, token_windows
 
 
 @patch('rag_agent.tools.utils.embeddings.emb_model')
@@ -65,3 +65,41 @@ def test_encode_different_text_lengths(mock_emb_model, input_text):
     
     # All embeddings should have the same size regardless of input length
     assert result[0].shape == (384,)
+
+
+def test_token_windows_keeps_text_that_fits():
+    """Test that a text within the token budget is a single piece"""
+    pieces = token_windows("one two", [1, 2], [(0, 3), (4, 7)], max_tokens=2)
+
+    assert pieces == [("one two", [1, 2])]
+
+
+def test_token_windows_splits_at_token_boundaries():
+    """Test that a text over the token budget is split instead of truncated"""
+    text = "one two three four five"
+    token_ids = [1, 2, 3, 4, 5]
+    offsets = [(0, 3), (4, 7), (8, 13), (14, 18), (19, 23)]
+
+    pieces = token_windows(text, token_ids, offsets, max_tokens=2)
+
+    assert pieces == [("one two ", [1, 2]), ("three four ", [3, 4]), ("five", [5])]
+    assert "".join(piece for piece, _ in pieces) == text
+
+
+@patch('rag_agent.tools.utils.embeddings.encode_token_ids')
+@patch('rag_agent.tools.utils.embeddings.emb_model')
+def test_encode_chunk_tokenizes_once(mock_emb_model, mock_encode_token_ids):
+    """Test that the token ids of the chunk are embedded without tokenizing it again"""
+    mock_emb_model.tokenizer.return_value = {"input_ids": [7, 8], "offset_mapping": [(0, 5), (6, 11)]}
+    mock_encode_token_ids.return_value = np.ones((1, 384))
+
+    result = encode_chunk("hello world")
+
+    mock_emb_model.tokenizer.assert_called_once_with(
+        "hello world", add_special_tokens=False, return_offsets_mapping=True
+    )
+    mock_encode_token_ids.assert_called_once_with([[7, 8]])
+    mock_emb_model.encode.assert_not_called()
+    assert len(result) == 1
+    assert result[0][0] == "hello world"
+    assert result[0][1].shape == (384,)
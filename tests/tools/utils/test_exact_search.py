@@ -0,0 +1,152 @@
+"""
+Unit tests for the memory-mapped exact search index.
+"""
+import duckdb
+import numpy as np
+import pytest
+
+from rag_agent.db.models import DocumentModel
+from rag_agent.tools.utils.exact_search import ExactIndex, use_exact
+
+
+def create_table(conn):
+    conn.execute("""
+    CREATE TABLE document_chunks (
+        doc_name TEXT NOT NULL,
+        chunk_text TEXT NOT NULL,
+        named_entities JSON,
+        embedding FLOAT[384] NOT NULL,
+        chunk_index INTEGER
+    )
+    """)
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(":memory:")
+    create_table(conn)
+    yield conn
+    conn.close()
+
+
+def insert(conn, vectors, start=0):
+    DocumentModel.insert_document_chunks_batch(conn, [
+        (f"doc-{(start + i) % 3}.pdf", f"Chunk {start + i}", "{}", vector.tolist(), start + i)
+        for i, vector in enumerate(vectors)
+    ])
+
+
+def duckdb_top_k(conn, query, k, distance="array_cosine_distance"):
+    return conn.execute(f"""
+    SELECT rowid, {distance}(embedding, ?::FLOAT[384]) AS distance
+    FROM document_chunks ORDER BY distance LIMIT ?
+    """, (query.tolist(), k)).fetchall()
+
+
+@pytest.mark.parametrize("metric, distance", [
+    ("cosine", "array_cosine_distance"),
+    ("l2sq", "array_distance"),
+    ("ip", "array_negative_inner_product"),
+])
+def test_search_matches_duckdb(conn, tmp_path, metric, distance):
+    """Test that the blocked brute-force top-k equals the exact SQL ranking for every metric"""
+    rng = np.random.default_rng(0)
+    insert(conn, rng.standard_normal((50, 384)))
+    index = ExactIndex(DocumentModel, str(tmp_path), metric=metric)
+    index.sync(conn)
+    query = rng.standard_normal(384)
+
+    rowids, distances = index.search(query, 5, block_rows=7)
+
+    expected = duckdb_top_k(conn, query, 5, distance)
+    assert rowids.tolist() == [row[0] for row in expected]
+    assert distances == pytest.approx([row[1] for row in expected], rel=1e-4, abs=1e-4)
+
+
+def test_sync_appends_and_rebuilds_after_deletes(conn, tmp_path):
+    """Test that inserts are appended to the mapped files and deletes trigger a rebuild"""
+    rng = np.random.default_rng(1)
+    insert(conn, rng.random((10, 384)))
+    index = ExactIndex(DocumentModel, str(tmp_path))
+    assert index.sync(conn)["build"] == 0
+
+    insert(conn, rng.random((5, 384)), start=10)
+    meta = index.sync(conn)
+    assert (meta["build"], meta["rows"]) == (0, 15)
+
+    conn.execute("DELETE FROM document_chunks WHERE doc_name = 'doc-0.pdf'")
+    meta = index.sync(conn)
+    assert (meta["build"], meta["rows"]) == (1, 10)
+    assert not (tmp_path / "document_chunks-0.f32").exists()
+
+    # Another process maps the same files
+    other = ExactIndex(DocumentModel, str(tmp_path))
+    assert other.load()["rows"] == 10
+    assert other.matches(DocumentModel.table_state(conn))
+    query = rng.random(384)
+    assert other.search(query, 3)[0].tolist() == [row[0] for row in duckdb_top_k(conn, query, 3)]
+
+
+def test_sync_rebuilds_a_recreated_table(conn, tmp_path):
+    """Test that a recreated table, whose rowids restarted, isn't mistaken for the synced one"""
+    rng = np.random.default_rng(3)
+    insert(conn, rng.random((8, 384)))
+    index = ExactIndex(DocumentModel, str(tmp_path))
+    index.sync(conn)
+
+    conn.execute("DROP TABLE document_chunks")
+    create_table(conn)
+    insert(conn, rng.random((8, 384)))
+    assert index.matches(DocumentModel.table_state(conn))
+
+    meta = index.sync(conn)
+    assert (meta["build"], meta["rows"]) == (1, 8)
+    query = rng.random(384)
+    assert index.search(query, 3)[0].tolist() == [row[0] for row in duckdb_top_k(conn, query, 3)]
+
+
+def test_search_keeps_the_build_it_started_on(conn, tmp_path):
+    """Test that a search ranks one consistent build while the files are remapped under it"""
+    rng = np.random.default_rng(4)
+    insert(conn, rng.random((15, 384)))
+    index = ExactIndex(DocumentModel, str(tmp_path))
+    index.sync(conn)
+    query = rng.random(384)
+    expected = [row[0] for row in duckdb_top_k(conn, query, 3)]
+
+    distances = index._distances
+    remapped = []
+
+    def remap_then_score(block, query):
+        if not remapped:
+            conn.execute("DELETE FROM document_chunks WHERE doc_name = 'doc-0.pdf'")
+            remapped.append(index.sync(conn))
+        return distances(block, query)
+
+    index._distances = remap_then_score
+    rowids, _ = index.search(query, 3, block_rows=4)
+    assert remapped[0]["build"] == 1 and index.rows == 10
+    assert rowids.tolist() == expected
+
+
+def test_search_restricted_to_rowids(conn, tmp_path):
+    """Test that a doc-scoped search only ranks the given rows"""
+    rng = np.random.default_rng(2)
+    insert(conn, rng.random((30, 384)))
+    index = ExactIndex(DocumentModel, str(tmp_path))
+    index.sync(conn)
+    doc_rowids = DocumentModel.document_rowids(conn, "doc-1.pdf")
+
+    rowids, distances = index.search(rng.random(384), 4, rowids=doc_rowids, block_rows=4)
+
+    assert len(rowids) == 4
+    assert set(rowids.tolist()) <= set(doc_rowids.tolist())
+    assert list(distances) == sorted(distances)
+
+
+def test_use_exact():
+    """Test that the engine is chosen by table size unless forced"""
+    assert use_exact(100, engine="auto", max_rows=1000)
+    assert not use_exact(5000, engine="auto", max_rows=1000)
+    assert use_exact(5000, engine="exact", max_rows=1000)
+    assert not use_exact(100, engine="hnsw", max_rows=1000)
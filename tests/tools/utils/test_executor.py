@@ -0,0 +1,41 @@
+"""
+Unit tests for the bounded executors used by the async API.
+"""
+import asyncio
+import threading
+from rag_agent.tools.utils.executor import run_cpu_bound, run_blocking_io
+
+
+def test_run_cpu_bound_returns_result():
+    """Test that the function runs off the event loop thread and its result is returned"""
+    caller = threading.get_ident()
+
+    def work(a, b=0):
+        return a + b, threading.get_ident()
+
+    result, worker = asyncio.run(run_cpu_bound(work, 1, b=2))
+
+    assert result == 3
+    assert worker != caller
+
+
+def test_run_blocking_io_propagates_exceptions():
+    """Test that exceptions raised in the executor reach the awaiting coroutine"""
+    def fail():
+        raise ValueError("Boom")
+
+    async def main():
+        try:
+            await run_blocking_io(fail)
+        except ValueError as e:
+            return str(e)
+
+    assert asyncio.run(main()) == "Boom"
+
+
+def test_concurrent_calls_are_gathered():
+    """Test that several calls can be awaited concurrently"""
+    async def main():
+        return await asyncio.gather(*[run_cpu_bound(lambda x=x: x * 2) for x in range(5)])
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
@@ -0,0 +1,134 @@
+"""
+Unit tests for the URL document fetcher, against a local HTTP server.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rag_agent.tools.utils.fetcher import DocumentFetcher, FetchError
+
+
+class DocumentServer:
+    """Serves /doc-<n>.pdf with an ETag, like a static file server"""
+
+    def __init__(self, delay=0.0):
+        self.version = "v1"
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((self.path, dict(self.headers)))
+                    server.connections.add(self.client_address)
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    time.sleep(server.delay)
+                    if self.path == "/moved":
+                        self.send_response(301)
+                        self.send_header("Location", "/doc-0.pdf")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    if not self.path.startswith("/doc-"):
+                        self.send_error(404)
+                        return
+                    etag = f'"{server.version}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    body = f"%PDF {self.path} {server.version}".encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", "Mon, 19 Oct 2026 08:00:00 GMT")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def server():
+    server = DocumentServer()
+    yield server
+    server.httpd.shutdown()
+
+
+def test_conditional_get_and_connection_reuse(server, tmp_path):
+    """Test that a re-fetch is a conditional request answered 304, on the same connection"""
+    fetcher = DocumentFetcher(cache_dir=str(tmp_path))
+    url = f"{server.url}/doc-0.pdf"
+
+    first = fetcher.fetch(url)
+    assert first.changed and first.status == 200
+    assert first.path.endswith(".pdf")
+    with open(first.path, "rb") as f:
+        assert f.read() == b"%PDF /doc-0.pdf v1"
+
+    fetcher.mark_indexed(url, "team_a")
+    second = fetcher.fetch(url)
+    assert not second.changed and second.status == 304
+    assert second.path == first.path
+    assert second.indexed_collections == ["team_a"]
+    assert server.requests[1][1]["If-None-Match"] == '"v1"'
+    assert server.requests[1][1]["If-Modified-Since"] == "Mon, 19 Oct 2026 08:00:00 GMT"
+    assert len(server.connections) == 1
+
+    # A new version is downloaded again and is no longer marked as indexed
+    server.version = "v2"
+    third = fetcher.fetch(url)
+    assert third.changed and third.indexed_collections == []
+    with open(third.path, "rb") as f:
+        assert f.read() == b"%PDF /doc-0.pdf v2"
+    fetcher.close()
+
+
+def test_redirects_and_errors(server, tmp_path):
+    """Test that redirects are followed and error statuses raise"""
+    fetcher = DocumentFetcher(cache_dir=str(tmp_path))
+
+    assert fetcher.fetch(f"{server.url}/moved").changed
+    with pytest.raises(FetchError):
+        fetcher.fetch(f"{server.url}/missing.pdf")
+    fetcher.close()
+
+
+def test_fetch_many_respects_per_host_limit(tmp_path):
+    """Test that URLs are downloaded concurrently, never more than the limit per host"""
+    server = DocumentServer(delay=0.1)
+    try:
+        fetcher = DocumentFetcher(cache_dir=str(tmp_path), max_connections_per_host=2)
+        urls = [f"{server.url}/doc-{i}.pdf" for i in range(6)] + [f"{server.url}/missing.pdf"]
+
+        results = fetcher.fetch_many(urls)
+
+        assert all(results[url].changed for url in urls[:6])
+        assert isinstance(results[urls[6]], FetchError)
+        assert server.max_active == 2
+        # Connections are reused, except the one the 404 response closed
+        assert len(server.connections) <= 3
+        fetcher.close()
+    finally:
+        server.httpd.shutdown()
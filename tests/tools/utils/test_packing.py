@@ -0,0 +1,97 @@
+"""
+Unit tests for packing retrieved chunks into a token budget.
+"""
+from rag_agent.tools.utils.packing import pack_results, merge_texts, trim_text
+from rag_agent.tools.utils.tokens import estimate_tokens
+
+
+def make_result(text, doc_name="doc.pdf", chunk_index=None):
+    return {"doc_name": doc_name, "chunk_text": text, "named_entities": {}, "distance": 0.1, "chunk_index": chunk_index}
+
+
+def test_pack_results_drops_duplicates():
+    """Test that exact and near-duplicates are dropped, keeping the best ranked copy"""
+    text = "Frodo carried the ring from the Shire all the way to Mount Doom in Mordor"
+    results = [
+        make_result(text, "a.pdf"),
+        make_result("  " + text + " ", "b.pdf"),
+        make_result(text + " again", "c.pdf"),
+        make_result("Sam cooked potatoes in Ithilien", "d.pdf"),
+    ]
+
+    packed, saved = pack_results(results, token_budget=1000, max_results=4)
+
+    assert [result["doc_name"] for result in packed] == ["a.pdf", "d.pdf"]
+    assert saved > 0
+
+
+def test_pack_results_backfills_after_duplicates():
+    """Test that dropped duplicates leave room for lower-ranked results"""
+    results = [
+        make_result("Same text", "a.pdf"),
+        make_result("Same text", "b.pdf"),
+        make_result("Other text", "c.pdf"),
+    ]
+
+    packed, _ = pack_results(results, token_budget=1000, max_results=2)
+
+    assert [result["doc_name"] for result in packed] == ["a.pdf", "c.pdf"]
+
+
+def test_pack_results_counts_distinct_results():
+    """Test that every distinct result is counted, also those past max_results"""
+    results = [
+        make_result("Same text", "a.pdf"),
+        make_result("Same text", "b.pdf"),
+        make_result("Other text", "c.pdf"),
+        make_result("Third text", "d.pdf"),
+    ]
+    diagnostics = {}
+
+    packed, _ = pack_results(results, token_budget=1000, max_results=1, diagnostics=diagnostics)
+
+    assert [result["doc_name"] for result in packed] == ["a.pdf"]
+    assert diagnostics["distinct"] == 3
+
+
+def test_pack_results_merges_adjacent_chunks():
+    """Test that adjacent chunks of a document are merged in document order"""
+    results = [
+        make_result("Chapter 1\nSecond part of the chapter", chunk_index=4),
+        make_result("Unrelated text", "other.pdf", chunk_index=4),
+        make_result("Chapter 1\nFirst part of the chapter", chunk_index=3),
+    ]
+
+    packed, _ = pack_results(results, token_budget=1000, max_results=3)
+
+    assert len(packed) == 2
+    assert packed[0]["chunk_text"] == "Chapter 1\nFirst part of the chapter\nSecond part of the chapter"
+    assert packed[0]["chunk_index"] == 3
+    assert packed[1]["doc_name"] == "other.pdf"
+
+
+def test_pack_results_fits_budget():
+    """Test that the lowest-ranked content is trimmed to the budget"""
+    results = [make_result(f"Chunk {i} " + "word " * 100, f"{i}.pdf") for i in range(3)]
+    budget = estimate_tokens(results[0]["chunk_text"]) + 60
+
+    packed, saved = pack_results(results, token_budget=budget, max_results=3, min_trimmed_tokens=50)
+
+    assert len(packed) == 2
+    assert packed[1]["chunk_text"].endswith(" [...]")
+    assert sum(estimate_tokens(result["chunk_text"]) for result in packed) <= budget
+    assert saved > 0
+
+
+def test_merge_texts_drops_shared_headings():
+    """Test that heading lines repeated by contextualized chunks appear once"""
+    assert merge_texts("Title\nSection\nA", "Title\nSection\nB") == "Title\nSection\nA\nB"
+    assert merge_texts("A", "B") == "A\nB"
+
+
+def test_trim_text():
+    """Test that trimming cuts at a word boundary"""
+    trimmed = trim_text("word " * 100, max_tokens=10)
+
+    assert trimmed.endswith("word [...]")
+    assert estimate_tokens(trimmed) <= 10
@@ -0,0 +1,63 @@
+"""
+Tests for the ef_search and over-fetch auto-tuner.
+"""
+from rag_agent.tools.utils.search_tuner import SearchTuner
+
+
+def test_settings_never_explore_fewer_candidates_than_fetched():
+    """Test that ef_search is at least the query limit"""
+    tuner = SearchTuner(ef_search=16, overfetch=4.0)
+
+    assert tuner.settings(5) == (20, 20)
+    assert tuner.settings(2) == (8, 16)
+
+
+def test_slow_searches_lower_ef_search():
+    """Test that ef_search shrinks while p95 latency is above the target"""
+    tuner = SearchTuner(target_p95_ms=10, ef_search=128, adjust_every=10)
+
+    for _ in range(10):
+        tuner.observe(0.05, limit=10, candidates=10, survivors=10, max_results=5)
+
+    assert tuner.ef_search == 96
+
+
+def test_fast_searches_raise_ef_search():
+    """Test that latency headroom is spent on a wider search"""
+    tuner = SearchTuner(target_p95_ms=100, ef_search=64, adjust_every=10)
+
+    for _ in range(10):
+        tuner.observe(0.001, limit=10, candidates=10, survivors=10, max_results=5)
+
+    assert tuner.ef_search > 64
+
+
+def test_starved_searches_raise_overfetch():
+    """Test that the over-fetch factor grows when too few candidates survive filtering"""
+    tuner = SearchTuner(target_p95_ms=100, overfetch=2.0, adjust_every=10)
+
+    for _ in range(10):
+        tuner.observe(0.01, limit=10, candidates=10, survivors=3, max_results=5)
+
+    assert tuner.overfetch == 2.5
+
+
+def test_exhausted_corpus_is_not_starvation():
+    """Test that fewer rows than the limit (small corpus) doesn't raise the over-fetch factor"""
+    tuner = SearchTuner(target_p95_ms=100, overfetch=2.0, adjust_every=10)
+
+    for _ in range(10):
+        tuner.observe(0.01, limit=10, candidates=3, survivors=3, max_results=5)
+
+    assert tuner.overfetch == 2.0
+
+
+def test_surplus_lowers_overfetch():
+    """Test that the over-fetch factor shrinks when candidates are always left over"""
+    tuner = SearchTuner(target_p95_ms=100, overfetch=3.0, adjust_every=10)
+
+    for _ in range(10):
+        tuner.observe(0.01, limit=15, candidates=15, survivors=15, max_results=5)
+
+    assert tuner.overfetch < 3.0
+    assert tuner.stats()["observed"] == 10
@@ -0,0 +1,232 @@
+"""
+Unit tests for sharded storage and search in semantic_search.
+"""
+from unittest.mock import patch
+
+import duckdb
+import numpy as np
+import pytest
+
+from rag_agent.db.shards import shard_for, shard_models
+from rag_agent.tools.utils import semantic_search
+
+
+@pytest.fixture
+def sharded_db(tmp_path):
+    """In-memory database with three shards, every thread getting its own cursor"""
+    conn = duckdb.connect(":memory:")
+    with patch.object(semantic_search.ShardConfig, "NUM_SHARDS", 3), \
+         patch.object(semantic_search.ExactSearchConfig, "DIR", str(tmp_path)), \
+         patch("rag_agent.db.shards.ShardConfig.NUM_SHARDS", 3), \
+         patch("rag_agent.tools.utils.semantic_search.get_cursor", side_effect=conn.cursor):
+        from rag_agent.db.models import CorpusStateModel, IndexCheckpointModel
+
+        for model in shard_models(num_shards=3):
+            model.create_table_if_not_exists(conn)
+        CorpusStateModel.create_table_if_not_exists(conn)
+        IndexCheckpointModel.create_table_if_not_exists(conn)
+        yield conn
+    conn.close()
+
+
+def test_bulk_insert_routes_by_document(sharded_db):
+    """Test that chunks are stored in the shard of their document"""
+    rng = np.random.default_rng(0)
+    chunks = [
+        {"doc_name": f"doc-{i % 6}.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": rng.random(384).tolist(), "chunk_index": i}
+        for i in range(12)
+    ]
+
+    assert semantic_search.bulk_insert_chunks(chunks) == 12
+
+    for number, model in enumerate(shard_models(num_shards=3)):
+        doc_names = {row[0] for row in sharded_db.execute(f"SELECT doc_name FROM {model.table_name}").fetchall()}
+        assert all(shard_for(doc_name, 3) == number for doc_name in doc_names)
+
+
+def test_search_merges_shards_into_global_top_k(sharded_db):
+    """Test that the fan-out search returns the same top-k as an exhaustive ranking"""
+    rng = np.random.default_rng(1)
+    vectors = rng.random((24, 384))
+    chunks = [
+        {"doc_name": f"doc-{i % 12}.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": vectors[i].tolist(), "chunk_index": i}
+        for i in range(24)
+    ]
+    semantic_search.bulk_insert_chunks(chunks)
+    query = rng.random(384)
+
+    results = semantic_search.search_similar_chunks(query.tolist(), limit=7)
+
+    similarity = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = [f"Chunk {i}" for i in np.argsort(-similarity)[:7]]
+    assert [result["chunk_text"] for result in results] == expected
+    distances = [result["distance"] for result in results]
+    assert distances == sorted(distances)
+
+
+def test_doc_scoped_search_uses_one_shard(sharded_db):
+    """Test that a doc-scoped search only queries the shard of the document"""
+    rng = np.random.default_rng(2)
+    semantic_search.bulk_insert_chunks([
+        {"doc_name": "report.pdf", "chunk_text": "Report", "named_entities": {},
+         "embedding": rng.random(384).tolist(), "chunk_index": 0},
+    ])
+
+    with patch.object(semantic_search, "shard_executor") as mock_executor:
+        results = semantic_search.search_similar_chunks(rng.random(384).tolist(), limit=3, doc_scope="report.pdf")
+
+    mock_executor.submit.assert_not_called()
+    assert [result["chunk_text"] for result in results] == ["Report"]
+
+
+def test_doc_scope_is_bound_as_a_parameter(sharded_db):
+    """Test that a document name from the agent is matched literally, not spliced into the SQL"""
+    rng = np.random.default_rng(5)
+    semantic_search.bulk_insert_chunks([
+        {"doc_name": "O'Brien notes.pdf", "chunk_text": "Notes", "named_entities": {},
+         "embedding": rng.random(384).tolist(), "chunk_index": 0},
+        {"doc_name": "report.pdf", "chunk_text": "Report", "named_entities": {},
+         "embedding": rng.random(384).tolist(), "chunk_index": 0},
+    ])
+    query = rng.random(384).tolist()
+
+    with patch.object(semantic_search.ExactSearchConfig, "ENGINE", "hnsw"):
+        quoted = semantic_search.search_similar_chunks(query, limit=3, doc_scope="O'Brien notes.pdf")
+        injected = semantic_search.search_similar_chunks(query, limit=3, doc_scope="x' OR '1'='1")
+
+    assert [result["chunk_text"] for result in quoted] == ["Notes"]
+    assert injected == []
+
+
+def test_collections_are_isolated(sharded_db):
+    """Test that a collection gets its own tables and searches never cross collections"""
+    rng = np.random.default_rng(3)
+    vector = rng.random(384).tolist()
+    with patch.object(semantic_search, "_created_collections", set()):
+        semantic_search.bulk_insert_chunks([
+            {"doc_name": "a.pdf", "chunk_text": "Team A", "named_entities": {},
+             "embedding": vector, "chunk_index": 0},
+        ], collection="team_a")
+        semantic_search.bulk_insert_chunks([
+            {"doc_name": "b.pdf", "chunk_text": "Default", "named_entities": {},
+             "embedding": vector, "chunk_index": 0},
+        ])
+
+        in_collection = semantic_search.search_similar_chunks(vector, limit=5, collection="team_a")
+        in_default = semantic_search.search_similar_chunks(vector, limit=5)
+
+    assert [result["chunk_text"] for result in in_collection] == ["Team A"]
+    assert [result["chunk_text"] for result in in_default] == ["Default"]
+    tables = {row[0] for row in sharded_db.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    assert {"document_chunks__team_a", "document_chunks__team_a_shard1"} <= tables
+    assert "document_summaries__team_a" in tables
+
+
+def test_small_shards_are_searched_exactly(sharded_db):
+    """Test that small shards use the memory-mapped exact index, kept in sync with inserts"""
+    rng = np.random.default_rng(4)
+    vectors = rng.random((6, 384))
+    chunks = [
+        {"doc_name": f"doc-{i}.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": vectors[i].tolist(), "chunk_index": i}
+        for i in range(6)
+    ]
+    # As at startup, the files of the empty shards too
+    semantic_search.sync_exact_indexes()
+    semantic_search.bulk_insert_chunks(chunks[:3])
+
+    with patch.object(semantic_search.DocumentModel, "search_similar") as mock_hnsw:
+        first = semantic_search.search_similar_chunks(vectors[4].tolist(), limit=2)
+        # Inserted after the exact index was built
+        semantic_search.bulk_insert_chunks(chunks[3:])
+        second = semantic_search.search_similar_chunks(vectors[4].tolist(), limit=2)
+
+    mock_hnsw.assert_not_called()
+    assert "Chunk 4" not in [result["chunk_text"] for result in first]
+    assert second[0]["chunk_text"] == "Chunk 4"
+    assert second[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_searches_fall_back_to_hnsw_on_stale_exact_files(sharded_db):
+    """Test that a search never syncs the exact files, it uses the HNSW index until a write does"""
+    rng = np.random.default_rng(6)
+    vectors = rng.random((3, 384))
+    chunks = [
+        {"doc_name": "doc.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": vectors[i].tolist(), "chunk_index": i}
+        for i in range(3)
+    ]
+    semantic_search.bulk_insert_chunks(chunks[:2])
+    # Written without going through bulk_insert_chunks
+    shard = semantic_search.DocumentModel.shard(shard_for("doc.pdf"))
+    shard.insert_document_chunks_batch(sharded_db, [("doc.pdf", "Chunk 2", "{}", vectors[2].tolist(), 2)])
+
+    with patch.object(semantic_search.DocumentModel, "search_similar", return_value=[]) as mock_hnsw, \
+         patch("rag_agent.tools.utils.exact_search.ExactIndex.sync") as mock_sync:
+        semantic_search.search_similar_chunks(vectors[2].tolist(), limit=1)
+
+    assert mock_hnsw.called
+    assert not mock_sync.called
+
+    semantic_search.sync_exact_indexes()
+    with patch.object(semantic_search.DocumentModel, "search_similar") as mock_hnsw:
+        results = semantic_search.search_similar_chunks(vectors[2].tolist(), limit=1)
+    assert not mock_hnsw.called
+    assert results[0]["chunk_text"] == "Chunk 2"
+
+
+def test_summaries_keep_exact_files_valid_for_readers(sharded_db):
+    """Test that publishing summaries, which bumps the generation, doesn't send readers back to HNSW"""
+    from rag_agent.db.models import DocumentSummaryModel
+
+    DocumentSummaryModel.create_table_if_not_exists(sharded_db)
+    rng = np.random.default_rng(5)
+    vectors = rng.random((3, 384))
+    semantic_search.sync_exact_indexes()
+    semantic_search.bulk_insert_chunks([
+        {"doc_name": "doc.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": vectors[i].tolist(), "chunk_index": i}
+        for i in range(3)
+    ])
+    semantic_search.replace_document_summaries("doc.pdf", [
+        {"level": "document", "section": None, "summary_text": "Summary", "embedding": vectors[0].tolist()},
+    ])
+
+    with patch.object(semantic_search.DeploymentConfig, "ROLE", "reader"), \
+         patch.object(semantic_search.DocumentModel, "search_similar") as mock_hnsw:
+        results = semantic_search.search_similar_chunks(vectors[1].tolist(), limit=1)
+
+    mock_hnsw.assert_not_called()
+    assert results[0]["chunk_text"] == "Chunk 1"
+
+
+def test_checkpoint_commits_with_its_chunks(sharded_db):
+    """Test that a checkpoint is saved with its chunks, and neither is if the insert fails"""
+    rng = np.random.default_rng(4)
+    chunks = [
+        {"doc_name": "report.pdf", "chunk_text": f"Chunk {i}", "named_entities": {},
+         "embedding": rng.random(384).tolist(), "chunk_index": i}
+        for i in range(3)
+    ]
+    progress = {"version": "100:1", "chunks_done": 3, "last_chunk_index": 2}
+
+    semantic_search.bulk_insert_chunks(chunks, checkpoint={"doc_name": "report.pdf", **progress, "completed": False})
+    assert semantic_search.get_index_checkpoint("report.pdf") == {**progress, "completed": False}
+    assert semantic_search.get_index_checkpoint("report.pdf", collection="team_a") is None
+
+    broken = [{**chunks[0], "chunk_index": 3, "embedding": [0.1, 0.2]}]
+    with pytest.raises(Exception):
+        semantic_search.bulk_insert_chunks(
+            broken,
+            checkpoint={"doc_name": "report.pdf", "version": "100:1", "chunks_done": 4, "last_chunk_index": 3,
+                        "completed": True},
+        )
+    assert semantic_search.get_index_checkpoint("report.pdf")["chunks_done"] == 3
+    model = semantic_search.DocumentModel.shard(shard_for("report.pdf"))
+    assert model.count_rows(sharded_db) == 3
+
+    assert semantic_search.discard_document_chunks("report.pdf") == 3
+    assert model.count_rows(sharded_db) == 0
+    assert semantic_search.get_index_checkpoint("report.pdf") is None
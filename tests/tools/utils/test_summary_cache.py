@@ -0,0 +1,102 @@
+"""
+Unit tests for the content-addressed summary cache.
+"""
+import threading
+import duckdb
+import pytest
+from unittest.mock import patch
+from rag_agent.db.models import SummaryCacheModel
+from rag_agent.tools.summarizer import SummarizerTool
+from rag_agent.tools.utils.summary_cache import SummaryCache
+
+
+@pytest.fixture
+def summary_cache_conn():
+    """In-memory database with the summary cache table"""
+    conn = duckdb.connect(":memory:")
+    SummaryCacheModel.create_table_if_not_exists(conn)
+    with patch('rag_agent.tools.utils.summary_cache.get_cursor', return_value=conn), \
+         patch('rag_agent.tools.utils.summary_cache.get_write_lock', return_value=threading.Lock()):
+        yield conn
+
+
+def test_summarizer_reuses_cached_summary(summary_cache_conn, mock_model, sample_text):
+    """Test that the same text and query are only summarized once"""
+    tool = SummarizerTool(model=mock_model, cache=SummaryCache())
+
+    first = tool.forward(text=sample_text, query="Gandalf")
+    second = tool.forward(text=sample_text, query="Gandalf")
+
+    assert first == second
+    mock_model.assert_called_once()
+
+    # A different query is a different summary
+    tool.forward(text=sample_text, query="Frodo")
+    assert mock_model.call_count == 2
+
+
+def test_summarizer_looks_up_a_short_text_once(summary_cache_conn, mock_model, sample_text):
+    """Test that a text summarized in a single call is looked up and stored once"""
+    cache = SummaryCache()
+    tool = SummarizerTool(model=mock_model, cache=cache)
+
+    with patch.object(cache, 'get', wraps=cache.get) as mock_get, \
+         patch.object(cache, 'put', wraps=cache.put) as mock_put:
+        tool.forward(text=sample_text)
+
+    assert mock_get.call_count == 1
+    assert mock_put.call_count == 1
+    mock_model.assert_called_once()
+
+
+def test_summary_cache_key_depends_on_model():
+    """Test that the key changes with the model, template version, text and query"""
+    key = SummaryCache.make_key("model-a", 1, "Summarize:", "text", None)
+
+    assert key == SummaryCache.make_key("model-a", 1, "Summarize:", "text", None)
+    assert key != SummaryCache.make_key("model-b", 1, "Summarize:", "text", None)
+    assert key != SummaryCache.make_key("model-a", 2, "Summarize:", "text", None)
+    assert key != SummaryCache.make_key("model-a", 1, "Summarize:", "text", "query")
+
+
+def test_summary_cache_eviction(summary_cache_conn):
+    """Test that the least recently used summaries are evicted"""
+    cache = SummaryCache(max_entries=2)
+    cache.put("a", "model", None, "text a", "summary a")
+    cache.put("b", "model", None, "text b", "summary b")
+    cache.put("c", "model", None, "text c", "summary c")
+
+    keys = {row[0] for row in summary_cache_conn.execute("SELECT key FROM summary_cache").fetchall()}
+    assert len(keys) == 2
+    assert cache.get("c") == "summary c"
+
+
+def test_summary_cache_get_does_not_wait_for_the_write_lock(summary_cache_conn):
+    """Test that a lookup skips the LRU touch, rather than waiting, while a writer holds the lock"""
+    lock = threading.Lock()
+    with patch('rag_agent.tools.utils.summary_cache.get_write_lock', return_value=lock):
+        cache = SummaryCache()
+        cache.put("a", "model", None, "text a", "summary a")
+        summary_cache_conn.execute("UPDATE summary_cache SET last_used_at = TIMESTAMP '2000-01-01'")
+        touched = summary_cache_conn.execute("SELECT last_used_at FROM summary_cache").fetchone()[0]
+
+        with lock:
+            assert cache.get("a") == "summary a"
+        assert summary_cache_conn.execute("SELECT last_used_at FROM summary_cache").fetchone()[0] == touched
+
+        assert cache.get("a") == "summary a"
+        assert summary_cache_conn.execute("SELECT last_used_at FROM summary_cache").fetchone()[0] > touched
+
+
+def test_summarizer_reuses_summary_of_contained_text(summary_cache_conn, mock_model):
+    """Test that a superset of a summarized text is summarized from the earlier summary"""
+    tool = SummarizerTool(model=mock_model, cache=SummaryCache(reuse_subsets=True, min_reuse_chars=10))
+    earlier = "The first chunks of the document. " * 5
+
+    tool.forward(text=earlier)
+    tool.forward(text=earlier + "A new chunk.")
+
+    prompt = mock_model.call_args[1]["messages"][0]["content"][0]["text"]
+    assert earlier not in prompt
+    assert "This is a mock summary response" in prompt
+    assert "A new chunk." in prompt
@@ -0,0 +1,85 @@
+"""
+Unit tests for the per-conversation tool result cache.
+"""
+from unittest.mock import patch, MagicMock
+from rag_agent.tools.utils.tool_cache import ToolResultCache, ConversationCaches, memoize_tool
+
+
+class FakeTool:
+    """Minimal stand-in for a smolagents tool"""
+    name = "fake_tool"
+
+    def __init__(self):
+        self.calls = 0
+
+    def forward(self, query: str, doc_name=None) -> str:
+        self.calls += 1
+        return f"result {self.calls} for {query}"
+
+
+def test_memoize_tool_reuses_results():
+    """Test that repeated calls with equivalent arguments hit the cache"""
+    tool = memoize_tool(FakeTool(), ToolResultCache())
+
+    first = tool.forward("Who is  Frodo?")
+    second = tool.forward(query=" Who is Frodo? ", doc_name=None)
+
+    assert first == second
+    assert tool.calls == 1
+
+    # Different arguments are a different entry
+    tool.forward("Who is Sam?")
+    assert tool.calls == 2
+
+
+def test_memoize_tool_invalidated_by_corpus_generation():
+    """Test that corpus dependent results are recomputed after indexing"""
+    with patch('rag_agent.tools.utils.tool_cache.corpus_generation') as mock_generation:
+        mock_generation.return_value = 1
+        tool = memoize_tool(FakeTool(), ToolResultCache(), depends_on_corpus=True)
+
+        tool.forward("Who is Frodo?")
+        tool.forward("Who is Frodo?")
+        assert tool.calls == 1
+
+        mock_generation.return_value = 2
+        tool.forward("Who is Frodo?")
+        assert tool.calls == 2
+
+
+def test_memoize_tool_cache_if():
+    """Test that results rejected by the predicate are not cached"""
+    tool = memoize_tool(FakeTool(), ToolResultCache(), cache_if=lambda result: "2" in result)
+
+    tool.forward("query")
+    tool.forward("query")
+    tool.forward("query")
+
+    assert tool.calls == 2
+
+
+def test_tool_result_cache_is_bounded():
+    """Test that the least recently used entry is evicted"""
+    cache = ToolResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_conversation_caches():
+    """Test that each conversation gets its own cache and old ones are dropped"""
+    caches = ConversationCaches(max_conversations=2)
+
+    first = caches.get("session-1")
+    assert caches.get("session-1") is first
+    assert caches.get("session-2") is not first
+
+    caches.get("session-3")
+    assert caches.get("session-1") is not first